@@ -5,19 +5,23 @@ Main Streamlit Application
 
 import streamlit as st
 import pandas as pd
-from datetime import datetime, time as dt_time
+from datetime import datetime, time as dt_time, timedelta
 import pytz
-from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 import sqlite3
 import logging
-from typing import List, Dict
+import asyncio
+import sys
+from typing import Callable, List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+import threading
 import time
 
-from pattern_detector import PatternDetector
-from email_alerts import EmailAlertSystem
+from pattern_detector import PatternDetector, to_ohlcv_arrays
+from email_alerts import EmailAlertSystem, HIGH_IMPACT_STATES
 from market_utils import MarketUtils
-from data_manager import DataManager
+from data_manager import DataManager, CACHE_TTL_SECONDS
 
 # Configure logging
 logging.basicConfig(
@@ -30,6 +34,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Scan concurrency: symbols are processed on a worker pool, with a cap on
+# how many yfinance requests are in flight at once
+SCAN_WORKERS = 16
+MAX_CONCURRENT_FETCHES = 8
+_fetch_semaphore = threading.Semaphore(MAX_CONCURRENT_FETCHES)
+
+# Alerts queued within this many seconds of the first go out as one digest
+# (confirmed/imminent breakouts are sent straight away)
+EMAIL_BATCH_WINDOW = 60
+
+# Alerts held for the sender thread before new ones are dropped, so a slow
+# or unreachable SMTP server can't grow the backlog without bound
+EMAIL_QUEUE_SIZE = 500
+
+# How long cached stock data is reused per tier. TIER3 runs every 5 minutes
+# and watches for imminent breakouts, so it wants the latest bar.
+FETCH_MAX_AGE = {'TIER3': 60}
+
+IST = pytz.timezone('Asia/Kolkata')
+
+# Scan schedule (IST, market days, 9:00-15:55). A single tick fires every
+# 5 minutes and runs every tier that is due at that minute.
+TIER_PREDICATES = {
+    'TIER1': lambda now: now.hour in (9, 11, 13, 15) and now.minute == 20,  # Full scan
+    'TIER2': lambda now: now.minute % 30 == 0,                             # Forming patterns
+    'TIER3': lambda now: True,                                             # Imminent breakouts
+    'TIER4': lambda now: now.minute in (15, 45),                           # Post-breakout tracking
+}
+
 # Page configuration
 st.set_page_config(
     page_title="Stock Pattern Scanner",
@@ -44,19 +77,65 @@ def init_components():
     """Initialize core components"""
     data_manager = DataManager()
     pattern_detector = PatternDetector()
-    market_utils = MarketUtils()
+    market_utils = MarketUtils(session=data_manager._session)
     return data_manager, pattern_detector, market_utils
 
 data_manager, pattern_detector, market_utils = init_components()
 
+# Detector entry point per tier
+TIER_FUNCS = {
+    'TIER1': pattern_detector.detect_all_patterns,        # Full pattern detection
+    'TIER2': pattern_detector.check_forming_patterns,     # Check forming patterns
+    'TIER3': pattern_detector.check_imminent_breakouts,   # Check imminent breakouts
+    'TIER4': pattern_detector.check_confirmed_breakouts,  # Check confirmed breakouts
+}
+
+@st.cache_data(ttl=30)
+def _cached_market_open(return_message: bool = False):
+    """Market open status, cached briefly since it only changes on minute boundaries"""
+    return market_utils.is_market_open(return_message=return_message)
+
+# Cached views of the database for the tabs. Widget interactions rerun the
+# script but reuse these; they are cleared once a scan's patterns are written.
+@st.cache_data(ttl=15)
+def _load_filter_options():
+    """Distinct pattern types and states for the Active Patterns filters"""
+    return data_manager.get_active_filter_options()
+
+@st.cache_data(ttl=15)
+def _load_active(pattern_types: tuple, states: tuple, min_strength: int):
+    """Filtered active patterns for the Active Patterns tab"""
+    return data_manager.get_active_patterns(
+        pattern_types=list(pattern_types),
+        states=list(states),
+        min_strength=min_strength
+    )
+
+@st.cache_data(ttl=15)
+def _load_alerts(limit: int = 50):
+    """Recent alerts for the Recent Alerts tab"""
+    return data_manager.get_recent_alerts(limit=limit)
+
+@st.cache_data(ttl=15)
+def _load_stats():
+    """Aggregate statistics for the Statistics tab"""
+    return data_manager.get_pattern_statistics()
+
 # Initialize session state with persistence
 if 'scheduler' not in st.session_state:
     st.session_state.scheduler = None
 
+def _set_stock_list(stocks: List[str]):
+    """Store the universe as interned tuples, with the .NS-suffixed twin precomputed for scans"""
+    st.session_state.stock_list = tuple(sys.intern(s) for s in stocks)
+    st.session_state.nse_symbols = tuple(
+        sys.intern(s if s.endswith('.NS') else f"{s}.NS") for s in st.session_state.stock_list
+    )
+
 # Load stock list from database (if available)
 if 'stock_list' not in st.session_state:
     saved_stocks = data_manager.get_stock_list()
-    st.session_state.stock_list = saved_stocks
+    _set_stock_list(saved_stocks)
     if saved_stocks:
         logger.info(f"Auto-loaded {len(saved_stocks)} stocks from database")
 
@@ -75,11 +154,23 @@ if 'scan_count' not in st.session_state:
 if 'loaded_from_db' not in st.session_state:
     st.session_state.loaded_from_db = len(st.session_state.stock_list) > 0
 
+@st.cache_resource
+def _email_system_for(smtp_server: str, smtp_port: int, sender_email: str,
+                      sender_password: str, recipient_email: str) -> EmailAlertSystem:
+    """One EmailAlertSystem per set of credentials, so its SMTP session is reused across scans"""
+    return EmailAlertSystem(
+        smtp_server=smtp_server,
+        smtp_port=smtp_port,
+        sender_email=sender_email,
+        sender_password=sender_password,
+        recipient_email=recipient_email
+    )
+
 def get_email_system():
     """Get email system with current credentials"""
     if 'email_configured' in st.session_state and st.session_state.email_configured:
         try:
-            return EmailAlertSystem(
+            return _email_system_for(
                 smtp_server=st.session_state.get('smtp_server', 'smtp.gmail.com'),
                 smtp_port=st.session_state.get('smtp_port', 587),
                 sender_email=st.session_state.get('sender_email', ''),
@@ -91,24 +182,134 @@ def get_email_system():
             return None
     return None
 
-def perform_scan(tier: str):
-    """Execute pattern scanning based on tier"""
+def _email_worker(email_q: queue.Queue):
+    """
+    Send queued alerts off the scan thread
+
+    Alerts arriving within EMAIL_BATCH_WINDOW seconds of the first one are
+    grouped per email system and sent as a single digest. High-impact
+    states skip the wait and go out as soon as they're queued.
+    """
+    while True:
+        pending = {}
+        deadline = None
+
+        while deadline is None or time.monotonic() < deadline:
+            try:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                email_system, pattern = email_q.get(timeout=timeout)
+            except queue.Empty:
+                break
+
+            if pattern['state'] in HIGH_IMPACT_STATES:
+                try:
+                    email_system.send_digest([pattern])
+                except Exception as e:
+                    logger.error(f"Failed to send email alert: {e}")
+                continue
+
+            pending.setdefault(email_system, []).append(pattern)
+            if deadline is None:
+                deadline = time.monotonic() + EMAIL_BATCH_WINDOW
+
+        for email_system, patterns in pending.items():
+            try:
+                email_system.send_digest(patterns)
+            except Exception as e:
+                logger.error(f"Failed to send {len(patterns)} email alerts: {e}")
+
+@st.cache_resource
+def _email_queue() -> queue.Queue:
+    """Alert queue drained by a single background sender thread"""
+    email_q = queue.Queue(maxsize=EMAIL_QUEUE_SIZE)
+    threading.Thread(target=_email_worker, args=(email_q,), daemon=True, name='email-sender').start()
+    return email_q
+
+def _scan_one(nse_symbol: str, df: Optional[pd.DataFrame], detectors: List[Tuple[str, Callable]],
+              market_score: int, max_age: int) -> Optional[List[Dict]]:
+    """
+    Run the due tiers' detectors on a single symbol
+
+    Runs on a scan worker thread. Database writes are left to the caller.
+
+    Args:
+        nse_symbol: Symbol with .NS suffix
+        df: Prefetched OHLCV data, or None to fetch it here
+        detectors: (tier, TIER_FUNCS entry) for the tiers to run, in order
+        max_age: Maximum age in seconds of cached data for the fallback fetch
+
+    Returns:
+        List of detected patterns, or None if the symbol was skipped
+    """
+    try:
+        # Fall back to a single fetch if the batch download missed this symbol
+        if df is None:
+            with _fetch_semaphore:
+                df = data_manager.fetch_stock_data(nse_symbol, period='1y', max_age=max_age)
+        if df is None:
+            return None
+
+        # Convert once; every detector works on the same contiguous arrays
+        arr, idx = to_ohlcv_arrays(df)
+        if arr.shape[1] < 60:
+            return None
+
+        patterns = []
+        ran = []
+        fingerprint = data_manager.bars_fingerprint(arr, market_score)
+        for tier, detect in detectors:
+            # Same bars and market score as this tier's last run: same result
+            key = (nse_symbol, tier)
+            if data_manager.bars_unchanged(key, fingerprint):
+                continue
+            patterns.extend(detect(arr, idx, nse_symbol, market_score))
+            ran.append(key)
+
+        # Recorded only once every tier returned: if one raises, the symbol's
+        # patterns are dropped and all of its tiers rerun on the same bars
+        for key in ran:
+            data_manager.record_bars(key, fingerprint)
+
+        return patterns
+
+    except Exception as e:
+        logger.error(f"Error scanning {nse_symbol}: {e}")
+        return None
+
+def perform_scan(tiers: List[str]):
+    """
+    Execute pattern scanning for the given tiers
+
+    The stock data is fetched once and every tier's detectors run on it.
+
+    Args:
+        tiers: Tiers to run (TIER1-TIER4), in order
+    """
+    label = '+'.join(tiers)
+
+    # Resolve the detectors once, not per symbol
+    detectors = [(tier, TIER_FUNCS[tier]) for tier in tiers if tier in TIER_FUNCS]
+    if not detectors:
+        return
+
     if not st.session_state.scanning_active:
         return
 
-    if not market_utils.is_market_open():
-        logger.info(f"Market closed - skipping {tier} scan")
+    if not _cached_market_open():
+        logger.info(f"Market closed - skipping {label} scan")
         return
 
     try:
-        logger.info(f"Starting {tier} scan at {datetime.now()}")
+        logger.info(f"Starting {label} scan at {datetime.now()}")
         st.session_state.last_scan_time = datetime.now()
         st.session_state.scan_count += 1
 
         email_system = get_email_system()
-        stocks = st.session_state.stock_list
+        email_q = _email_queue()
+        # Symbols with .NS suffix, precomputed when the stock list was loaded
+        nse_symbols = st.session_state.nse_symbols
 
-        if not stocks:
+        if not nse_symbols:
             logger.warning("No stocks to scan")
             return
 
@@ -118,93 +319,133 @@ def perform_scan(tier: str):
 
         scanned = 0
         patterns_found = 0
-
-        for symbol in stocks:
-            try:
-                # Add .NS suffix for NSE stocks
-                nse_symbol = symbol if symbol.endswith('.NS') else f"{symbol}.NS"
-
-                # Fetch data
-                df = data_manager.fetch_stock_data(nse_symbol, period='1y')
-                if df is None or len(df) < 60:
+        batch = []
+
+        # Reuse cached data where fresh enough for every tier, download the
+        # rest in one batched request
+        max_age = min(FETCH_MAX_AGE.get(tier, CACHE_TTL_SECONDS) for tier in tiers)
+        frames = data_manager.fetch_many(nse_symbols, period='1y', max_age=max_age)
+
+        # Detect concurrently; results are collected on this thread
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+            futures = [
+                executor.submit(_scan_one, nse_symbol, frames.get(nse_symbol), detectors,
+                                market_score, max_age)
+                for nse_symbol in nse_symbols
+            ]
+
+            for future in as_completed(futures):
+                patterns = future.result()
+                if patterns is None:
                     continue
 
-                # Detect patterns based on tier
-                if tier == 'TIER1':
-                    # Full pattern detection
-                    patterns = pattern_detector.detect_all_patterns(df, nse_symbol, market_score)
-                elif tier == 'TIER2':
-                    # Check forming patterns
-                    patterns = pattern_detector.check_forming_patterns(df, nse_symbol, market_score)
-                elif tier == 'TIER3':
-                    # Check imminent breakouts
-                    patterns = pattern_detector.check_imminent_breakouts(df, nse_symbol, market_score)
-                elif tier == 'TIER4':
-                    # Check confirmed breakouts
-                    patterns = pattern_detector.check_confirmed_breakouts(df, nse_symbol, market_score)
-                else:
-                    patterns = []
-
-                # Process detected patterns
-                for pattern in patterns:
-                    patterns_found += 1
-                    data_manager.save_pattern(pattern)
-
-                    # Send email alerts
-                    if email_system:
+                # Collect detected patterns for one batched save
+                patterns_found += len(patterns)
+                batch.extend(patterns)
+
+                # Hand email alerts to the sender thread without waiting on SMTP
+                if email_system:
+                    for pattern in patterns:
                         try:
-                            email_system.send_pattern_alert(pattern)
-                        except Exception as e:
-                            logger.error(f"Failed to send email for {nse_symbol}: {e}")
+                            email_q.put_nowait((email_system, pattern))
+                        except queue.Full:
+                            logger.warning(f"Email queue full, dropping alert for {pattern['symbol']}")
 
                 scanned += 1
 
-                # Rate limiting
-                if scanned % 50 == 0:
-                    time.sleep(2)
-
-            except Exception as e:
-                logger.error(f"Error scanning {symbol}: {e}")
-                continue
+        # Written on the DB writer thread; the tabs reload once it lands
+        data_manager.save_patterns_async(batch, on_saved=_clear_db_views)
 
-        logger.info(f"{tier} scan completed: {scanned} stocks scanned, {patterns_found} patterns found")
+        logger.info(f"{label} scan completed: {scanned} stocks scanned, {patterns_found} patterns found")
 
     except Exception as e:
-        logger.error(f"Error in {tier} scan: {e}")
+        logger.error(f"Error in {label} scan: {e}")
+
+def _clear_db_views(pattern_ids: Optional[List[int]] = None):
+    """Drop the cached tab data so the next rerun reads fresh rows"""
+    _load_filter_options.clear()
+    _load_active.clear()
+    _load_stats.clear()
+
+def _tick(fire_time: Optional[datetime] = None):
+    """Scheduler tick: run every tier due at this minute in one scan"""
+    now = fire_time or datetime.now(IST)
+    due = [tier for tier, pred in TIER_PREDICATES.items() if pred(now)]
+    if due:
+        perform_scan(due)
+
+class ScanScheduler:
+    """
+    Runs a function on a cron schedule from one asyncio loop on a daemon thread
 
-def setup_scheduler():
-    """Setup APScheduler for multi-tier scanning"""
-    if st.session_state.scheduler is not None:
-        st.session_state.scheduler.shutdown()
+    Only APScheduler's CronTrigger is used, for the fire-time math. One thread
+    sleeps until each fire time and runs the tick inline, so ticks never
+    overlap and nothing is spawned per run.
+    """
 
-    scheduler = BackgroundScheduler(timezone=pytz.timezone('Asia/Kolkata'))
+    def __init__(self, trigger: CronTrigger, func: Callable[[datetime], None]):
+        self._trigger = trigger
+        self._func = func
+        self._loop = asyncio.new_event_loop()
+        self._task = None
+        self._thread = threading.Thread(target=self._run, daemon=True, name='scan-scheduler')
 
-    # TIER 1: Full scan 4-5 times during market hours
-    scheduler.add_job(
-        lambda: perform_scan('TIER1'),
-        CronTrigger(day_of_week='mon-fri', hour='9,11,13,15', minute='20'),
-        id='tier1_scan'
-    )
+    def start(self):
+        self._thread.start()
 
-    # TIER 2: Forming patterns every 30 minutes
-    scheduler.add_job(
-        lambda: perform_scan('TIER2'),
-        CronTrigger(day_of_week='mon-fri', hour='9-15', minute='*/30'),
-        id='tier2_scan'
-    )
+    def shutdown(self):
+        """Stop scheduling; a tick already running finishes first"""
+        try:
+            self._loop.call_soon_threadsafe(self._cancel)
+        except RuntimeError:
+            # The loop thread already exited and closed its loop
+            pass
+
+    def _cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._task = self._loop.create_task(self._main())
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+        logger.info("Scheduler stopped")
+
+    async def _main(self):
+        previous = None
+        while True:
+            # Next fire time from now, not from the last one, so ticks missed
+            # while a slow tick ran collapse into a single run. Never before
+            # the tick that just ran, in case the sleep woke a little early.
+            now = datetime.now(IST)
+            if previous is not None:
+                now = max(now, previous + timedelta(seconds=1))
+            fire_time = self._trigger.get_next_fire_time(None, now)
+            if fire_time is None:
+                return
+
+            await asyncio.sleep(max(0.0, (fire_time - datetime.now(IST)).total_seconds()))
 
-    # TIER 3: Imminent breakouts every 5 minutes
-    scheduler.add_job(
-        lambda: perform_scan('TIER3'),
-        CronTrigger(day_of_week='mon-fri', hour='9-15', minute='*/5'),
-        id='tier3_scan'
-    )
+            try:
+                self._func(fire_time)
+            except Exception as e:
+                logger.error(f"Scheduled tick failed: {e}")
+            previous = fire_time
 
-    # TIER 4: Post-breakout tracking every 30 minutes
-    scheduler.add_job(
-        lambda: perform_scan('TIER4'),
-        CronTrigger(day_of_week='mon-fri', hour='9-15', minute='15,45'),
-        id='tier4_scan'
+def setup_scheduler():
+    """Setup the scan scheduler for multi-tier scanning"""
+    if st.session_state.scheduler is not None:
+        st.session_state.scheduler.shutdown()
+
+    # One tick every 5 minutes; _tick picks the due tiers (see TIER_PREDICATES)
+    scheduler = ScanScheduler(
+        CronTrigger(day_of_week='mon-fri', hour='9-15', minute='*/5', timezone=IST),
+        _tick
     )
 
     scheduler.start()
@@ -223,7 +464,8 @@ with st.sidebar:
     # Email Configuration
     with st.expander("📧 Email Settings", expanded=False):
         smtp_server = st.text_input("SMTP Server", value="smtp.gmail.com")
-        smtp_port = st.number_input("SMTP Port", value=587, min_value=1, max_value=65535)
+        smtp_port = st.number_input("SMTP Port", value=587, min_value=1, max_value=65535,
+                                    help="465 connects over implicit TLS (one round trip fewer); other ports use STARTTLS")
         sender_email = st.text_input("Sender Email", value=st.secrets.get("SENDER_EMAIL", "") if hasattr(st, 'secrets') else "")
         sender_password = st.text_input("App Password", type="password", value=st.secrets.get("SENDER_PASSWORD", "") if hasattr(st, 'secrets') else "")
         recipient_email = st.text_input("Recipient Email", value=st.secrets.get("RECIPIENT_EMAIL", "") if hasattr(st, 'secrets') else "")
@@ -253,7 +495,7 @@ with st.sidebar:
 
         if st.button("Load Stocks"):
             stocks = [s.strip().upper() for s in stock_input.split('\n') if s.strip()]
-            st.session_state.stock_list = stocks
+            _set_stock_list(stocks)
 
             # Save to database for persistence
             if data_manager.save_stock_list(stocks):
@@ -310,7 +552,7 @@ with st.sidebar:
         st.text(f"Last Scan:\n{st.session_state.last_scan_time.strftime('%Y-%m-%d %H:%M:%S')}")
 
     # Market Status
-    is_open, status_msg = market_utils.is_market_open(return_message=True)
+    is_open, status_msg = _cached_market_open(return_message=True)
     if is_open:
         st.success(f"🟢 {status_msg}")
     else:
@@ -319,28 +561,27 @@ with st.sidebar:
 # Main Content Area
 tab1, tab2, tab3, tab4 = st.tabs(["📊 Active Patterns", "📜 Recent Alerts", "📈 Statistics", "ℹ️ About"])
 
-with tab1:
+# Partial reruns: a widget change inside a tab reruns only that tab
+@st.fragment
+def _render_active_patterns():
+    """Active Patterns tab"""
     st.header("Active Patterns")
 
-    # Fetch active patterns from database
-    patterns_df = data_manager.get_active_patterns()
+    # Filter options from the active patterns in the database
+    options = _load_filter_options()
 
-    if not patterns_df.empty:
+    if options['pattern_types']:
         # Filter controls
         col1, col2, col3 = st.columns(3)
         with col1:
-            pattern_filter = st.multiselect("Pattern Type", options=patterns_df['pattern_type'].unique(), default=patterns_df['pattern_type'].unique())
+            pattern_filter = st.multiselect("Pattern Type", options=options['pattern_types'], default=options['pattern_types'])
         with col2:
-            state_filter = st.multiselect("State", options=patterns_df['state'].unique(), default=patterns_df['state'].unique())
+            state_filter = st.multiselect("State", options=options['states'], default=options['states'])
         with col3:
             min_strength = st.slider("Min Strength", 0, 100, 50)
 
-        # Apply filters
-        filtered_df = patterns_df[
-            (patterns_df['pattern_type'].isin(pattern_filter)) &
-            (patterns_df['state'].isin(state_filter)) &
-            (patterns_df['strength_score'] >= min_strength)
-        ]
+        # Filters are applied in SQL
+        filtered_df = _load_active(tuple(pattern_filter), tuple(state_filter), min_strength)
 
         # Display patterns
         st.dataframe(
@@ -359,28 +600,40 @@ with tab1:
     else:
         st.info("No active patterns detected yet. Start scanning to find patterns!")
 
-with tab2:
+with tab1:
+    _render_active_patterns()
+
+@st.fragment
+def _render_recent_alerts():
+    """Recent Alerts tab"""
     st.header("Recent Alerts")
 
-    alerts_df = data_manager.get_recent_alerts(limit=50)
+    alerts_df = _load_alerts(limit=50)
 
     if not alerts_df.empty:
-        for _, alert in alerts_df.iterrows():
-            with st.expander(f"{alert['symbol']} - {alert['pattern_type']} - {alert['alert_type']}", expanded=False):
-                col1, col2, col3 = st.columns(3)
-                col1.metric("Price", f"₹{alert['price']:.2f}")
-                col2.metric("Strength", f"{alert['strength_score']:.0f}")
-                col3.metric("Time", alert['timestamp'])
-
-                if alert.get('message'):
-                    st.text(alert['message'])
+        # One table widget instead of an expander + metrics per alert
+        st.dataframe(
+            alerts_df[['timestamp', 'symbol', 'pattern_type', 'alert_type', 'price', 'strength_score', 'message']],
+            use_container_width=True,
+            column_config={
+                "timestamp": st.column_config.TextColumn("Time"),
+                "price": st.column_config.NumberColumn("Price", format="₹%.2f"),
+                "strength_score": st.column_config.NumberColumn("Strength", format="%.0f"),
+            },
+            hide_index=True
+        )
     else:
         st.info("No alerts yet. Alerts will appear here once patterns are detected.")
 
-with tab3:
+with tab2:
+    _render_recent_alerts()
+
+@st.fragment
+def _render_statistics():
+    """Statistics tab"""
     st.header("Pattern Statistics")
 
-    stats = data_manager.get_pattern_statistics()
+    stats = _load_stats()
 
     if stats:
         col1, col2, col3, col4 = st.columns(4)
@@ -398,6 +651,9 @@ with tab3:
     else:
         st.info("No statistics available yet. Start scanning to generate statistics!")
 
+with tab3:
+    _render_statistics()
+
 with tab4:
     st.header("About This System")
 
@@ -3,115 +3,365 @@ Data Manager
 Handles stock data fetching, pattern storage, and database operations
 """
 
-import yfinance as yf
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
 import sqlite3
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
 import logging
 import json
+import operator
+import os
+import queue
+import threading
 import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from urllib.parse import quote
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Fetched stock data is reused for this long (memory and disk cache)
+CACHE_TTL_SECONDS = 300
+
+# Most (symbol, period) entries kept in memory; older ones fall back to disk
+MEMORY_CACHE_SIZE = 2048
+
+# Symbols per yf.download request in fetch_many (each gets its own thread)
+FETCH_BATCH_SIZE = 20
+
+# yf.download collects results in a module-global dict, so two downloads
+# running at once (e.g. two sessions scanning) would mix up each other's data
+_download_lock = threading.Lock()
+
+# Keep-alive connections to Yahoo kept by the shared HTTP session; must cover
+# FETCH_BATCH_SIZE download threads or surplus connections get re-handshaked
+HTTP_POOL_SIZE = 32
+
+# Attempts (and base backoff in seconds) to take the write lock when
+# another process is holding it
+LOCK_RETRIES = 3
+LOCK_RETRY_BACKOFF = 0.05
+
+# Pattern batches waiting for the background writer, and how many queued
+# batches it merges into one transaction
+WRITE_QUEUE_SIZE = 64
+WRITE_DRAIN_MAX = 16
+
+# Bump when _create_schema changes so existing databases pick it up
+SCHEMA_VERSION = 1
+
+# Prepared statements kept per connection (sqlite3 defaults to 128); the
+# connections are long-lived, so each SQL text is parsed once
+STATEMENT_CACHE_SIZE = 256
+
+# Read-only connections kept open for UI and scan reads (more are opened on
+# demand under load, and closed again on return)
+READ_POOL_SIZE = 4
+
+# INSERT ... ON CONFLICT ... RETURNING needs SQLite 3.35+
+_UPSERT_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Rows deleted per transaction by cleanup_old_data
+CLEANUP_BATCH_SIZE = 5000
+
+
+def _json_default(obj):
+    """Unwrap numpy scalars (e.g. int64 indices) that json can't encode"""
+    if hasattr(obj, 'item'):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dump_details(details: Optional[Dict]) -> str:
+    """
+    Serialize a pattern's details for the details column
+
+    Always TEXT, whether or not orjson is installed, so the column doesn't
+    end up a mix of TEXT and BLOB rows depending on where the writer ran.
+    """
+    if orjson is not None:
+        return orjson.dumps(details or {}, default=_json_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(details or {}, default=_json_default)
+
 
 class DataManager:
     """Manages stock data and pattern persistence"""
 
-    def __init__(self, db_path: str = 'stock_patterns.db'):
+    def __init__(self, db_path: str = 'stock_patterns.db', cache_dir: Optional[str] = 'cache'):
+        """
+        Args:
+            db_path: SQLite database file
+            cache_dir: Directory for the on-disk stock data cache (None disables it)
+        """
         self.db_path = db_path
+        self.cache_dir = cache_dir
+        self._write_lock = threading.Lock()
         self._init_database()
-        self._cache = {}
-        self._cache_expiry = {}
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._last_hash = {}
+        self._session = self._create_session()
+
+        # Background writer for save_patterns_async
+        self._write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._writer = threading.Thread(target=self._writer_loop, name='db-writer', daemon=True)
+        self._writer.start()
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._prune_disk_cache()
+
+    @staticmethod
+    def _create_session() -> requests.Session:
+        """
+        HTTP session shared by every yfinance call from this manager
+
+        requests' default adapter keeps only 10 connections per host, so a
+        20-thread download discarded half of them and paid a fresh TLS
+        handshake next time.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _open_connection(self, read_only: bool = False) -> sqlite3.Connection:
+        """
+        Open a database connection with performance pragmas applied
+
+        WAL lets the UI read while a scan is writing, and synchronous=NORMAL
+        drops the fsync on every commit. busy_timeout makes a connection wait
+        out a held lock instead of failing with "database is locked".
+        """
+        if read_only:
+            uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+
+        # Rows still unpack and index positionally (pandas reads them as
+        # before) but can also be read by column name
+        conn.row_factory = sqlite3.Row
+
+        # foreign_keys stays off: cleanup_old_data deletes patterns that
+        # pattern_stats and alerts rows still reference
+        conn.execute('PRAGMA busy_timeout=5000')
+
+        if self.db_path != ':memory:':
+            if not read_only:
+                # auto_vacuum only takes effect on a new database, so it has
+                # to be set before journal_mode writes the file header
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            conn.execute('PRAGMA mmap_size=268435456')
+            conn.execute('PRAGMA cache_size=-65536')
+
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """
+        The single read-write connection, held under _write_lock
+
+        The block runs as one transaction: committed on success, rolled back
+        if it raises. The database write lock is taken up front, so the block
+        itself never hits "database is locked".
+        """
+        with self._write_lock:
+            self._begin_write()
+            with self._rw_conn:
+                yield self._rw_conn
+
+    def _begin_write(self):
+        """
+        Start an IMMEDIATE transaction, retrying while another process holds the lock
+
+        busy_timeout already waits inside SQLite; this backs off and retries
+        on top of it instead of failing the whole save.
+        """
+        for attempt in range(LOCK_RETRIES):
+            try:
+                self._rw_conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) or attempt == LOCK_RETRIES - 1:
+                    raise
+                logger.warning(f"Database locked, retrying ({attempt + 1}/{LOCK_RETRIES - 1})")
+                time.sleep(LOCK_RETRY_BACKOFF * 2 ** attempt)
+
+    @contextmanager
+    def _read(self):
+        """
+        Borrow a read-only connection from the pool
+
+        Readers don't block the writer (or each other) under WAL. In-memory
+        databases only exist on the read-write connection, so reads use it.
+
+        deque.popleft/append are atomic, so checkout takes no lock; when the
+        pool is empty a fresh connection is opened rather than waiting.
+        """
+        if self._read_pool is None:
+            with self._write_lock:
+                yield self._rw_conn
+            return
+
+        try:
+            conn = self._read_pool.popleft()
+        except IndexError:
+            conn = self._open_connection(read_only=True)
+
+        try:
+            yield conn
+        finally:
+            if len(self._read_pool) < READ_POOL_SIZE:
+                self._read_pool.append(conn)
+            else:
+                conn.close()
 
     def _init_database(self):
-        """Initialize SQLite database with required tables"""
+        """Initialize SQLite database with required tables and open the connection pool"""
+        self._rw_conn = self._open_connection()
+        self._read_pool = None
+
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Patterns table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS patterns (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT NOT NULL,
-                    pattern_type TEXT NOT NULL,
-                    state TEXT NOT NULL,
-                    strength_score INTEGER,
-                    current_price REAL,
-                    breakout_point REAL,
-                    distance_pct REAL,
-                    invalidation_point REAL,
-                    target1 REAL,
-                    target2 REAL,
-                    target3 REAL,
-                    stop_loss REAL,
-                    volume_confirmed INTEGER,
-                    details TEXT,
-                    detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    active INTEGER DEFAULT 1
-                )
-            ''')
-
-            # Alerts table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS alerts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    pattern_id INTEGER,
-                    symbol TEXT NOT NULL,
-                    pattern_type TEXT NOT NULL,
-                    alert_type TEXT NOT NULL,
-                    price REAL,
-                    strength_score INTEGER,
-                    message TEXT,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (pattern_id) REFERENCES patterns(id)
-                )
-            ''')
-
-            # Pattern statistics table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS pattern_stats (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    pattern_id INTEGER,
-                    symbol TEXT NOT NULL,
-                    pattern_type TEXT NOT NULL,
-                    entry_price REAL,
-                    exit_price REAL,
-                    target_hit INTEGER,
-                    profit_loss_pct REAL,
-                    success INTEGER,
-                    closed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (pattern_id) REFERENCES patterns(id)
+            with self._write() as conn:
+                cursor = conn.cursor()
+
+                # The DDL below is idempotent but still parsed on every run;
+                # skip it once this database is at the current schema
+                cursor.execute('PRAGMA user_version')
+                if cursor.fetchone()[0] < SCHEMA_VERSION:
+                    self._create_schema(cursor)
+                    cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+            # Read-only connections need the file to exist, so open them last
+            if self.db_path != ':memory:':
+                self._read_pool = deque(
+                    self._open_connection(read_only=True) for _ in range(READ_POOL_SIZE)
                 )
-            ''')
-
-            # Config table for stock list and settings persistence
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS config (
-                    key TEXT PRIMARY KEY,
-                    value TEXT,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # Create indexes for performance
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_patterns_symbol ON patterns(symbol)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_patterns_state ON patterns(state)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_patterns_active ON patterns(active)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_symbol ON alerts(symbol)')
 
-            conn.commit()
-            conn.close()
             logger.info("Database initialized successfully")
 
         except Exception as e:
             logger.error(f"Error initializing database: {e}")
             raise
 
+    def _create_schema(self, cursor: sqlite3.Cursor):
+        """Create tables and indexes (bump SCHEMA_VERSION when changing this)"""
+        # Patterns table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS patterns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                symbol TEXT NOT NULL,
+                pattern_type TEXT NOT NULL,
+                state TEXT NOT NULL,
+                strength_score INTEGER,
+                current_price REAL,
+                breakout_point REAL,
+                distance_pct REAL,
+                invalidation_point REAL,
+                target1 REAL,
+                target2 REAL,
+                target3 REAL,
+                stop_loss REAL,
+                volume_confirmed INTEGER,
+                details TEXT,
+                detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                active INTEGER DEFAULT 1
+            )
+        ''')
+
+        # Alerts table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pattern_id INTEGER,
+                symbol TEXT NOT NULL,
+                pattern_type TEXT NOT NULL,
+                alert_type TEXT NOT NULL,
+                price REAL,
+                strength_score INTEGER,
+                message TEXT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (pattern_id) REFERENCES patterns(id)
+            )
+        ''')
+
+        # Pattern statistics table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pattern_stats (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pattern_id INTEGER,
+                symbol TEXT NOT NULL,
+                pattern_type TEXT NOT NULL,
+                entry_price REAL,
+                exit_price REAL,
+                target_hit INTEGER,
+                profit_loss_pct REAL,
+                success INTEGER,
+                closed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (pattern_id) REFERENCES patterns(id)
+            )
+        ''')
+
+        # Config table for stock list and settings persistence
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS config (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Create indexes for performance
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_patterns_symbol ON patterns(symbol)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_patterns_state ON patterns(state)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_patterns_active ON patterns(active)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_patterns_state_strength ON patterns(state, strength_score)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_patterns_active_type ON patterns(active, pattern_type)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_patterns_cleanup ON patterns(active, updated_at) WHERE active = 0')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_symbol ON alerts(symbol)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts(timestamp DESC)')
+
+        # At most one active row per (symbol, pattern_type); the UPSERT in
+        # save_patterns conflicts on it. Older databases could hold
+        # duplicates, so keep only the newest before building the index
+        cursor.execute('''
+            UPDATE patterns SET active = 0
+            WHERE active = 1 AND id NOT IN (
+                SELECT MAX(id) FROM patterns WHERE active = 1
+                GROUP BY symbol, pattern_type
+            )
+        ''')
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_patterns_active
+            ON patterns(symbol, pattern_type) WHERE active = 1
+        ''')
+
+        # Covers the active-pattern lookup in save_patterns without touching the table
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_patterns_active_symbol_type
+            ON patterns(active, symbol, pattern_type, detected_at DESC, state)
+        ''')
+
     def fetch_stock_data(self, symbol: str, period: str = '1y',
-                        use_cache: bool = True) -> Optional[pd.DataFrame]:
+                        use_cache: bool = True,
+                        max_age: int = CACHE_TTL_SECONDS) -> Optional[pd.DataFrame]:
         """
         Fetch stock data from yfinance with caching and error handling
 
@@ -119,31 +369,31 @@ class DataManager:
             symbol: Stock symbol (with .NS suffix for NSE)
             period: Data period (1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, max)
             use_cache: Whether to use cached data
+            max_age: Maximum age in seconds of cached data to reuse
 
         Returns:
             DataFrame with OHLCV data or None if fetch fails
         """
-        cache_key = f"{symbol}_{period}"
-
         # Check cache
-        if use_cache and cache_key in self._cache:
-            expiry = self._cache_expiry.get(cache_key)
-            if expiry and datetime.now() < expiry:
+        if use_cache:
+            df = self._get_cached(symbol, period, max_age)
+            if df is not None:
                 logger.debug(f"Using cached data for {symbol}")
-                return self._cache[cache_key]
+                return df
 
         try:
+            # Imported on first fetch, so importing this module stays cheap
+            import yfinance as yf
+
             logger.debug(f"Fetching data for {symbol} (period={period})")
-            ticker = yf.Ticker(symbol)
+            ticker = yf.Ticker(symbol, session=self._session)
             df = ticker.history(period=period)
 
             if df.empty:
                 logger.warning(f"No data found for {symbol}")
                 return None
 
-            # Cache the data (expires in 5 minutes)
-            self._cache[cache_key] = df
-            self._cache_expiry[cache_key] = datetime.now() + timedelta(minutes=5)
+            self._store_cached(symbol, period, df)
 
             logger.debug(f"Fetched {len(df)} rows for {symbol}")
             return df
@@ -152,6 +402,213 @@ class DataManager:
             logger.error(f"Error fetching data for {symbol}: {e}")
             return None
 
+    def fetch_many(self, symbols: List[str], period: str = '1y',
+                   max_age: int = CACHE_TTL_SECONDS) -> Dict[str, pd.DataFrame]:
+        """
+        Fetch stock data for many symbols in a single batched yfinance download
+
+        Symbols with fresh cached data (memory or disk) are served from the
+        cache; only the rest are downloaded. Fetched frames are cached too.
+
+        Args:
+            symbols: Stock symbols (with .NS suffix for NSE)
+            period: Data period (1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, max)
+            max_age: Maximum age in seconds of cached data to reuse
+
+        Returns:
+            Dict mapping symbol to DataFrame with OHLCV data. Symbols with no
+            data are left out.
+        """
+        frames = {}
+        missing = []
+        for symbol in symbols:
+            df = self._get_cached(symbol, period, max_age)
+            if df is not None:
+                frames[symbol] = df
+            else:
+                missing.append(symbol)
+
+        if missing:
+            logger.debug(f"Batch fetching data for {len(missing)} symbols "
+                         f"({len(frames)} cached, period={period})")
+
+        # Chunked so one failed request only loses FETCH_BATCH_SIZE symbols
+        for i in range(0, len(missing), FETCH_BATCH_SIZE):
+            frames.update(self._download_batch(missing[i:i + FETCH_BATCH_SIZE], period))
+
+        logger.debug(f"Batch fetched {len(frames)}/{len(symbols)} symbols")
+        return frames
+
+    def _download_batch(self, symbols: List[str], period: str) -> Dict[str, pd.DataFrame]:
+        """Download one chunk of symbols with yf.download and cache each frame"""
+        try:
+            import yfinance as yf
+
+            # One thread per symbol; threads=True caps at 2x CPU count, which
+            # stretches a chunk over several round-trips on small hosts
+            with _download_lock:
+                data = yf.download(
+                    tickers=symbols,
+                    period=period,
+                    group_by='ticker',
+                    threads=len(symbols),
+                    progress=False,
+                    auto_adjust=True,
+                    session=self._session
+                )
+        except Exception as e:
+            logger.error(f"Error batch fetching data: {e}")
+            return {}
+
+        if data is None or data.empty:
+            logger.warning(f"Batch fetch returned no data for {len(symbols)} symbols")
+            return {}
+
+        multi = isinstance(data.columns, pd.MultiIndex)
+        tickers = set(data.columns.get_level_values(0)) if multi else set()
+
+        frames = {}
+        for symbol in symbols:
+            if multi:
+                if symbol not in tickers:
+                    continue
+                df = data[symbol]
+            elif len(symbols) == 1:
+                df = data
+            else:
+                continue
+
+            # Rows are aligned across tickers; drop dates this one didn't trade
+            df = df.dropna(how='all')
+            if df.empty:
+                logger.warning(f"No data found for {symbol}")
+                continue
+
+            frames[symbol] = df
+            self._store_cached(symbol, period, df)
+
+        return frames
+
+    # ===== STOCK DATA CACHE =====
+
+    def _disk_cache_path(self, symbol: str, period: str) -> str:
+        """Cache file for a symbol/period, keyed by today's date"""
+        return os.path.join(self.cache_dir, f"{symbol}_{period}_{date.today().isoformat()}.pkl")
+
+    def _get_cached(self, symbol: str, period: str, max_age: int) -> Optional[pd.DataFrame]:
+        """
+        Get cached stock data no older than max_age seconds
+
+        Checks the in-memory cache first, then the on-disk cache (which
+        survives restarts and is shared by every tier's scans).
+        """
+        cache_key = (symbol, period)
+        with self._cache_lock:
+            entry = self._cache.get(cache_key)
+            if entry and time.monotonic() - entry[0] < max_age:
+                self._cache.move_to_end(cache_key)
+                return entry[1]
+
+        if not self.cache_dir:
+            return None
+
+        path = self._disk_cache_path(symbol, period)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        if time.time() - mtime >= max_age:
+            return None
+
+        try:
+            df = pd.read_pickle(path)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache file {path}: {e}")
+            return None
+
+        self._remember(cache_key, df, time.monotonic() - (time.time() - mtime))
+        return df
+
+    def _remember(self, cache_key: tuple, df: pd.DataFrame, fetched_at: float):
+        """
+        Put a DataFrame in the in-memory LRU cache
+
+        Least recently used entries are evicted once past MEMORY_CACHE_SIZE
+        or CACHE_TTL_SECONDS, so memory stays bounded however many symbols
+        are scanned.
+        """
+        with self._cache_lock:
+            self._cache[cache_key] = (fetched_at, df)
+            self._cache.move_to_end(cache_key)
+
+            cutoff = time.monotonic() - CACHE_TTL_SECONDS
+            while self._cache:
+                oldest_key, (oldest_time, _) = next(iter(self._cache.items()))
+                if len(self._cache) <= MEMORY_CACHE_SIZE and oldest_time >= cutoff:
+                    break
+                del self._cache[oldest_key]
+
+    def _store_cached(self, symbol: str, period: str, df: pd.DataFrame):
+        """Cache fetched stock data in memory and on disk"""
+        self._remember((symbol, period), df, time.monotonic())
+
+        if not self.cache_dir:
+            return
+
+        # Write to a temp file and rename so readers never see a partial file
+        path = self._disk_cache_path(symbol, period)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            df.to_pickle(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Error writing cache file for {symbol}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _prune_disk_cache(self):
+        """Remove cache files from previous days"""
+        today = f"_{date.today().isoformat()}.pkl"
+        try:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.pkl') and not name.endswith(today):
+                    os.remove(os.path.join(self.cache_dir, name))
+        except OSError as e:
+            logger.warning(f"Error pruning cache directory: {e}")
+
+    def bars_fingerprint(self, arr: np.ndarray, *extra) -> int:
+        """
+        Fingerprint of arr plus any extra inputs, for bars_unchanged/record_bars
+
+        Args:
+            arr: Array the consumer is about to process
+            extra: Other hashable inputs that affect the result
+        """
+        return hash((arr.shape, arr.tobytes(), extra))
+
+    def bars_unchanged(self, key: tuple, fingerprint: int) -> bool:
+        """
+        Check whether fingerprint matches the one last recorded under key
+
+        Doesn't record anything: call record_bars once the consumer has
+        processed the data, so a run that raised is retried next time.
+
+        Args:
+            key: Consumer-chosen key, e.g. (symbol, tier)
+            fingerprint: From bars_fingerprint
+
+        Returns:
+            bool: True if nothing changed since the last recorded run for key
+        """
+        return self._last_hash.get(key) == fingerprint
+
+    def record_bars(self, key: tuple, fingerprint: int):
+        """Record fingerprint as successfully processed under key"""
+        self._last_hash[key] = fingerprint
+
     def save_pattern(self, pattern: Dict) -> int:
         """
         Save or update pattern in database
@@ -159,102 +616,229 @@ class DataManager:
         Returns:
             pattern_id: Database ID of the pattern
         """
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+        pattern_ids = self.save_patterns([pattern])
+        return pattern_ids[0] if pattern_ids else -1
 
-            # Check if pattern already exists (same symbol, pattern_type, and still active)
-            cursor.execute('''
-                SELECT id, state FROM patterns
-                WHERE symbol = ? AND pattern_type = ? AND active = 1
-                ORDER BY detected_at DESC LIMIT 1
-            ''', (pattern['symbol'], pattern['pattern_type']))
+    def save_patterns(self, patterns: List[Dict]) -> List[int]:
+        """
+        Save or update a batch of patterns in a single transaction
 
-            existing = cursor.fetchone()
+        One commit covers the whole batch instead of one per pattern. Each
+        pattern is a single UPSERT against the active (symbol, pattern_type)
+        row; on SQLite older than 3.35 (no RETURNING) existing rows are
+        looked up per chunk of symbols instead.
 
-            if existing:
-                pattern_id, old_state = existing
+        Args:
+            patterns: Pattern dicts as returned by PatternDetector
 
-                # Update existing pattern
-                cursor.execute('''
-                    UPDATE patterns SET
-                        state = ?,
-                        strength_score = ?,
-                        current_price = ?,
-                        breakout_point = ?,
-                        distance_pct = ?,
-                        volume_confirmed = ?,
-                        details = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (
-                    pattern['state'],
-                    pattern['strength_score'],
-                    pattern['current_price'],
-                    pattern['breakout_point'],
-                    pattern['distance_pct'],
-                    1 if pattern['volume_confirmed'] else 0,
-                    json.dumps(pattern.get('details', {})),
-                    pattern_id
-                ))
-
-                logger.info(f"Updated pattern {pattern_id} for {pattern['symbol']}")
+        Returns:
+            List of pattern IDs in input order (empty if the batch failed)
+        """
+        if not patterns:
+            return []
 
-            else:
-                # Insert new pattern
-                cursor.execute('''
-                    INSERT INTO patterns (
-                        symbol, pattern_type, state, strength_score,
-                        current_price, breakout_point, distance_pct,
-                        invalidation_point, target1, target2, target3,
-                        stop_loss, volume_confirmed, details
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    pattern['symbol'],
-                    pattern['pattern_type'],
-                    pattern['state'],
-                    pattern['strength_score'],
-                    pattern['current_price'],
-                    pattern['breakout_point'],
-                    pattern['distance_pct'],
-                    pattern['invalidation_point'],
-                    pattern['target1'],
-                    pattern['target2'],
-                    pattern['target3'],
-                    pattern['stop_loss'],
-                    1 if pattern['volume_confirmed'] else 0,
-                    json.dumps(pattern.get('details', {}))
-                ))
+        try:
+            with self._write() as conn:
+                cursor = conn.cursor()
 
+                if _UPSERT_RETURNING:
+                    pattern_ids = [
+                        cursor.execute(self._UPSERT_PATTERN_SQL, self._insert_params(pattern)).fetchone()[0]
+                        for pattern in patterns
+                    ]
+                else:
+                    pattern_ids = self._write_patterns_probed(cursor, patterns)
+
+            logger.info(f"Saved batch of {len(patterns)} patterns")
+            return pattern_ids
+
+        except Exception as e:
+            logger.error(f"Error saving pattern batch: {e}")
+            return []
+
+    def _write_patterns_probed(self, cursor: sqlite3.Cursor, patterns: List[Dict]) -> List[int]:
+        """Insert or update patterns via an up-front lookup of existing rows (no UPSERT)"""
+        # Latest active row per (symbol, pattern_type) in the batch
+        existing = {}
+        symbols = list({pattern['symbol'] for pattern in patterns})
+        for i in range(0, len(symbols), 500):
+            chunk = symbols[i:i + 500]
+            cursor.execute(f'''
+                SELECT id, symbol, pattern_type FROM patterns
+                WHERE active = 1 AND symbol IN ({', '.join('?' * len(chunk))})
+                ORDER BY detected_at DESC
+            ''', chunk)
+            for pattern_id, symbol, pattern_type in cursor.fetchall():
+                existing.setdefault((symbol, pattern_type), pattern_id)
+
+        pattern_ids = []
+        updates = []
+        for pattern in patterns:
+            key = (pattern['symbol'], pattern['pattern_type'])
+            pattern_id = existing.get(key)
+
+            if pattern_id is None:
+                # Inserted one at a time for lastrowid; a repeat of the
+                # same pattern later in the batch becomes an update
+                cursor.execute(self._INSERT_PATTERN_SQL, self._insert_params(pattern))
                 pattern_id = cursor.lastrowid
-                logger.info(f"Saved new pattern {pattern_id} for {pattern['symbol']}")
+                existing[key] = pattern_id
+            else:
+                updates.append(self._update_params(pattern, pattern_id))
 
-            conn.commit()
-            conn.close()
+            pattern_ids.append(pattern_id)
 
-            return pattern_id
+        if updates:
+            cursor.executemany(self._UPDATE_PATTERN_SQL, updates)
 
-        except Exception as e:
-            logger.error(f"Error saving pattern: {e}")
-            return -1
+        return pattern_ids
+
+    def save_patterns_async(self, patterns: List[Dict],
+                            on_saved: Optional[Callable[[List[int]], None]] = None):
+        """
+        Queue a batch of patterns for the background writer and return immediately
+
+        Batches queued close together are written in one transaction. Blocks
+        only if WRITE_QUEUE_SIZE batches are already waiting.
+
+        Args:
+            patterns: Pattern dicts as returned by PatternDetector
+            on_saved: Called on the writer thread with the pattern IDs (empty
+                if the save failed) once the batch is committed
+        """
+        self._write_queue.put((patterns, on_saved))
+
+    def flush(self):
+        """Block until every queued pattern batch has been written"""
+        self._write_queue.join()
+
+    def close(self):
+        """Write any queued batches and stop the background writer"""
+        self._write_queue.put(None)
+        self._writer.join()
+
+    def _writer_loop(self):
+        """Drain queued batches, merging up to WRITE_DRAIN_MAX per transaction"""
+        while True:
+            items = [self._write_queue.get()]
+            while items[-1] is not None and len(items) < WRITE_DRAIN_MAX:
+                try:
+                    items.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = items[-1] is None
+            batches = [item for item in items if item is not None]
+
+            merged = [p for patterns, _ in batches for p in patterns]
+            pattern_ids = self.save_patterns(merged)
+
+            if len(pattern_ids) == len(merged):
+                results = []
+                offset = 0
+                for patterns, _ in batches:
+                    results.append(pattern_ids[offset:offset + len(patterns)])
+                    offset += len(patterns)
+            elif len(batches) > 1:
+                # The merged save failed (save_patterns rolled it back): retry
+                # each batch alone so only the one with the bad row gets []
+                results = [self.save_patterns(patterns) for patterns, _ in batches]
+            else:
+                results = [pattern_ids]
+
+            for (_, on_saved), ids in zip(batches, results):
+                if on_saved:
+                    try:
+                        on_saved(ids)
+                    except Exception as e:
+                        logger.error(f"Error in pattern save callback: {e}")
+
+            for _ in items:
+                self._write_queue.task_done()
+
+            if stop:
+                return
+
+    # Invariant SQL text so sqlite3's statement cache skips re-parsing
+    _INSERT_PATTERN_SQL = '''
+        INSERT INTO patterns (
+            symbol, pattern_type, state, strength_score,
+            current_price, breakout_point, distance_pct,
+            invalidation_point, target1, target2, target3,
+            stop_loss, volume_confirmed, details
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    # Same columns as _UPDATE_PATTERN_SQL are refreshed on conflict
+    _UPSERT_PATTERN_SQL = _INSERT_PATTERN_SQL + '''
+        ON CONFLICT (symbol, pattern_type) WHERE active = 1 DO UPDATE SET
+            state = excluded.state,
+            strength_score = excluded.strength_score,
+            current_price = excluded.current_price,
+            breakout_point = excluded.breakout_point,
+            distance_pct = excluded.distance_pct,
+            volume_confirmed = excluded.volume_confirmed,
+            details = excluded.details,
+            updated_at = CURRENT_TIMESTAMP
+        RETURNING id
+    '''
+
+    _UPDATE_PATTERN_SQL = '''
+        UPDATE patterns SET
+            state = ?,
+            strength_score = ?,
+            current_price = ?,
+            breakout_point = ?,
+            distance_pct = ?,
+            volume_confirmed = ?,
+            details = ?,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    '''
+
+    # Fixed-schema columns pulled from a pattern dict in one C-level call
+    _INSERT_FIELDS = operator.itemgetter(
+        'symbol', 'pattern_type', 'state', 'strength_score',
+        'current_price', 'breakout_point', 'distance_pct',
+        'invalidation_point', 'target1', 'target2', 'target3', 'stop_loss'
+    )
+    _UPDATE_FIELDS = operator.itemgetter(
+        'state', 'strength_score', 'current_price', 'breakout_point', 'distance_pct'
+    )
+
+    @classmethod
+    def _insert_params(cls, pattern: Dict) -> tuple:
+        """Positional parameters for _INSERT_PATTERN_SQL"""
+        return cls._INSERT_FIELDS(pattern) + (
+            1 if pattern['volume_confirmed'] else 0,
+            _dump_details(pattern.get('details'))
+        )
+
+    @classmethod
+    def _update_params(cls, pattern: Dict, pattern_id: int) -> tuple:
+        """Positional parameters for _UPDATE_PATTERN_SQL"""
+        return cls._UPDATE_FIELDS(pattern) + (
+            1 if pattern['volume_confirmed'] else 0,
+            _dump_details(pattern.get('details')),
+            pattern_id
+        )
+
+    _INSERT_ALERT_SQL = '''
+        INSERT INTO alerts (
+            pattern_id, symbol, pattern_type, alert_type,
+            price, strength_score, message
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    '''
 
     def save_alert(self, pattern_id: int, symbol: str, pattern_type: str,
                    alert_type: str, price: float, strength_score: int,
                    message: str = "") -> bool:
         """Save alert to database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                INSERT INTO alerts (
-                    pattern_id, symbol, pattern_type, alert_type,
-                    price, strength_score, message
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (pattern_id, symbol, pattern_type, alert_type, price, strength_score, message))
+            with self._write() as conn:
+                cursor = conn.cursor()
 
-            conn.commit()
-            conn.close()
+                cursor.execute(self._INSERT_ALERT_SQL, (pattern_id, symbol, pattern_type, alert_type, price, strength_score, message))
 
             logger.info(f"Saved alert: {alert_type} for {symbol}")
             return True
@@ -263,61 +847,160 @@ class DataManager:
             logger.error(f"Error saving alert: {e}")
             return False
 
-    def get_active_patterns(self, symbol: Optional[str] = None) -> pd.DataFrame:
+    def save_alerts(self, alerts: List[Dict]) -> bool:
+        """
+        Save a batch of alerts in a single transaction
+
+        Args:
+            alerts: Dicts with the save_alert fields (pattern_id, symbol,
+                pattern_type, alert_type, price, strength_score, optional message)
+
+        Returns:
+            bool: True if the whole batch was saved
+        """
+        if not alerts:
+            return True
+
+        try:
+            with self._write() as conn:
+                cursor = conn.cursor()
+
+                cursor.executemany(self._INSERT_ALERT_SQL, [
+                    (alert['pattern_id'], alert['symbol'], alert['pattern_type'],
+                     alert['alert_type'], alert['price'], alert['strength_score'],
+                     alert.get('message', ''))
+                    for alert in alerts
+                ])
+
+            logger.info(f"Saved batch of {len(alerts)} alerts")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error saving alert batch: {e}")
+            return False
+
+    # Column types for get_active_patterns, so pandas doesn't infer them per
+    # call (and all-NULL target columns still come back numeric)
+    _ACTIVE_PATTERN_DTYPES = {
+        'strength_score': 'Int32',
+        'current_price': 'float64',
+        'breakout_point': 'float64',
+        'distance_pct': 'float64',
+        'target1': 'float64',
+        'target2': 'float64',
+        'target3': 'float64',
+        'stop_loss': 'float64',
+    }
+
+    def get_active_patterns(self, symbol: Optional[str] = None,
+                            pattern_types: Optional[List[str]] = None,
+                            states: Optional[List[str]] = None,
+                            min_strength: int = 0) -> pd.DataFrame:
         """
         Get all active patterns
 
+        Filters are applied in SQL, so only matching rows are loaded.
+
         Args:
             symbol: Optional filter by symbol
+            pattern_types: Optional filter by pattern type (empty list matches nothing)
+            states: Optional filter by state (empty list matches nothing)
+            min_strength: Minimum strength score
 
         Returns:
             DataFrame with active patterns
         """
         try:
-            conn = sqlite3.connect(self.db_path)
+            with self._read() as conn:
+                query = '''
+                    SELECT
+                        symbol, pattern_type, state, strength_score,
+                        current_price, breakout_point, distance_pct,
+                        target1, target2, target3, stop_loss,
+                        detected_at, updated_at
+                    FROM patterns
+                    WHERE active = 1
+                '''
+                params = []
 
-            query = '''
-                SELECT
-                    symbol, pattern_type, state, strength_score,
-                    current_price, breakout_point, distance_pct,
-                    target1, target2, target3, stop_loss,
-                    detected_at, updated_at
-                FROM patterns
-                WHERE active = 1
-            '''
+                if symbol:
+                    query += " AND symbol = ?"
+                    params.append(symbol)
 
-            if symbol:
-                query += f" AND symbol = '{symbol}'"
+                if pattern_types is not None:
+                    query += f" AND pattern_type IN ({', '.join('?' * len(pattern_types))})"
+                    params.extend(pattern_types)
 
-            query += " ORDER BY updated_at DESC"
+                if states is not None:
+                    query += f" AND state IN ({', '.join('?' * len(states))})"
+                    params.extend(states)
 
-            df = pd.read_sql_query(query, conn)
-            conn.close()
+                if min_strength:
+                    query += " AND strength_score >= ?"
+                    params.append(min_strength)
 
-            return df
+                query += " ORDER BY updated_at DESC"
+
+                df = pd.read_sql_query(query, conn, params=params,
+                                       dtype=self._ACTIVE_PATTERN_DTYPES,
+                                       parse_dates=['detected_at', 'updated_at'])
+
+                return df
 
         except Exception as e:
             logger.error(f"Error fetching active patterns: {e}")
             return pd.DataFrame()
 
+    def get_active_filter_options(self) -> Dict[str, List[str]]:
+        """
+        Get the distinct pattern types and states among active patterns
+
+        Returns:
+            dict: 'pattern_types' and 'states' lists (empty if none active)
+        """
+        try:
+            with self._read() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('SELECT DISTINCT pattern_type FROM patterns WHERE active = 1 ORDER BY pattern_type')
+                pattern_types = [row[0] for row in cursor.fetchall()]
+
+                cursor.execute('SELECT DISTINCT state FROM patterns WHERE active = 1 ORDER BY state')
+                states = [row[0] for row in cursor.fetchall()]
+
+                return {'pattern_types': pattern_types, 'states': states}
+
+        except Exception as e:
+            logger.error(f"Error fetching filter options: {e}")
+            return {'pattern_types': [], 'states': []}
+
+    _ALERT_COLUMNS = ('symbol', 'pattern_type', 'alert_type', 'price',
+                      'strength_score', 'message', 'timestamp')
+
+    _RECENT_ALERTS_SQL = f'''
+        SELECT {', '.join(_ALERT_COLUMNS)}
+        FROM alerts
+        ORDER BY timestamp DESC
+        LIMIT ?
+    '''
+
     def get_recent_alerts(self, limit: int = 50) -> pd.DataFrame:
-        """Get recent alerts"""
+        """
+        Get recent alerts
+
+        The result is small and polled often, so rows go straight into
+        DataFrame.from_records rather than through read_sql_query.
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
+            with self._read() as conn:
+                cursor = conn.cursor()
 
-            query = f'''
-                SELECT
-                    symbol, pattern_type, alert_type, price,
-                    strength_score, message, timestamp
-                FROM alerts
-                ORDER BY timestamp DESC
-                LIMIT {limit}
-            '''
+                cursor.execute(self._RECENT_ALERTS_SQL, (int(limit),))
 
-            df = pd.read_sql_query(query, conn)
-            conn.close()
+                df = pd.DataFrame.from_records(cursor.fetchall(), columns=self._ALERT_COLUMNS)
+                df['price'] = df['price'].astype('float64', copy=False)
 
-            return df
+                return df
 
         except Exception as e:
             logger.error(f"Error fetching alerts: {e}")
@@ -331,47 +1014,43 @@ class DataManager:
             dict: Statistics including success rate, pattern distribution, etc.
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            stats = {}
-
-            # Total patterns detected
-            cursor.execute('SELECT COUNT(*) FROM patterns')
-            stats['total_patterns'] = cursor.fetchone()[0]
-
-            # Confirmed breakouts
-            cursor.execute('SELECT COUNT(*) FROM patterns WHERE state = "BREAKOUT_CONFIRMED"')
-            stats['confirmed_breakouts'] = cursor.fetchone()[0]
-
-            # Pattern distribution
-            cursor.execute('''
-                SELECT pattern_type, COUNT(*) as count
-                FROM patterns
-                WHERE active = 1
-                GROUP BY pattern_type
-            ''')
-            stats['pattern_distribution'] = dict(cursor.fetchall())
-
-            # Average strength score
-            cursor.execute('SELECT AVG(strength_score) FROM patterns WHERE active = 1')
-            result = cursor.fetchone()[0]
-            stats['avg_strength'] = result if result else 0
-
-            # Success rate (from pattern_stats table)
-            cursor.execute('SELECT COUNT(*) FROM pattern_stats WHERE success = 1')
-            successful = cursor.fetchone()[0]
-            cursor.execute('SELECT COUNT(*) FROM pattern_stats')
-            total_closed = cursor.fetchone()[0]
-
-            if total_closed > 0:
-                stats['success_rate'] = (successful / total_closed) * 100
-            else:
-                stats['success_rate'] = 0
+            with self._read() as conn:
+                cursor = conn.cursor()
 
-            conn.close()
+                stats = {}
 
-            return stats
+                # Totals and average strength in one pass over patterns
+                cursor.execute('''
+                    SELECT
+                        COUNT(*),
+                        COALESCE(SUM(state = 'BREAKOUT_CONFIRMED'), 0),
+                        AVG(CASE WHEN active = 1 THEN strength_score END)
+                    FROM patterns
+                ''')
+                total, confirmed, avg_strength = cursor.fetchone()
+                stats['total_patterns'] = total
+                stats['confirmed_breakouts'] = confirmed
+                stats['avg_strength'] = avg_strength if avg_strength else 0
+
+                # Pattern distribution
+                cursor.execute('''
+                    SELECT pattern_type, COUNT(*) as count
+                    FROM patterns
+                    WHERE active = 1
+                    GROUP BY pattern_type
+                ''')
+                stats['pattern_distribution'] = dict(cursor.fetchall())
+
+                # Success rate (from pattern_stats table)
+                cursor.execute('SELECT COALESCE(SUM(success = 1), 0), COUNT(*) FROM pattern_stats')
+                successful, total_closed = cursor.fetchone()
+
+                if total_closed > 0:
+                    stats['success_rate'] = (successful / total_closed) * 100
+                else:
+                    stats['success_rate'] = 0
+
+                return stats
 
         except Exception as e:
             logger.error(f"Error fetching statistics: {e}")
@@ -380,16 +1059,13 @@ class DataManager:
     def invalidate_pattern(self, pattern_id: int) -> bool:
         """Mark pattern as inactive (invalidated)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self._write() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('''
-                UPDATE patterns SET active = 0, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (pattern_id,))
-
-            conn.commit()
-            conn.close()
+                cursor.execute('''
+                    UPDATE patterns SET active = 0, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (pattern_id,))
 
             logger.info(f"Invalidated pattern {pattern_id}")
             return True
@@ -411,40 +1087,37 @@ class DataManager:
             bool: Success status
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self._write() as conn:
+                cursor = conn.cursor()
 
-            # Get pattern details
-            cursor.execute('''
-                SELECT symbol, pattern_type, current_price, target3
-                FROM patterns WHERE id = ?
-            ''', (pattern_id,))
-
-            pattern = cursor.fetchone()
-            if not pattern:
-                logger.warning(f"Pattern {pattern_id} not found")
-                return False
+                # Get pattern details
+                cursor.execute('''
+                    SELECT symbol, pattern_type, current_price
+                    FROM patterns WHERE id = ?
+                ''', (pattern_id,))
 
-            symbol, pattern_type, entry_price, target3 = pattern
+                row = cursor.fetchone()
+                if not row:
+                    logger.warning(f"Pattern {pattern_id} not found")
+                    return False
 
-            # Calculate profit/loss
-            profit_loss_pct = ((exit_price - entry_price) / entry_price) * 100
-            success = 1 if profit_loss_pct > 0 else 0
+                symbol, pattern_type, entry_price = row['symbol'], row['pattern_type'], row['current_price']
 
-            # Save statistics
-            cursor.execute('''
-                INSERT INTO pattern_stats (
-                    pattern_id, symbol, pattern_type, entry_price,
-                    exit_price, target_hit, profit_loss_pct, success
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (pattern_id, symbol, pattern_type, entry_price,
-                  exit_price, target_hit, profit_loss_pct, success))
+                # Calculate profit/loss
+                profit_loss_pct = ((exit_price - entry_price) / entry_price) * 100
+                success = 1 if profit_loss_pct > 0 else 0
 
-            # Mark pattern as inactive
-            cursor.execute('UPDATE patterns SET active = 0 WHERE id = ?', (pattern_id,))
+                # Save statistics
+                cursor.execute('''
+                    INSERT INTO pattern_stats (
+                        pattern_id, symbol, pattern_type, entry_price,
+                        exit_price, target_hit, profit_loss_pct, success
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (pattern_id, symbol, pattern_type, entry_price,
+                      exit_price, target_hit, profit_loss_pct, success))
 
-            conn.commit()
-            conn.close()
+                # Mark pattern as inactive
+                cursor.execute('UPDATE patterns SET active = 0 WHERE id = ?', (pattern_id,))
 
             logger.info(f"Closed pattern {pattern_id}: {profit_loss_pct:.2f}% P/L")
             return True
@@ -461,20 +1134,35 @@ class DataManager:
             days: Delete patterns inactive for more than this many days
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
             cutoff_date = datetime.now() - timedelta(days=days)
-
-            cursor.execute('''
-                DELETE FROM patterns
-                WHERE active = 0 AND updated_at < ?
-            ''', (cutoff_date,))
-
-            deleted = cursor.rowcount
-
-            conn.commit()
-            conn.close()
+            deleted = 0
+
+            # Delete in chunks, one transaction each, so a large cleanup
+            # doesn't hold the write lock (and grow the WAL) in one go
+            while True:
+                with self._write() as conn:
+                    cursor = conn.cursor()
+
+                    cursor.execute('''
+                        DELETE FROM patterns WHERE id IN (
+                            SELECT id FROM patterns
+                            WHERE active = 0 AND updated_at < ?
+                            LIMIT ?
+                        )
+                    ''', (cutoff_date, CLEANUP_BATCH_SIZE))
+
+                    deleted += cursor.rowcount
+
+                if cursor.rowcount < CLEANUP_BATCH_SIZE:
+                    break
+
+            if deleted:
+                # Return freed pages to the OS (no-op unless auto_vacuum is incremental).
+                # executescript runs the pragma to completion (execute() frees one
+                # page), but it COMMITs any open transaction first, so this runs
+                # after the deletes under the lock alone, not inside _write()'s BEGIN
+                with self._write_lock:
+                    self._rw_conn.executescript('PRAGMA incremental_vacuum(1000);')
 
             logger.info(f"Cleaned up {deleted} old patterns")
 
@@ -515,20 +1203,17 @@ class DataManager:
             bool: Success status
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Convert list to comma-separated string
-            stock_string = ','.join(stocks)
+            with self._write() as conn:
+                cursor = conn.cursor()
 
-            # Insert or update config
-            cursor.execute('''
-                INSERT OR REPLACE INTO config (key, value, updated_at)
-                VALUES ('stock_list', ?, CURRENT_TIMESTAMP)
-            ''', (stock_string,))
+                # Stored as a JSON array, decoded in C by get_stock_list
+                stock_string = json.dumps(list(stocks))
 
-            conn.commit()
-            conn.close()
+                # Insert or update config
+                cursor.execute('''
+                    INSERT OR REPLACE INTO config (key, value, updated_at)
+                    VALUES ('stock_list', ?, CURRENT_TIMESTAMP)
+                ''', (stock_string,))
 
             logger.info(f"Saved {len(stocks)} stocks to database")
             return True
@@ -545,21 +1230,25 @@ class DataManager:
             List of stock symbols, empty list if none saved
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('SELECT value FROM config WHERE key = "stock_list"')
-            result = cursor.fetchone()
-
-            conn.close()
-
-            if result and result[0]:
-                stocks = [s.strip() for s in result[0].split(',') if s.strip()]
-                logger.info(f"Loaded {len(stocks)} stocks from database")
-                return stocks
-            else:
-                logger.info("No saved stock list found in database")
-                return []
+            with self._read() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('SELECT value FROM config WHERE key = "stock_list"')
+                result = cursor.fetchone()
+
+                value = result['value'] if result else None
+
+                if value:
+                    if value.startswith('['):
+                        stocks = json.loads(value)
+                    else:
+                        # Comma-separated list saved by older versions
+                        stocks = [s.strip() for s in value.split(',') if s.strip()]
+                    logger.info(f"Loaded {len(stocks)} stocks from database")
+                    return stocks
+                else:
+                    logger.info("No saved stock list found in database")
+                    return []
 
         except Exception as e:
             logger.error(f"Error loading stock list: {e}")
@@ -576,16 +1265,13 @@ class DataManager:
             bool: Success status
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self._write() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('''
-                INSERT OR REPLACE INTO config (key, value, updated_at)
-                VALUES ('scanner_active', ?, CURRENT_TIMESTAMP)
-            ''', ('1' if active else '0',))
-
-            conn.commit()
-            conn.close()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO config (key, value, updated_at)
+                    VALUES ('scanner_active', ?, CURRENT_TIMESTAMP)
+                ''', ('1' if active else '0',))
 
             logger.info(f"Saved scanner state: {'Active' if active else 'Inactive'}")
             return True
@@ -602,21 +1288,19 @@ class DataManager:
             bool: Scanner active state (default False)
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('SELECT value FROM config WHERE key = "scanner_active"')
-            result = cursor.fetchone()
-
-            conn.close()
-
-            if result and result[0]:
-                active = result[0] == '1'
-                logger.info(f"Loaded scanner state: {'Active' if active else 'Inactive'}")
-                return active
-            else:
-                logger.info("No saved scanner state found, defaulting to inactive")
-                return False
+            with self._read() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('SELECT value FROM config WHERE key = "scanner_active"')
+                result = cursor.fetchone()
+
+                if result and result['value']:
+                    active = result['value'] == '1'
+                    logger.info(f"Loaded scanner state: {'Active' if active else 'Inactive'}")
+                    return active
+                else:
+                    logger.info("No saved scanner state found, defaulting to inactive")
+                    return False
 
         except Exception as e:
             logger.error(f"Error loading scanner state: {e}")
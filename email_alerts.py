@@ -4,26 +4,338 @@ Sends HTML-formatted email alerts for different pattern states
 """
 
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from typing import Dict
+import ssl
+from email.message import EmailMessage
+from typing import Callable, Dict, List, Optional, Tuple
+import functools
 import logging
+import re
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# A batch stops early once this many sends were attempted and a third failed
+BATCH_ABORT_AFTER = 30
+
+# Outbound token bucket: up to RATE_LIMIT_BURST emails at once, refilled at
+# RATE_LIMIT_PER_MINUTE, to stay under SMTP provider throttling
+RATE_LIMIT_BURST = 20
+RATE_LIMIT_PER_MINUTE = 30
+
+# States that always get their own email, never folded into a digest
+HIGH_IMPACT_STATES = ('BREAKOUT_CONFIRMED', 'BREAKOUT_IMMINENT')
+
+# Fewer remaining alerts than this in one digest go out individually
+DIGEST_MIN_PATTERNS = 2
+
+# Seconds before the same pattern may alert again in the same state
+DEFAULT_COOLDOWNS = {
+    'FORMING': 1800,
+    'NEAR_BREAKOUT': 600,
+    'BREAKOUT_IMMINENT': 120,
+    'BREAKOUT_CONFIRMED': 0,
+}
+
+# Rendered per-state alerts kept for patterns whose levels haven't moved
+RENDER_CACHE_SIZE = 256
+
+# Port that speaks TLS from the first byte (SMTPS); other ports use STARTTLS
+SMTPS_PORT = 465
+
+# Runs of whitespace the templates' source indentation leaves in the HTML.
+# Collapsed to one space, which renders the same.
+_RE_WHITESPACE = re.compile(r'\s+')
+
+# CSS is written as stylesheets below but inlined into style="..." attributes
+# when rendering, since Gmail and Outlook drop or ignore most <style> blocks.
+# Only @-rules (the CONFIRMED pulse keyframes) remain in a <style> block.
+_RE_CSS_RULE = re.compile(r'^\s*(\.?[\w-]+)\s*\{([^{}]*)\}', re.M)
+_RE_CSS_AT_RULE = re.compile(r'^\s*@[^{]*\{(?:[^{}]*\{[^{}]*\})*\s*\}', re.M)
+_RE_CLASS_TAG = re.compile(r'<(\w+)([^>]*?) class="([^"]+)"([^>]*)>')
+_RE_STYLE_ATTR = re.compile(r' style="([^"]*)"')
+
+# Rules every alert email shares. Each alert's style is appended and only
+# adds its colours and sizes on top.
+_BASE_STYLE = """
+    body { font-family: Arial, sans-serif; color: #333; }
+    .content { padding: 20px; }
+    .header { color: white; padding: 20px; text-align: center; }
+    .metric { padding: 10px; margin: 10px 0; }
+    .label { font-weight: bold; color: #666; }
+    .footer { background-color: #f5f5f5; padding: 10px; text-align: center; font-size: 12px; }"""
+
+# Stands in for the generated-at time until the email is sent, so a cached
+# render never carries a stale timestamp
+_TIMESTAMP_SLOT = '<!--generated-at-->'
+
+# Page skeleton shared by all alert emails, filled in by _render_page
+_PAGE_TEMPLATE = """
+<html>
+<head>{head}
+</head>
+<body>
+    <div class="header">{header}
+    </div>
+
+    <div class="content">{content}
+    </div>
+
+    <div class="footer">
+        <p>Generated by Stock Pattern Scanner | {timestamp}</p>{footer}
+    </div>
+</body>
+</html>
+"""
+
+# Per-alert rules layered on top of _BASE_STYLE
+_SUMMARY_STYLE = """
+    .header { background-color: #4CAF50; }
+    .warning { color: #ff9800; font-weight: bold; }"""
+
+_FORMING_STYLE = """
+    .header { background-color: #4CAF50; }
+    .metric { background-color: #f5f5f5; border-left: 4px solid #4CAF50; }
+    .value { font-size: 18px; color: #333; }
+    .warning { color: #ff9800; font-weight: bold; }"""
+
+_NEAR_BREAKOUT_STYLE = """
+    .header { background-color: #FF9800; }
+    .metric { background-color: #fff3e0; border-left: 4px solid #FF9800; }
+    .value { font-size: 18px; color: #333; }
+    .action { background-color: #ffecb3; padding: 15px; margin: 15px 0; border: 2px solid #FF9800; }
+    .highlight { color: #f44336; font-weight: bold; font-size: 20px; }"""
+
+_IMMINENT_STYLE = """
+    .header { background-color: #f44336; }
+    .metric { background-color: #ffebee; border-left: 4px solid #f44336; }
+    .value { font-size: 20px; color: #f44336; font-weight: bold; }
+    .action { background-color: #ffcdd2; padding: 15px; margin: 15px 0; border: 3px solid #f44336; }
+    .urgent { color: #f44336; font-weight: bold; font-size: 24px; text-align: center; }"""
+
+_CONFIRMED_STYLE = """
+    .header { background-color: #4CAF50; animation: pulse 2s infinite; }
+    @keyframes pulse {
+        0%, 100% { opacity: 1; }
+        50% { opacity: 0.8; }
+    }
+    .metric { background-color: #e8f5e9; border-left: 4px solid #4CAF50; }
+    .value { font-size: 22px; color: #4CAF50; font-weight: bold; }
+    .action { background-color: #c8e6c9; padding: 20px; margin: 15px 0; border: 3px solid #4CAF50; }
+    .buy-now { color: #4CAF50; font-weight: bold; font-size: 28px; text-align: center; }"""
+
+_TARGET_HIT_STYLE = """
+    .header { background-color: #2196F3; }
+    .metric { background-color: #e3f2fd; border-left: 4px solid #2196F3; }
+    .value { font-size: 20px; color: #2196F3; font-weight: bold; }
+    .action { background-color: #bbdefb; padding: 15px; margin: 15px 0; border: 2px solid #2196F3; }"""
+
+
+@functools.lru_cache(maxsize=1)
+def _ssl_context() -> ssl.SSLContext:
+    """
+    TLS context shared by every SMTP connect
+
+    Built on first use rather than at import, so processes that import this
+    module but never send don't pay for loading the CA store.
+    """
+    return ssl.create_default_context()
+
+
+@functools.lru_cache(maxsize=1024)
+def _display_symbol(symbol: str) -> str:
+    """Ticker without the .NS exchange suffix, as shown in emails"""
+    return symbol.replace('.NS', '')
+
+
+@functools.lru_cache(maxsize=64)
+def _display_name(name: str) -> str:
+    """Readable form of a pattern type or state, e.g. cup_and_handle -> Cup And Handle"""
+    return name.replace('_', ' ').title()
+
+
+@functools.lru_cache(maxsize=1)
+def _footer_timestamp(epoch_second: int) -> str:
+    """Footer timestamp, formatted once per second however many emails render in it"""
+    return datetime.fromtimestamp(epoch_second).strftime('%Y-%m-%d %H:%M:%S IST')
+
+
+@functools.lru_cache(maxsize=16)
+def _compile_style(style: str) -> Tuple[Dict[str, str], str]:
+    """
+    Split an alert's stylesheet (on top of _BASE_STYLE) for inlining
+
+    Returns:
+        (rules, at_rules): declarations per element or class name, later
+        rules appended so they win as in the stylesheet, and the @-rule
+        source that has to stay in a <style> block
+    """
+    css = _BASE_STYLE + style
+    rules = {}
+    for name, declarations in _RE_CSS_RULE.findall(css):
+        declarations = declarations.strip().rstrip(';')
+        name = name.lstrip('.')
+        rules[name] = f"{rules[name]}; {declarations}" if name in rules else declarations
+
+    at_rules = ''.join(_RE_CSS_AT_RULE.findall(css))
+    return rules, at_rules
+
+
+def _inline_styles(html: str, rules: Dict[str, str]) -> str:
+    """Replace class attributes with the matching style declarations"""
+    def inline(match):
+        tag, before, classes, after = match.groups()
+        # Stylesheet order, not class attribute order, decides which rule wins
+        names = classes.split()
+        css = '; '.join(declarations for name, declarations in rules.items() if name in names)
+        attrs = before + after
+
+        # An element's own style still overrides its classes
+        own = _RE_STYLE_ATTR.search(attrs)
+        if own:
+            css = f"{css}; {own.group(1)}" if css else own.group(1)
+            attrs = attrs[:own.start()] + attrs[own.end():]
+
+        return f'<{tag}{attrs} style="{css}">' if css else f'<{tag}{attrs}>'
+
+    html = _RE_CLASS_TAG.sub(inline, html)
+    if 'body' in rules:
+        html = html.replace('<body>', f'<body style="{rules["body"]}">', 1)
+    return html
+
+
+def _render_page(style: str, header: str, content: str, footer: str = '') -> str:
+    """
+    Wrap an alert's header and content markup in the shared page skeleton
+
+    The style is inlined (see _compile_style). The footer time is left as
+    _TIMESTAMP_SLOT and filled in at send time.
+
+    Args:
+        style: CSS rules specific to this alert
+        header: Markup for the header banner
+        content: Markup for the email body
+        footer: Extra markup below the generated-at line
+    """
+    rules, at_rules = _compile_style(style)
+    html = _PAGE_TEMPLATE.format(
+        head=f"\n    <style>{at_rules}\n    </style>" if at_rules else '',
+        header=header,
+        content=content,
+        footer=footer,
+        timestamp=_TIMESTAMP_SLOT,
+    )
+    return _inline_styles(html, rules)
+
+
+def _minify(html: str) -> str:
+    """Collapse the indentation and blank lines in rendered HTML before sending"""
+    return _RE_WHITESPACE.sub(' ', html).strip()
+
 
 class EmailAlertSystem:
     """Manages email alerts for pattern detection"""
 
     def __init__(self, smtp_server: str, smtp_port: int, sender_email: str,
-                 sender_password: str, recipient_email: str):
+                 sender_password: str, recipient_email: str,
+                 rate_limit_burst: int = RATE_LIMIT_BURST,
+                 rate_limit_per_minute: float = RATE_LIMIT_PER_MINUTE,
+                 drop_over_limit: bool = False):
+        """
+        Args:
+            rate_limit_burst: Emails that may go out back to back
+            rate_limit_per_minute: Sustained emails per minute once the burst is used
+            drop_over_limit: Drop emails over the limit instead of waiting for a token
+        """
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
         self.sender_email = sender_email
         self.sender_password = sender_password
         self.recipient_email = recipient_email
 
+        # SMTP session kept open across sends (see _get_smtp)
+        self._smtp = None
+        self._smtp_lock = threading.Lock()
+
+        # Message reused for every send (guarded by _smtp_lock). From/To are
+        # fixed for this instance; only Subject and the body change.
+        self._msg = EmailMessage()
+        self._msg['From'] = sender_email
+        self._msg['To'] = recipient_email
+
+        # Last successful alert per (symbol, pattern_type, state), monotonic seconds
+        self._last_sent = {}
+        self._cooldowns = dict(DEFAULT_COOLDOWNS)
+
+        # Token bucket state (guarded by _smtp_lock, like every send)
+        self._bucket_size = rate_limit_burst
+        self._bucket_rate = rate_limit_per_minute / 60.0
+        self._bucket_tokens = float(rate_limit_burst)
+        self._bucket_last = time.monotonic()
+        self._drop_over_limit = drop_over_limit
+
+        # Bound renderer per state, resolved once instead of on every alert
+        self._dispatch = {state: getattr(self, name) for state, name in self._ALERT_RENDERERS.items()}
+
+        # LRU of rendered alerts keyed by _render_key
+        self._render_cache = OrderedDict()
+        self._render_lock = threading.Lock()
+
+    def set_cooldown(self, state: str, seconds: float):
+        """Set how long a pattern stays quiet in a state after alerting (0 disables)"""
+        self._cooldowns[state] = seconds
+
+    def _is_due(self, pattern: Dict) -> bool:
+        """False while the pattern's last alert in this state is within its cooldown"""
+        key = (pattern['symbol'], pattern['pattern_type'], pattern['state'])
+        last = self._last_sent.get(key)
+        return last is None or time.monotonic() - last >= self._cooldowns.get(pattern['state'], 0)
+
+    def _should_send(self, pattern: Dict) -> bool:
+        """
+        Whether an alert for the pattern would go out right now
+
+        Checked before rendering, so suppressed alerts never build their HTML:
+        the state must have an alert, the pattern must be out of its
+        cooldown, and with drop_over_limit the token bucket must not be empty.
+        """
+        if pattern['state'] not in self._dispatch or not self._is_due(pattern):
+            return False
+        return not self._drop_over_limit or self._tokens_available() >= 1
+
+    def _tokens_available(self) -> float:
+        """Tokens the bucket would hold now, without taking one"""
+        elapsed = time.monotonic() - self._bucket_last
+        return min(self._bucket_size, self._bucket_tokens + elapsed * self._bucket_rate)
+
+    def _take_token(self) -> bool:
+        """
+        Take one send from the token bucket (caller must hold _smtp_lock)
+
+        Waits for the next token when the bucket is empty, unless
+        drop_over_limit is set, in which case it returns False instead.
+        """
+        self._bucket_tokens = self._tokens_available()
+        self._bucket_last = time.monotonic()
+
+        if self._bucket_tokens < 1:
+            if self._drop_over_limit:
+                return False
+            time.sleep((1 - self._bucket_tokens) / self._bucket_rate)
+            self._bucket_tokens = 1.0
+            self._bucket_last = time.monotonic()
+
+        self._bucket_tokens -= 1
+        return True
+
+    def _mark_sent(self, patterns: List[Dict]):
+        """Start the cooldown for patterns whose alert just went out"""
+        now = time.monotonic()
+        for pattern in patterns:
+            self._last_sent[(pattern['symbol'], pattern['pattern_type'], pattern['state'])] = now
+
     def send_pattern_alert(self, pattern: Dict) -> bool:
         """
         Send email alert based on pattern state
@@ -35,527 +347,723 @@ class EmailAlertSystem:
         - BREAKOUT_CONFIRMED: Buy signal
         """
         try:
-            state = pattern['state']
+            if not self._should_send(pattern):
+                return False
 
-            if state == 'FORMING':
-                return self._send_forming_alert(pattern)
-            elif state == 'NEAR_BREAKOUT':
-                return self._send_near_breakout_alert(pattern)
-            elif state == 'BREAKOUT_IMMINENT':
-                return self._send_imminent_alert(pattern)
-            elif state == 'BREAKOUT_CONFIRMED':
-                return self._send_confirmed_alert(pattern)
+            if not self._send_email(*self._render_pattern_alert(pattern)):
+                return False
 
-            return False
+            self._mark_sent([pattern])
+            return True
 
         except Exception as e:
-            logger.error(f"Failed to send email alert: {e}")
+            logger.error("Failed to send email alert: %s", e)
             return False
 
-    def _send_forming_alert(self, pattern: Dict) -> bool:
-        """A) PATTERN FORMING - Initial detection"""
-        symbol = pattern['symbol'].replace('.NS', '')
-        pattern_name = pattern['pattern_type'].replace('_', ' ').title()
+    # Alert template per pattern state; states not listed don't alert
+    _ALERT_RENDERERS = {
+        'FORMING': '_render_forming_alert',
+        'NEAR_BREAKOUT': '_render_near_breakout_alert',
+        'BREAKOUT_IMMINENT': '_render_imminent_alert',
+        'BREAKOUT_CONFIRMED': '_render_confirmed_alert',
+    }
 
-        subject = f"📊 PATTERN FORMING: {symbol} - {pattern_name}"
+    def _render_pattern_alert(self, pattern: Dict) -> Optional[Tuple[str, str]]:
+        """
+        (subject, body) of the alert for the pattern's state, or None if it has none
 
-        body = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; color: #333; }}
-                .header {{ background-color: #4CAF50; color: white; padding: 20px; text-align: center; }}
-                .content {{ padding: 20px; }}
-                .metric {{ background-color: #f5f5f5; padding: 10px; margin: 10px 0; border-left: 4px solid #4CAF50; }}
-                .label {{ font-weight: bold; color: #666; }}
-                .value {{ font-size: 18px; color: #333; }}
-                .footer {{ background-color: #f5f5f5; padding: 10px; text-align: center; font-size: 12px; }}
-                .warning {{ color: #ff9800; font-weight: bold; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>📊 PATTERN FORMING</h1>
-                <h2>{symbol} - {pattern_name}</h2>
-            </div>
-
-            <div class="content">
-                <p>A bullish <strong>{pattern_name}</strong> pattern has been detected in <strong>{symbol}</strong>.</p>
-
-                <div class="metric">
-                    <span class="label">Current Price:</span>
-                    <span class="value">₹{pattern['current_price']:.2f}</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Breakout Point:</span>
-                    <span class="value">₹{pattern['breakout_point']:.2f}</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Distance to Breakout:</span>
-                    <span class="value">{pattern['distance_pct']:.2f}%</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Pattern Strength Score:</span>
-                    <span class="value">{pattern['strength_score']}/100</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Invalidation Point:</span>
-                    <span class="value warning">₹{pattern['invalidation_point']:.2f}</span>
-                </div>
-
-                <hr>
-
-                <h3>📊 Potential Targets</h3>
-                <ul>
-                    <li><strong>Target 1:</strong> ₹{pattern['target1']:.2f} (+{((pattern['target1']/pattern['current_price']-1)*100):.2f}%)</li>
-                    <li><strong>Target 2:</strong> ₹{pattern['target2']:.2f} (+{((pattern['target2']/pattern['current_price']-1)*100):.2f}%)</li>
-                    <li><strong>Target 3:</strong> ₹{pattern['target3']:.2f} (+{((pattern['target3']/pattern['current_price']-1)*100):.2f}%)</li>
-                </ul>
-
-                <h3>⚠️ Risk Management</h3>
-                <ul>
-                    <li><strong>Stop Loss:</strong> ₹{pattern['stop_loss']:.2f}</li>
-                    <li><strong>Risk:</strong> {((pattern['current_price']-pattern['stop_loss'])/pattern['current_price']*100):.2f}%</li>
-                    <li><strong>Reward (Target 3):</strong> {((pattern['target3']-pattern['current_price'])/pattern['current_price']*100):.2f}%</li>
-                </ul>
-
-                <p class="warning">⚠️ Pattern is FORMING. Wait for breakout confirmation before taking position.</p>
-            </div>
-
-            <div class="footer">
-                <p>Generated by Stock Pattern Scanner | {datetime.now().strftime('%Y-%m-%d %H:%M:%S IST')}</p>
-            </div>
-        </body>
-        </html>
+        A stock hovering near its breakout is re-detected with the same
+        levels scan after scan, so renders are cached by _render_key.
         """
+        renderer = self._dispatch.get(pattern['state'])
+        if renderer is None:
+            return None
 
-        return self._send_email(subject, body)
+        try:
+            key = self._render_key(pattern)
+        except (ValueError, OverflowError):
+            # A NaN or infinite price can't be rounded; render it uncached
+            return renderer(pattern)
+
+        with self._render_lock:
+            message = self._render_cache.get(key)
+            if message is not None:
+                self._render_cache.move_to_end(key)
+                return message
+
+        message = renderer(pattern)
+
+        with self._render_lock:
+            self._render_cache[key] = message
+            if len(self._render_cache) > RENDER_CACHE_SIZE:
+                self._render_cache.popitem(last=False)
+
+        return message
+
+    @staticmethod
+    def _render_key(pattern: Dict) -> tuple:
+        """Everything a per-state alert shows, with prices and percents in hundredths"""
+        return (
+            pattern['state'], pattern['symbol'], pattern['pattern_type'],
+            round(pattern['current_price'] * 100), round(pattern['breakout_point'] * 100),
+            round(pattern['stop_loss'] * 100), round(pattern['target1'] * 100),
+            round(pattern['target2'] * 100), round(pattern['target3'] * 100),
+            round(pattern['distance_pct'] * 100), round(pattern['invalidation_point'] * 100),
+            pattern['strength_score'], bool(pattern['volume_confirmed']),
+        )
+
+    def send_batch(self, patterns: List[Dict]) -> int:
+        """
+        Send one alert email per pattern over a single SMTP session
 
-    def _send_near_breakout_alert(self, pattern: Dict) -> bool:
-        """B) NEAR BREAKOUT - Within 2%"""
-        symbol = pattern['symbol'].replace('.NS', '')
-        pattern_name = pattern['pattern_type'].replace('_', ' ').title()
-
-        subject = f"⚠️ NEAR BREAKOUT: {symbol} - Only {abs(pattern['distance_pct']):.2f}% Away!"
-
-        body = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; color: #333; }}
-                .header {{ background-color: #FF9800; color: white; padding: 20px; text-align: center; }}
-                .content {{ padding: 20px; }}
-                .metric {{ background-color: #fff3e0; padding: 10px; margin: 10px 0; border-left: 4px solid #FF9800; }}
-                .label {{ font-weight: bold; color: #666; }}
-                .value {{ font-size: 18px; color: #333; }}
-                .action {{ background-color: #ffecb3; padding: 15px; margin: 15px 0; border: 2px solid #FF9800; }}
-                .footer {{ background-color: #f5f5f5; padding: 10px; text-align: center; font-size: 12px; }}
-                .highlight {{ color: #f44336; font-weight: bold; font-size: 20px; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>⚠️ NEAR BREAKOUT ALERT</h1>
-                <h2>{symbol} - {pattern_name}</h2>
-                <p class="highlight">Only {abs(pattern['distance_pct']):.2f}% from breakout!</p>
-            </div>
-
-            <div class="content">
-                <div class="metric">
-                    <span class="label">Current Price:</span>
-                    <span class="value">₹{pattern['current_price']:.2f}</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Breakout Point:</span>
-                    <span class="value">₹{pattern['breakout_point']:.2f}</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Pattern Strength:</span>
-                    <span class="value">{pattern['strength_score']}/100</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Volume Status:</span>
-                    <span class="value">{'✅ CONFIRMED' if pattern['volume_confirmed'] else '⚠️ BUILDING'}</span>
-                </div>
-
-                <hr>
-
-                <div class="action">
-                    <h3>📋 Recommended Order Setup</h3>
-                    <ul>
-                        <li><strong>Entry:</strong> ₹{pattern['breakout_point']:.2f} (on breakout)</li>
-                        <li><strong>Stop Loss:</strong> ₹{pattern['stop_loss']:.2f}</li>
-                        <li><strong>Target 1:</strong> ₹{pattern['target1']:.2f}</li>
-                        <li><strong>Target 2:</strong> ₹{pattern['target2']:.2f}</li>
-                        <li><strong>Target 3:</strong> ₹{pattern['target3']:.2f}</li>
-                    </ul>
-
-                    <p><strong>Risk-Reward Ratio:</strong> 1:{((pattern['target3']-pattern['breakout_point'])/(pattern['breakout_point']-pattern['stop_loss'])):.2f}</p>
-                </div>
-
-                <h3>🎯 Action Items</h3>
-                <ol>
-                    <li>Add {symbol} to watchlist</li>
-                    <li>Monitor volume for surge (need >1.5x average)</li>
-                    <li>Prepare buy order at ₹{pattern['breakout_point']:.2f}</li>
-                    <li>Set alert at ₹{pattern['breakout_point']*0.995:.2f} (0.5% below breakout)</li>
-                </ol>
-
-                <p class="highlight">⚠️ Be ready! Breakout could happen anytime.</p>
-            </div>
-
-            <div class="footer">
-                <p>Generated by Stock Pattern Scanner | {datetime.now().strftime('%Y-%m-%d %H:%M:%S IST')}</p>
-            </div>
-        </body>
-        </html>
+        Args:
+            patterns: Patterns to alert on (states without an alert, and
+                patterns still in their cooldown, are skipped)
+
+        Returns:
+            Number of emails sent
         """
+        messages, covered = self._render_batch([p for p in patterns if self._should_send(p)])
+        return self._send_messages(messages, on_sent=lambda i: self._mark_sent(covered[i]))
 
-        return self._send_email(subject, body)
+    def _render_batch(self, patterns: List[Dict]) -> Tuple[List[Tuple[str, str]], List[List[Dict]]]:
+        """
+        Per-pattern alert messages, skipping (and logging) any that fail to build
 
-    def _send_imminent_alert(self, pattern: Dict) -> bool:
-        """C) BREAKOUT IMMINENT - Within 0.5% + volume building"""
-        symbol = pattern['symbol'].replace('.NS', '')
-        pattern_name = pattern['pattern_type'].replace('_', ' ').title()
+        Returns:
+            (messages, covered): covered[i] lists the patterns messages[i] alerts on
+        """
+        messages = []
+        covered = []
+        for pattern in patterns:
+            try:
+                message = self._render_pattern_alert(pattern)
+            except Exception as e:
+                logger.error("Failed to build email alert for %s: %s", pattern.get('symbol'), e)
+                continue
+            if message is not None:
+                messages.append(message)
+                covered.append([pattern])
+
+        return messages, covered
+
+    def send_digest(self, patterns: List[Dict]) -> bool:
+        """
+        Send alerts for a batch of patterns with as few emails as possible
 
-        subject = f"🚨🚨 IMMINENT BREAKOUT: {symbol} - GET READY NOW!"
+        Confirmed and imminent breakouts still get their own email with the
+        full trade plan. Everything else goes out as one summary email once
+        there are at least DIGEST_MIN_PATTERNS of them (otherwise as regular
+        single alerts).
 
-        body = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; color: #333; }}
-                .header {{ background-color: #f44336; color: white; padding: 20px; text-align: center; }}
-                .content {{ padding: 20px; }}
-                .metric {{ background-color: #ffebee; padding: 10px; margin: 10px 0; border-left: 4px solid #f44336; }}
-                .label {{ font-weight: bold; color: #666; }}
-                .value {{ font-size: 20px; color: #f44336; font-weight: bold; }}
-                .action {{ background-color: #ffcdd2; padding: 15px; margin: 15px 0; border: 3px solid #f44336; }}
-                .footer {{ background-color: #f5f5f5; padding: 10px; text-align: center; font-size: 12px; }}
-                .urgent {{ color: #f44336; font-weight: bold; font-size: 24px; text-align: center; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>🚨🚨 IMMINENT BREAKOUT 🚨🚨</h1>
-                <h2>{symbol} - {pattern_name}</h2>
-                <p class="urgent">BREAKOUT EXPECTED ANY MOMENT!</p>
-            </div>
-
-            <div class="content">
-                <p class="urgent">Only ₹{abs(pattern['breakout_point']-pattern['current_price']):.2f} away from breakout!</p>
-
-                <div class="metric">
-                    <span class="label">Current Price:</span>
-                    <span class="value">₹{pattern['current_price']:.2f}</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Breakout Point:</span>
-                    <span class="value">₹{pattern['breakout_point']:.2f}</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Volume Status:</span>
-                    <span class="value">🔥 BUILDING / SURGING</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Pattern Strength:</span>
-                    <span class="value">{pattern['strength_score']}/100</span>
-                </div>
-
-                <hr>
-
-                <div class="action">
-                    <h3>⚡ IMMEDIATE ACTION REQUIRED</h3>
-                    <ol>
-                        <li><strong>OPEN TRADING TERMINAL NOW</strong></li>
-                        <li><strong>Place BUY order at:</strong> ₹{pattern['breakout_point']:.2f}</li>
-                        <li><strong>Set Stop Loss at:</strong> ₹{pattern['stop_loss']:.2f}</li>
-                        <li><strong>Monitor 5-min chart</strong></li>
-                        <li><strong>Watch for volume confirmation</strong> (need 1.3x+ average)</li>
-                    </ol>
-                </div>
-
-                <h3>🎯 Trade Setup</h3>
-                <table style="width:100%; border-collapse: collapse;">
-                    <tr style="background-color:#f5f5f5;">
-                        <td style="padding:10px; border:1px solid #ddd;"><strong>Entry Price</strong></td>
-                        <td style="padding:10px; border:1px solid #ddd;">₹{pattern['breakout_point']:.2f}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding:10px; border:1px solid #ddd;"><strong>Stop Loss</strong></td>
-                        <td style="padding:10px; border:1px solid #ddd;">₹{pattern['stop_loss']:.2f} (-{((pattern['breakout_point']-pattern['stop_loss'])/pattern['breakout_point']*100):.2f}%)</td>
-                    </tr>
-                    <tr style="background-color:#f5f5f5;">
-                        <td style="padding:10px; border:1px solid #ddd;"><strong>Target 1 (Book 30%)</strong></td>
-                        <td style="padding:10px; border:1px solid #ddd;">₹{pattern['target1']:.2f} (+{((pattern['target1']-pattern['breakout_point'])/pattern['breakout_point']*100):.2f}%)</td>
-                    </tr>
-                    <tr>
-                        <td style="padding:10px; border:1px solid #ddd;"><strong>Target 2 (Book 40%)</strong></td>
-                        <td style="padding:10px; border:1px solid #ddd;">₹{pattern['target2']:.2f} (+{((pattern['target2']-pattern['breakout_point'])/pattern['breakout_point']*100):.2f}%)</td>
-                    </tr>
-                    <tr style="background-color:#f5f5f5;">
-                        <td style="padding:10px; border:1px solid #ddd;"><strong>Target 3 (Book 30%)</strong></td>
-                        <td style="padding:10px; border:1px solid #ddd;">₹{pattern['target3']:.2f} (+{((pattern['target3']-pattern['breakout_point'])/pattern['breakout_point']*100):.2f}%)</td>
-                    </tr>
-                </table>
-
-                <p class="urgent">⏰ Stay alert! Breakout can happen in next few minutes!</p>
-            </div>
-
-            <div class="footer">
-                <p>Generated by Stock Pattern Scanner | {datetime.now().strftime('%Y-%m-%d %H:%M:%S IST')}</p>
-            </div>
-        </body>
-        </html>
+        Patterns still in their cooldown are left out.
+
+        Returns:
+            True if every email was sent
         """
+        patterns = [p for p in patterns if self._should_send(p)]
+        urgent = [p for p in patterns if p['state'] in HIGH_IMPACT_STATES]
+        others = [p for p in patterns if p['state'] not in HIGH_IMPACT_STATES]
+
+        if len(others) >= DIGEST_MIN_PATTERNS:
+            messages, covered = self._render_batch(urgent)
+            expected = len(urgent) + 1
+            try:
+                messages.append(self._render_summary_alert(others))
+                covered.append(others)
+            except Exception as e:
+                logger.error("Failed to build digest alert: %s", e)
+        else:
+            messages, covered = self._render_batch(patterns)
+            expected = len(patterns)
+
+        # One SMTP session for the whole digest
+        sent = self._send_messages(messages, on_sent=lambda i: self._mark_sent(covered[i]))
+        return sent == expected
+
+    def _render_summary_alert(self, patterns: List[Dict]) -> Tuple[str, str]:
+        """Summary of several pattern alerts in one email"""
+        state_colors = {
+            'FORMING': '#4CAF50',
+            'NEAR_BREAKOUT': '#ff9800',
+            'BREAKOUT_IMMINENT': '#f44336',
+        }
+
+        symbols = [_display_symbol(p['symbol']) for p in patterns]
+        subject = f"📊 {len(patterns)} PATTERN ALERTS: {', '.join(symbols[:5])}{' ...' if len(symbols) > 5 else ''}"
+
+        rows = []
+        for i, pattern in enumerate(patterns):
+            color = state_colors.get(pattern['state'], '#333')
+            background = ' style="background-color:#f5f5f5;"' if i % 2 else ''
+            rows.append(f"""
+                        <tr{background}>
+                            <td style="padding:8px; border:1px solid #ddd;"><strong>{symbols[i]}</strong></td>
+                            <td style="padding:8px; border:1px solid #ddd;">{_display_name(pattern['pattern_type'])}</td>
+                            <td style="padding:8px; border:1px solid #ddd; color:{color}; font-weight:bold;">{pattern['state'].replace('_', ' ')}</td>
+                            <td style="padding:8px; border:1px solid #ddd;">₹{pattern['current_price']:.2f}</td>
+                            <td style="padding:8px; border:1px solid #ddd;">₹{pattern['breakout_point']:.2f}</td>
+                            <td style="padding:8px; border:1px solid #ddd;">{pattern['distance_pct']:.2f}%</td>
+                            <td style="padding:8px; border:1px solid #ddd;">{pattern['strength_score']}/100</td>
+                            <td style="padding:8px; border:1px solid #ddd;">₹{pattern['stop_loss']:.2f}</td>
+                        </tr>""")
+
+        header = f"""
+        <h1>📊 PATTERN ALERTS</h1>
+        <h2>{len(patterns)} patterns updated</h2>"""
+
+        content = f"""
+        <table style="width:100%; border-collapse: collapse; font-size:14px;">
+            <tr style="background-color:#4CAF50; color:white;">
+                <th style="padding:10px; border:1px solid #ddd;">Stock</th>
+                <th style="padding:10px; border:1px solid #ddd;">Pattern</th>
+                <th style="padding:10px; border:1px solid #ddd;">State</th>
+                <th style="padding:10px; border:1px solid #ddd;">Price</th>
+                <th style="padding:10px; border:1px solid #ddd;">Breakout</th>
+                <th style="padding:10px; border:1px solid #ddd;">Distance</th>
+                <th style="padding:10px; border:1px solid #ddd;">Strength</th>
+                <th style="padding:10px; border:1px solid #ddd;">Stop Loss</th>
+            </tr>{''.join(rows)}
+        </table>
+
+        <p class="warning">⚠️ Wait for breakout confirmation before taking position.</p>"""
+
+        body = _render_page(_SUMMARY_STYLE, header, content)
+
+        return subject, body
+
+    def _render_forming_alert(self, pattern: Dict) -> Tuple[str, str]:
+        """A) PATTERN FORMING - Initial detection"""
+        symbol = _display_symbol(pattern['symbol'])
+        pattern_name = _display_name(pattern['pattern_type'])
 
-        return self._send_email(subject, body)
+        cp = pattern['current_price']
+        bp = pattern['breakout_point']
+        sl = pattern['stop_loss']
+        t1, t2, t3 = pattern['target1'], pattern['target2'], pattern['target3']
+
+        # Percent moves from the current price
+        t1_pct = (t1 / cp - 1) * 100
+        t2_pct = (t2 / cp - 1) * 100
+        t3_pct = (t3 / cp - 1) * 100
+        risk_pct = (cp - sl) / cp * 100
+
+        subject = f"📊 PATTERN FORMING: {symbol} - {pattern_name}"
+
+        header = f"""
+        <h1>📊 PATTERN FORMING</h1>
+        <h2>{symbol} - {pattern_name}</h2>"""
 
-    def _send_confirmed_alert(self, pattern: Dict) -> bool:
+        content = f"""
+        <p>A bullish <strong>{pattern_name}</strong> pattern has been detected in <strong>{symbol}</strong>.</p>
+
+        <div class="metric">
+            <span class="label">Current Price:</span>
+            <span class="value">₹{cp:.2f}</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Breakout Point:</span>
+            <span class="value">₹{bp:.2f}</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Distance to Breakout:</span>
+            <span class="value">{pattern['distance_pct']:.2f}%</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Pattern Strength Score:</span>
+            <span class="value">{pattern['strength_score']}/100</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Invalidation Point:</span>
+            <span class="value warning">₹{pattern['invalidation_point']:.2f}</span>
+        </div>
+
+        <hr>
+
+        <h3>📊 Potential Targets</h3>
+        <ul>
+            <li><strong>Target 1:</strong> ₹{t1:.2f} (+{t1_pct:.2f}%)</li>
+            <li><strong>Target 2:</strong> ₹{t2:.2f} (+{t2_pct:.2f}%)</li>
+            <li><strong>Target 3:</strong> ₹{t3:.2f} (+{t3_pct:.2f}%)</li>
+        </ul>
+
+        <h3>⚠️ Risk Management</h3>
+        <ul>
+            <li><strong>Stop Loss:</strong> ₹{sl:.2f}</li>
+            <li><strong>Risk:</strong> {risk_pct:.2f}%</li>
+            <li><strong>Reward (Target 3):</strong> {t3_pct:.2f}%</li>
+        </ul>
+
+        <p class="warning">⚠️ Pattern is FORMING. Wait for breakout confirmation before taking position.</p>"""
+
+        body = _render_page(_FORMING_STYLE, header, content)
+
+        return subject, body
+
+    def _render_near_breakout_alert(self, pattern: Dict) -> Tuple[str, str]:
+        """B) NEAR BREAKOUT - Within 2%"""
+        symbol = _display_symbol(pattern['symbol'])
+        pattern_name = _display_name(pattern['pattern_type'])
+
+        cp = pattern['current_price']
+        bp = pattern['breakout_point']
+        sl = pattern['stop_loss']
+        t1, t2, t3 = pattern['target1'], pattern['target2'], pattern['target3']
+
+        distance = abs(pattern['distance_pct'])
+        rr = (t3 - bp) / (bp - sl)
+
+        subject = f"⚠️ NEAR BREAKOUT: {symbol} - Only {distance:.2f}% Away!"
+
+        header = f"""
+        <h1>⚠️ NEAR BREAKOUT ALERT</h1>
+        <h2>{symbol} - {pattern_name}</h2>
+        <p class="highlight">Only {distance:.2f}% from breakout!</p>"""
+
+        content = f"""
+        <div class="metric">
+            <span class="label">Current Price:</span>
+            <span class="value">₹{cp:.2f}</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Breakout Point:</span>
+            <span class="value">₹{bp:.2f}</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Pattern Strength:</span>
+            <span class="value">{pattern['strength_score']}/100</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Volume Status:</span>
+            <span class="value">{'✅ CONFIRMED' if pattern['volume_confirmed'] else '⚠️ BUILDING'}</span>
+        </div>
+
+        <hr>
+
+        <div class="action">
+            <h3>📋 Recommended Order Setup</h3>
+            <ul>
+                <li><strong>Entry:</strong> ₹{bp:.2f} (on breakout)</li>
+                <li><strong>Stop Loss:</strong> ₹{sl:.2f}</li>
+                <li><strong>Target 1:</strong> ₹{t1:.2f}</li>
+                <li><strong>Target 2:</strong> ₹{t2:.2f}</li>
+                <li><strong>Target 3:</strong> ₹{t3:.2f}</li>
+            </ul>
+
+            <p><strong>Risk-Reward Ratio:</strong> 1:{rr:.2f}</p>
+        </div>
+
+        <h3>🎯 Action Items</h3>
+        <ol>
+            <li>Add {symbol} to watchlist</li>
+            <li>Monitor volume for surge (need >1.5x average)</li>
+            <li>Prepare buy order at ₹{bp:.2f}</li>
+            <li>Set alert at ₹{bp * 0.995:.2f} (0.5% below breakout)</li>
+        </ol>
+
+        <p class="highlight">⚠️ Be ready! Breakout could happen anytime.</p>"""
+
+        body = _render_page(_NEAR_BREAKOUT_STYLE, header, content)
+
+        return subject, body
+
+    def _render_imminent_alert(self, pattern: Dict) -> Tuple[str, str]:
+        """C) BREAKOUT IMMINENT - Within 0.5% + volume building"""
+        symbol = _display_symbol(pattern['symbol'])
+        pattern_name = _display_name(pattern['pattern_type'])
+
+        cp = pattern['current_price']
+        bp = pattern['breakout_point']
+        sl = pattern['stop_loss']
+        t1, t2, t3 = pattern['target1'], pattern['target2'], pattern['target3']
+
+        # Percent moves from the breakout (entry) price
+        sl_pct = (bp - sl) / bp * 100
+        t1_pct = (t1 - bp) / bp * 100
+        t2_pct = (t2 - bp) / bp * 100
+        t3_pct = (t3 - bp) / bp * 100
+
+        subject = f"🚨🚨 IMMINENT BREAKOUT: {symbol} - GET READY NOW!"
+
+        header = f"""
+        <h1>🚨🚨 IMMINENT BREAKOUT 🚨🚨</h1>
+        <h2>{symbol} - {pattern_name}</h2>
+        <p class="urgent">BREAKOUT EXPECTED ANY MOMENT!</p>"""
+
+        content = f"""
+        <p class="urgent">Only ₹{abs(bp - cp):.2f} away from breakout!</p>
+
+        <div class="metric">
+            <span class="label">Current Price:</span>
+            <span class="value">₹{cp:.2f}</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Breakout Point:</span>
+            <span class="value">₹{bp:.2f}</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Volume Status:</span>
+            <span class="value">🔥 BUILDING / SURGING</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Pattern Strength:</span>
+            <span class="value">{pattern['strength_score']}/100</span>
+        </div>
+
+        <hr>
+
+        <div class="action">
+            <h3>⚡ IMMEDIATE ACTION REQUIRED</h3>
+            <ol>
+                <li><strong>OPEN TRADING TERMINAL NOW</strong></li>
+                <li><strong>Place BUY order at:</strong> ₹{bp:.2f}</li>
+                <li><strong>Set Stop Loss at:</strong> ₹{sl:.2f}</li>
+                <li><strong>Monitor 5-min chart</strong></li>
+                <li><strong>Watch for volume confirmation</strong> (need 1.3x+ average)</li>
+            </ol>
+        </div>
+
+        <h3>🎯 Trade Setup</h3>
+        <table style="width:100%; border-collapse: collapse;">
+            <tr style="background-color:#f5f5f5;">
+                <td style="padding:10px; border:1px solid #ddd;"><strong>Entry Price</strong></td>
+                <td style="padding:10px; border:1px solid #ddd;">₹{bp:.2f}</td>
+            </tr>
+            <tr>
+                <td style="padding:10px; border:1px solid #ddd;"><strong>Stop Loss</strong></td>
+                <td style="padding:10px; border:1px solid #ddd;">₹{sl:.2f} (-{sl_pct:.2f}%)</td>
+            </tr>
+            <tr style="background-color:#f5f5f5;">
+                <td style="padding:10px; border:1px solid #ddd;"><strong>Target 1 (Book 30%)</strong></td>
+                <td style="padding:10px; border:1px solid #ddd;">₹{t1:.2f} (+{t1_pct:.2f}%)</td>
+            </tr>
+            <tr>
+                <td style="padding:10px; border:1px solid #ddd;"><strong>Target 2 (Book 40%)</strong></td>
+                <td style="padding:10px; border:1px solid #ddd;">₹{t2:.2f} (+{t2_pct:.2f}%)</td>
+            </tr>
+            <tr style="background-color:#f5f5f5;">
+                <td style="padding:10px; border:1px solid #ddd;"><strong>Target 3 (Book 30%)</strong></td>
+                <td style="padding:10px; border:1px solid #ddd;">₹{t3:.2f} (+{t3_pct:.2f}%)</td>
+            </tr>
+        </table>
+
+        <p class="urgent">⏰ Stay alert! Breakout can happen in next few minutes!</p>"""
+
+        body = _render_page(_IMMINENT_STYLE, header, content)
+
+        return subject, body
+
+    def _render_confirmed_alert(self, pattern: Dict) -> Tuple[str, str]:
         """D) BREAKOUT CONFIRMED - BUY SIGNAL"""
-        symbol = pattern['symbol'].replace('.NS', '')
-        pattern_name = pattern['pattern_type'].replace('_', ' ').title()
+        symbol = _display_symbol(pattern['symbol'])
+        pattern_name = _display_name(pattern['pattern_type'])
+
+        cp = pattern['current_price']
+        bp = pattern['breakout_point']
+        sl = pattern['stop_loss']
+        t1, t2, t3 = pattern['target1'], pattern['target2'], pattern['target3']
+
+        # Moves from the current (entry) price
+        risk = cp - sl
+        reward = t3 - cp
+        risk_pct = risk / cp * 100
+        t1_pct = (t1 - cp) / cp * 100
+        t2_pct = (t2 - cp) / cp * 100
+        t3_pct = reward / cp * 100
+        rr = reward / risk
 
         subject = f"🚨🚨🚨 BREAKOUT CONFIRMED! BUY {symbol} NOW! 🚨🚨🚨"
 
-        body = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; color: #333; }}
-                .header {{ background-color: #4CAF50; color: white; padding: 20px; text-align: center; animation: pulse 2s infinite; }}
-                @keyframes pulse {{
-                    0%, 100% {{ opacity: 1; }}
-                    50% {{ opacity: 0.8; }}
-                }}
-                .content {{ padding: 20px; }}
-                .metric {{ background-color: #e8f5e9; padding: 10px; margin: 10px 0; border-left: 4px solid #4CAF50; }}
-                .label {{ font-weight: bold; color: #666; }}
-                .value {{ font-size: 22px; color: #4CAF50; font-weight: bold; }}
-                .action {{ background-color: #c8e6c9; padding: 20px; margin: 15px 0; border: 3px solid #4CAF50; }}
-                .footer {{ background-color: #f5f5f5; padding: 10px; text-align: center; font-size: 12px; }}
-                .buy-now {{ color: #4CAF50; font-weight: bold; font-size: 28px; text-align: center; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>🚨🚨🚨 BREAKOUT CONFIRMED 🚨🚨🚨</h1>
-                <h2>{symbol} - {pattern_name}</h2>
-                <p class="buy-now">BUY SIGNAL ACTIVATED!</p>
-            </div>
-
-            <div class="content">
-                <p class="buy-now">✅ Pattern breakout confirmed with volume!</p>
-
-                <div class="metric">
-                    <span class="label">Entry Price:</span>
-                    <span class="value">₹{pattern['current_price']:.2f}</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Breakout Point:</span>
-                    <span class="value">₹{pattern['breakout_point']:.2f}</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Volume Confirmation:</span>
-                    <span class="value">✅ CONFIRMED</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Pattern Strength:</span>
-                    <span class="value">{pattern['strength_score']}/100</span>
-                </div>
-
-                <hr>
-
-                <div class="action">
-                    <h2 style="color:#4CAF50; text-align:center;">📊 TRADE EXECUTION PLAN</h2>
-
-                    <h3>💰 Entry & Exit Levels</h3>
-                    <table style="width:100%; border-collapse: collapse; font-size:16px;">
-                        <tr style="background-color:#4CAF50; color:white;">
-                            <th style="padding:12px; border:1px solid #ddd;">Level</th>
-                            <th style="padding:12px; border:1px solid #ddd;">Price</th>
-                            <th style="padding:12px; border:1px solid #ddd;">Gain/Loss</th>
-                            <th style="padding:12px; border:1px solid #ddd;">Action</th>
-                        </tr>
-                        <tr style="background-color:#e8f5e9;">
-                            <td style="padding:10px; border:1px solid #ddd;"><strong>ENTRY NOW</strong></td>
-                            <td style="padding:10px; border:1px solid #ddd;"><strong>₹{pattern['current_price']:.2f}</strong></td>
-                            <td style="padding:10px; border:1px solid #ddd;">-</td>
-                            <td style="padding:10px; border:1px solid #ddd;"><strong>BUY 100%</strong></td>
-                        </tr>
-                        <tr>
-                            <td style="padding:10px; border:1px solid #ddd;">Stop Loss</td>
-                            <td style="padding:10px; border:1px solid #ddd;">₹{pattern['stop_loss']:.2f}</td>
-                            <td style="padding:10px; border:1px solid #ddd; color:red;">-{((pattern['current_price']-pattern['stop_loss'])/pattern['current_price']*100):.2f}%</td>
-                            <td style="padding:10px; border:1px solid #ddd;">Exit all</td>
-                        </tr>
-                        <tr style="background-color:#f1f8f4;">
-                            <td style="padding:10px; border:1px solid #ddd;">Target 1</td>
-                            <td style="padding:10px; border:1px solid #ddd;">₹{pattern['target1']:.2f}</td>
-                            <td style="padding:10px; border:1px solid #ddd; color:green;">+{((pattern['target1']-pattern['current_price'])/pattern['current_price']*100):.2f}%</td>
-                            <td style="padding:10px; border:1px solid #ddd;">Book 30%</td>
-                        </tr>
-                        <tr>
-                            <td style="padding:10px; border:1px solid #ddd;">Target 2</td>
-                            <td style="padding:10px; border:1px solid #ddd;">₹{pattern['target2']:.2f}</td>
-                            <td style="padding:10px; border:1px solid #ddd; color:green;">+{((pattern['target2']-pattern['current_price'])/pattern['current_price']*100):.2f}%</td>
-                            <td style="padding:10px; border:1px solid #ddd;">Book 40%</td>
-                        </tr>
-                        <tr style="background-color:#f1f8f4;">
-                            <td style="padding:10px; border:1px solid #ddd;">Target 3</td>
-                            <td style="padding:10px; border:1px solid #ddd;">₹{pattern['target3']:.2f}</td>
-                            <td style="padding:10px; border:1px solid #ddd; color:green;">+{((pattern['target3']-pattern['current_price'])/pattern['current_price']*100):.2f}%</td>
-                            <td style="padding:10px; border:1px solid #ddd;">Book 30%</td>
-                        </tr>
-                    </table>
-
-                    <h3 style="margin-top:20px;">📋 Execution Checklist</h3>
-                    <ol style="font-size:16px; line-height:1.8;">
-                        <li>✅ <strong>Buy {symbol} at market price</strong> (or limit at ₹{pattern['current_price']:.2f})</li>
-                        <li>✅ <strong>Immediately set Stop Loss</strong> at ₹{pattern['stop_loss']:.2f}</li>
-                        <li>✅ <strong>Set Target 1 alert</strong> at ₹{pattern['target1']:.2f}</li>
-                        <li>✅ <strong>Set Target 2 alert</strong> at ₹{pattern['target2']:.2f}</li>
-                        <li>✅ <strong>Set Target 3 alert</strong> at ₹{pattern['target3']:.2f}</li>
-                        <li>✅ <strong>Trail stop loss</strong> after Target 1 is hit</li>
-                    </ol>
-
-                    <h3 style="margin-top:20px;">📊 Risk-Reward Analysis</h3>
-                    <ul style="font-size:16px;">
-                        <li><strong>Risk:</strong> ₹{(pattern['current_price']-pattern['stop_loss']):.2f} ({((pattern['current_price']-pattern['stop_loss'])/pattern['current_price']*100):.2f}%)</li>
-                        <li><strong>Reward (T3):</strong> ₹{(pattern['target3']-pattern['current_price']):.2f} ({((pattern['target3']-pattern['current_price'])/pattern['current_price']*100):.2f}%)</li>
-                        <li><strong>R:R Ratio:</strong> 1:{((pattern['target3']-pattern['current_price'])/(pattern['current_price']-pattern['stop_loss'])):.2f}</li>
-                    </ul>
-                </div>
-
-                <h3 style="color:#4CAF50;">🎯 Profit Booking Strategy</h3>
-                <ol style="font-size:15px;">
-                    <li><strong>At Target 1 (₹{pattern['target1']:.2f}):</strong> Book 30% profit, move SL to entry</li>
-                    <li><strong>At Target 2 (₹{pattern['target2']:.2f}):</strong> Book 40% more, trail SL to T1</li>
-                    <li><strong>At Target 3 (₹{pattern['target3']:.2f}):</strong> Book remaining 30%, trail SL to T2</li>
-                </ol>
-
-                <p style="text-align:center; font-size:18px; color:#4CAF50; font-weight:bold; margin-top:20px;">
-                    🚀 Act now! Momentum is building! 🚀
-                </p>
-            </div>
-
-            <div class="footer">
-                <p>Generated by Stock Pattern Scanner | {datetime.now().strftime('%Y-%m-%d %H:%M:%S IST')}</p>
-                <p style="color:#666; font-style:italic;">This is not financial advice. Trade at your own risk.</p>
-            </div>
-        </body>
-        </html>
-        """
-
-        return self._send_email(subject, body)
+        header = f"""
+        <h1>🚨🚨🚨 BREAKOUT CONFIRMED 🚨🚨🚨</h1>
+        <h2>{symbol} - {pattern_name}</h2>
+        <p class="buy-now">BUY SIGNAL ACTIVATED!</p>"""
+
+        content = f"""
+        <p class="buy-now">✅ Pattern breakout confirmed with volume!</p>
+
+        <div class="metric">
+            <span class="label">Entry Price:</span>
+            <span class="value">₹{cp:.2f}</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Breakout Point:</span>
+            <span class="value">₹{bp:.2f}</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Volume Confirmation:</span>
+            <span class="value">✅ CONFIRMED</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Pattern Strength:</span>
+            <span class="value">{pattern['strength_score']}/100</span>
+        </div>
+
+        <hr>
+
+        <div class="action">
+            <h2 style="color:#4CAF50; text-align:center;">📊 TRADE EXECUTION PLAN</h2>
+
+            <h3>💰 Entry & Exit Levels</h3>
+            <table style="width:100%; border-collapse: collapse; font-size:16px;">
+                <tr style="background-color:#4CAF50; color:white;">
+                    <th style="padding:12px; border:1px solid #ddd;">Level</th>
+                    <th style="padding:12px; border:1px solid #ddd;">Price</th>
+                    <th style="padding:12px; border:1px solid #ddd;">Gain/Loss</th>
+                    <th style="padding:12px; border:1px solid #ddd;">Action</th>
+                </tr>
+                <tr style="background-color:#e8f5e9;">
+                    <td style="padding:10px; border:1px solid #ddd;"><strong>ENTRY NOW</strong></td>
+                    <td style="padding:10px; border:1px solid #ddd;"><strong>₹{cp:.2f}</strong></td>
+                    <td style="padding:10px; border:1px solid #ddd;">-</td>
+                    <td style="padding:10px; border:1px solid #ddd;"><strong>BUY 100%</strong></td>
+                </tr>
+                <tr>
+                    <td style="padding:10px; border:1px solid #ddd;">Stop Loss</td>
+                    <td style="padding:10px; border:1px solid #ddd;">₹{sl:.2f}</td>
+                    <td style="padding:10px; border:1px solid #ddd; color:red;">-{risk_pct:.2f}%</td>
+                    <td style="padding:10px; border:1px solid #ddd;">Exit all</td>
+                </tr>
+                <tr style="background-color:#f1f8f4;">
+                    <td style="padding:10px; border:1px solid #ddd;">Target 1</td>
+                    <td style="padding:10px; border:1px solid #ddd;">₹{t1:.2f}</td>
+                    <td style="padding:10px; border:1px solid #ddd; color:green;">+{t1_pct:.2f}%</td>
+                    <td style="padding:10px; border:1px solid #ddd;">Book 30%</td>
+                </tr>
+                <tr>
+                    <td style="padding:10px; border:1px solid #ddd;">Target 2</td>
+                    <td style="padding:10px; border:1px solid #ddd;">₹{t2:.2f}</td>
+                    <td style="padding:10px; border:1px solid #ddd; color:green;">+{t2_pct:.2f}%</td>
+                    <td style="padding:10px; border:1px solid #ddd;">Book 40%</td>
+                </tr>
+                <tr style="background-color:#f1f8f4;">
+                    <td style="padding:10px; border:1px solid #ddd;">Target 3</td>
+                    <td style="padding:10px; border:1px solid #ddd;">₹{t3:.2f}</td>
+                    <td style="padding:10px; border:1px solid #ddd; color:green;">+{t3_pct:.2f}%</td>
+                    <td style="padding:10px; border:1px solid #ddd;">Book 30%</td>
+                </tr>
+            </table>
+
+            <h3 style="margin-top:20px;">📋 Execution Checklist</h3>
+            <ol style="font-size:16px; line-height:1.8;">
+                <li>✅ <strong>Buy {symbol} at market price</strong> (or limit at ₹{cp:.2f})</li>
+                <li>✅ <strong>Immediately set Stop Loss</strong> at ₹{sl:.2f}</li>
+                <li>✅ <strong>Set Target 1 alert</strong> at ₹{t1:.2f}</li>
+                <li>✅ <strong>Set Target 2 alert</strong> at ₹{t2:.2f}</li>
+                <li>✅ <strong>Set Target 3 alert</strong> at ₹{t3:.2f}</li>
+                <li>✅ <strong>Trail stop loss</strong> after Target 1 is hit</li>
+            </ol>
+
+            <h3 style="margin-top:20px;">📊 Risk-Reward Analysis</h3>
+            <ul style="font-size:16px;">
+                <li><strong>Risk:</strong> ₹{risk:.2f} ({risk_pct:.2f}%)</li>
+                <li><strong>Reward (T3):</strong> ₹{reward:.2f} ({t3_pct:.2f}%)</li>
+                <li><strong>R:R Ratio:</strong> 1:{rr:.2f}</li>
+            </ul>
+        </div>
+
+        <h3 style="color:#4CAF50;">🎯 Profit Booking Strategy</h3>
+        <ol style="font-size:15px;">
+            <li><strong>At Target 1 (₹{t1:.2f}):</strong> Book 30% profit, move SL to entry</li>
+            <li><strong>At Target 2 (₹{t2:.2f}):</strong> Book 40% more, trail SL to T1</li>
+            <li><strong>At Target 3 (₹{t3:.2f}):</strong> Book remaining 30%, trail SL to T2</li>
+        </ol>
+
+        <p style="text-align:center; font-size:18px; color:#4CAF50; font-weight:bold; margin-top:20px;">
+            🚀 Act now! Momentum is building! 🚀
+        </p>"""
+
+        footer = """
+        <p style="color:#666; font-style:italic;">This is not financial advice. Trade at your own risk.</p>"""
+
+        body = _render_page(_CONFIRMED_STYLE, header, content, footer)
+
+        return subject, body
 
     def send_target_hit_alert(self, symbol: str, target_num: int, entry_price: float,
                                target_price: float, current_price: float) -> bool:
         """E) TARGET HIT - Profit booking alert"""
-        symbol_clean = symbol.replace('.NS', '')
+        symbol_clean = _display_symbol(symbol)
         profit_pct = ((current_price - entry_price) / entry_price) * 100
 
         subject = f"🎯 TARGET {target_num} HIT! {symbol_clean} - Book Partial Profits"
 
         booking_pct = [30, 40, 30][target_num - 1] if target_num <= 3 else 100
 
-        body = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; color: #333; }}
-                .header {{ background-color: #2196F3; color: white; padding: 20px; text-align: center; }}
-                .content {{ padding: 20px; }}
-                .metric {{ background-color: #e3f2fd; padding: 10px; margin: 10px 0; border-left: 4px solid #2196F3; }}
-                .label {{ font-weight: bold; color: #666; }}
-                .value {{ font-size: 20px; color: #2196F3; font-weight: bold; }}
-                .action {{ background-color: #bbdefb; padding: 15px; margin: 15px 0; border: 2px solid #2196F3; }}
-                .footer {{ background-color: #f5f5f5; padding: 10px; text-align: center; font-size: 12px; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>🎯 TARGET {target_num} HIT!</h1>
-                <h2>{symbol_clean}</h2>
-                <p style="font-size:24px;">Book {booking_pct}% Profit Now!</p>
-            </div>
-
-            <div class="content">
-                <div class="metric">
-                    <span class="label">Entry Price:</span>
-                    <span class="value">₹{entry_price:.2f}</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Current Price:</span>
-                    <span class="value">₹{current_price:.2f}</span>
-                </div>
-
-                <div class="metric">
-                    <span class="label">Profit:</span>
-                    <span class="value" style="color:#4CAF50;">+{profit_pct:.2f}%</span>
-                </div>
-
-                <hr>
-
-                <div class="action">
-                    <h3>📊 Action Required</h3>
-                    <ol>
-                        <li><strong>Book {booking_pct}% of position</strong> at current market price</li>
-                        <li><strong>Trail stop loss</strong> to protect remaining position</li>
-                        <li><strong>Hold remaining {100-booking_pct}%</strong> for next target</li>
-                    </ol>
-
-                    <h3>🛡️ Updated Stop Loss</h3>
-                    <p>Move stop loss to <strong>₹{target_price*0.98:.2f}</strong> (2% below Target {target_num})</p>
-                </div>
-
-                <p style="text-align:center; color:#4CAF50; font-weight:bold; font-size:18px;">
-                    Congratulations on your profit! 🎉
-                </p>
-            </div>
-
-            <div class="footer">
-                <p>Generated by Stock Pattern Scanner | {datetime.now().strftime('%Y-%m-%d %H:%M:%S IST')}</p>
-            </div>
-        </body>
-        </html>
-        """
+        header = f"""
+        <h1>🎯 TARGET {target_num} HIT!</h1>
+        <h2>{symbol_clean}</h2>
+        <p style="font-size:24px;">Book {booking_pct}% Profit Now!</p>"""
+
+        content = f"""
+        <div class="metric">
+            <span class="label">Entry Price:</span>
+            <span class="value">₹{entry_price:.2f}</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Current Price:</span>
+            <span class="value">₹{current_price:.2f}</span>
+        </div>
+
+        <div class="metric">
+            <span class="label">Profit:</span>
+            <span class="value" style="color:#4CAF50;">+{profit_pct:.2f}%</span>
+        </div>
+
+        <hr>
+
+        <div class="action">
+            <h3>📊 Action Required</h3>
+            <ol>
+                <li><strong>Book {booking_pct}% of position</strong> at current market price</li>
+                <li><strong>Trail stop loss</strong> to protect remaining position</li>
+                <li><strong>Hold remaining {100-booking_pct}%</strong> for next target</li>
+            </ol>
+
+            <h3>🛡️ Updated Stop Loss</h3>
+            <p>Move stop loss to <strong>₹{target_price*0.98:.2f}</strong> (2% below Target {target_num})</p>
+        </div>
+
+        <p style="text-align:center; color:#4CAF50; font-weight:bold; font-size:18px;">
+            Congratulations on your profit! 🎉
+        </p>"""
+
+        body = _render_page(_TARGET_HIT_STYLE, header, content)
 
         return self._send_email(subject, body)
 
+    def _get_smtp(self) -> smtplib.SMTP:
+        """
+        Get a logged-in SMTP session, reusing the open one if still alive
+
+        Saves the connect + TLS + login round trips on every alert. Port
+        SMTPS_PORT connects with implicit TLS, skipping the plaintext EHLO
+        and STARTTLS exchange; any other port upgrades with STARTTLS.
+        Caller must hold _smtp_lock.
+        """
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except smtplib.SMTPException:
+                pass
+            self._close_smtp()
+
+        if self.smtp_port == SMTPS_PORT:
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, context=_ssl_context())
+        else:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        try:
+            if self.smtp_port != SMTPS_PORT:
+                server.starttls(context=_ssl_context())
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+
+        self._smtp = server
+        return server
+
+    def _close_smtp(self):
+        """Drop the cached SMTP session (caller must hold _smtp_lock)"""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
+
+    def close(self):
+        """Close the SMTP session, if one is open"""
+        with self._smtp_lock:
+            self._close_smtp()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def _send_email(self, subject: str, body: str) -> bool:
         """Send HTML email via SMTP"""
-        try:
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.sender_email
-            msg['To'] = self.recipient_email
-            msg['Subject'] = subject
+        return self._send_messages([(subject, body)]) == 1
 
-            html_part = MIMEText(body, 'html')
-            msg.attach(html_part)
+    def _send_messages(self, messages: List[Tuple[str, str]],
+                       on_sent: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Send (subject, body) HTML emails in order over one SMTP session
 
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(msg)
+        The session is fetched (and a reused one probed with NOOP) once per
+        batch, then kept for every send. Each send is retried once on a
+        fresh session if the server dropped the old one. Gives up on the rest once at least BATCH_ABORT_AFTER
+        sends were attempted and a third or more of them failed.
 
-            logger.info(f"Email sent successfully: {subject}")
-            return True
+        Args:
+            messages: (subject, body) pairs
+            on_sent: Called with the index of each message that was sent
 
-        except Exception as e:
-            logger.error(f"Failed to send email: {e}")
-            return False
+        Returns:
+            Number of emails sent
+        """
+        sent = failed = dropped = 0
+
+        msg = self._msg
+        server = None
+
+        with self._smtp_lock:
+            for i, (subject, body) in enumerate(messages):
+                if sent + failed >= BATCH_ABORT_AFTER and failed * 3 >= sent + failed:
+                    logger.error("Aborting email batch: %d of %d sends failed, %d not attempted",
+                                 failed, sent + failed, len(messages) - i)
+                    break
+
+                if not self._take_token():
+                    dropped += 1
+                    continue
+
+                try:
+                    del msg['Subject']
+                    msg['Subject'] = subject
+                    body = body.replace(_TIMESTAMP_SLOT, _footer_timestamp(int(time.time())))
+                    msg.set_content(_minify(body), subtype='html')
+
+                    if server is None:
+                        server = self._get_smtp()
+                    try:
+                        server.send_message(msg)
+                    except smtplib.SMTPServerDisconnected:
+                        # Server dropped the session since the last send
+                        self._close_smtp()
+                        server = self._get_smtp()
+                        server.send_message(msg)
+
+                    logger.info("Email sent successfully: %s", subject)
+                    sent += 1
+                    if on_sent:
+                        on_sent(i)
+
+                except Exception as e:
+                    logger.error("Failed to send email: %s", e)
+                    # The next send reopens a fresh session
+                    self._close_smtp()
+                    server = None
+                    failed += 1
+
+        if dropped:
+            logger.warning("Dropped %d emails over the rate limit", dropped)
+
+        return sent
@@ -3,24 +3,301 @@ Market Utilities
 Market hours checking, market condition scoring, and market data utilities
 """
 
-import yfinance as yf
-from datetime import datetime, time as dt_time
-import pytz
-from typing import Tuple, Union
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Optional, Tuple, Union
 import logging
+import os
+import threading
+import time
+from zoneinfo import ZoneInfo
+import numpy as np
 import pandas as pd
+import requests
+
+from _njit import njit
+
+# Shared with DataManager: yf.download keeps results in a module-global dict
+from data_manager import DataManager, _download_lock
 
 logger = logging.getLogger(__name__)
 
+# Seconds a market condition score is reused during market hours. Once the
+# market is closed the score can't change, so it's kept for the rest of the day.
+SCORE_TTL_SECONDS = 60
+
+# Seconds the index histories are reused, so one score/summary pass
+# downloads them once
+HISTORY_TTL_SECONDS = 60
+
+# Indices the market checks read, fetched together in one yf.download call
+INDEX_SYMBOLS = ['^NSEI', '^NSEBANK', '^INDIAVIX']
+
+# Sessions the longest lookback (Nifty 200-day MA) needs, with a margin;
+# shorter lookbacks slice the same history
+_MIN_BARS_MA200 = 210
+
+# Calendar days of history downloaded to get _MIN_BARS_MA200 sessions
+# (5 of every 7 days, plus about three weeks of exchange holidays). Smaller
+# than a full '1y' (~250 sessions) request.
+HISTORY_DAYS = _MIN_BARS_MA200 * 7 // 5 + 21
+
+
+# 5-day % change thresholds for momentum points: above 0 earns the middle
+# entry of a points table, above 1 the last
+_MOMENTUM_THRESHOLDS = np.array([0.0, 1.0])
+
+
+@njit(cache=True)
+def _bucket(x, thresholds, points):
+    """
+    Points for x from a table with one more entry than thresholds
+
+    Picks points[n], where n is how many of the (ascending) thresholds x
+    is strictly above, so NaN scores points[0]. Works unchanged in or out
+    of numba, with no branch per band.
+    """
+    return points[(x > thresholds).sum()]
+
+
+@njit(cache=True)
+def _score_trend(close, ma_short, ma_long, pts_ma_short, pts_ma_long, mom_points):
+    """
+    Trend points for an index from its closes and moving averages
+
+    Price above the short MA earns pts_ma_short and above the long MA
+    pts_ma_long (pass NaN to skip a check). The 5-day % change adds
+    mom_points bucketed by _MOMENTUM_THRESHOLDS.
+    """
+    current = close[-1]
+    score = 0
+
+    if current > ma_short:
+        score += pts_ma_short
+    if current > ma_long:
+        score += pts_ma_long
+
+    five_day_change = (current - close[-6]) / close[-6] * 100
+    score += _bucket(five_day_change, _MOMENTUM_THRESHOLDS, mom_points)
+
+    return score
+
 
 class MarketUtils:
     """Utilities for market timing and condition analysis"""
 
-    def __init__(self):
-        self.ist_tz = pytz.timezone('Asia/Kolkata')
+    # Market score components: (label, method, neutral score on failure)
+    _SCORE_COMPONENTS = (
+        ('Nifty trend', '_get_nifty_trend_score', 15),
+        ('Sector trend', '_get_sector_trend_score', 12),
+        ('VIX', '_get_vix_score', 10),
+        ('Market breadth', '_get_market_breadth_score', 7),
+        ('FII activity', '_get_fii_activity_score', 5),
+    )
+
+    # VIX score bands: below each threshold scores the matching entry,
+    # at or above the last scores the final one
+    _VIX_THRESHOLDS = np.array([12, 15, 20, 25])
+    _VIX_SCORES = np.array([20, 15, 10, 5, 0])
+
+    # Momentum points (none, above 0%, above 1%) per _MOMENTUM_THRESHOLDS.
+    # FII activity only earns its top points on above-average volume.
+    _NIFTY_MOM_POINTS = np.array([0, 3, 5])
+    _SECTOR_MOM_POINTS = np.array([0, 5, 10])
+    _FII_POINTS = np.array([0, 5, 5])
+    _FII_POINTS_HIGH_VOLUME = np.array([0, 5, 10])
+
+    def __init__(self, cache_dir: Optional[str] = 'cache',
+                 session: Optional[requests.Session] = None):
+        """
+        Args:
+            cache_dir: Directory for the on-disk index history cache, shared
+                with DataManager's stock cache (None disables it)
+            session: HTTP session for the index downloads, e.g. DataManager's
+                so both reuse the same Yahoo connections and cookies (a
+                pooled session of our own by default)
+        """
+        self.cache_dir = cache_dir
+        self._session = session if session is not None else DataManager._create_session()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.ist_tz = ZoneInfo('Asia/Kolkata')
         self.market_open_time = dt_time(9, 15)
         self.market_close_time = dt_time(15, 30)
 
+        # Session bounds as seconds since midnight, and the opening time as
+        # shown in messages, so is_market_open works on plain ints
+        self._open_secs = self._seconds_of_day(self.market_open_time)
+        self._close_secs = self._seconds_of_day(self.market_close_time)
+        self._open_str = self.market_open_time.strftime('%H:%M')
+
+        # DataFrame per index symbol and when they were downloaded, see _history.
+        # Concurrent score components wait on the lock and share one download.
+        self._history_cache = {}
+        self._history_fetched_at = None
+        self._history_lock = threading.Lock()
+
+        # (symbol, window) -> (date of the second-to-last bar, nansum and
+        # count of the window's completed bars), see _moving_average
+        self._ma_cache = {}
+        self._ma_lock = threading.Lock()
+
+        # ((IST date, market open, past the close), computed_at, score, index
+        # frames) of the last complete market score, see _condition_score
+        self._score_cache = None
+
+        # ((IST date, past the close), summary) of the last summary built
+        # while the market was closed, see get_market_summary
+        self._summary_cache = None
+
+    @staticmethod
+    def _seconds_of_day(t) -> int:
+        """Seconds since midnight of a datetime or time (ignoring microseconds)"""
+        return t.hour * 3600 + t.minute * 60 + t.second
+
+    def _history(self, symbol: str, rows: Optional[int] = None) -> pd.DataFrame:
+        """
+        Daily history for an index, downloaded at most once per HISTORY_TTL_SECONDS
+
+        Args:
+            symbol: Index symbol (one of INDEX_SYMBOLS)
+            rows: Only return the most recent rows (all by default)
+
+        Returns:
+            DataFrame of daily OHLCV (may be empty)
+        """
+        df = self._index_histories().get(symbol)
+        if df is None:
+            return pd.DataFrame()
+        return df if rows is None else df.tail(rows)
+
+    def _index_histories(self) -> dict:
+        """Current {symbol: DataFrame} of every index, all from the same download"""
+        with self._history_lock:
+            if (self._history_fetched_at is None
+                    or time.monotonic() - self._history_fetched_at > HISTORY_TTL_SECONDS):
+                self._refresh_history()
+            return self._history_cache
+
+    def _moving_average(self, symbol: str, df: pd.DataFrame, close: np.ndarray, window: int) -> float:
+        """
+        Mean of the last window closes, ignoring NaN like Series.mean()
+
+        Only the latest bar moves between intraday refreshes; the window's
+        other window - 1 bars are completed sessions. Their sum is cached
+        until a new session starts, so each refresh costs O(1) instead of
+        summing the whole window again.
+
+        Args:
+            symbol: Index symbol the closes belong to (part of the cache key)
+            df: History the closes came from (for the bar dates)
+            close: Close prices, at least window long
+            window: Number of bars to average
+        """
+        key = (symbol, window)
+        anchor = df.index[-2]
+        with self._ma_lock:
+            cached = self._ma_cache.get(key)
+            if cached is None or cached[0] != anchor:
+                completed = close[-window:-1]
+                cached = (anchor, np.nansum(completed), np.count_nonzero(~np.isnan(completed)))
+                self._ma_cache[key] = cached
+
+        _, total, count = cached
+        if not np.isnan(close[-1]):
+            total += close[-1]
+            count += 1
+        return total / count if count else np.nan
+
+    def _refresh_history(self):
+        """
+        Reload the index histories (caller must hold _history_lock)
+
+        A fresh enough disk cache file, e.g. from another process or before a
+        restart, is used, otherwise they're downloaded and written back. A
+        failed download keeps the previous (possibly empty) histories and
+        isn't retried for HISTORY_TTL_SECONDS.
+        """
+        frames, age = self._read_disk_history()
+        if frames is None:
+            frames, age = self._download_indices(), 0.0
+            if frames:
+                self._write_disk_history(frames)
+
+        if frames:
+            self._history_cache = frames
+        self._history_fetched_at = time.monotonic() - age
+
+    def _disk_history_path(self) -> str:
+        """Index cache file, dated like DataManager's so its daily prune covers it"""
+        return os.path.join(self.cache_dir, f"indices_{HISTORY_DAYS}d_{date.today().isoformat()}.pkl")
+
+    def _read_disk_history(self) -> Tuple[Optional[dict], float]:
+        """(frames, age in seconds) from the disk cache, or (None, 0) if missing or stale"""
+        if not self.cache_dir:
+            return None, 0.0
+
+        path = self._disk_history_path()
+        try:
+            age = time.time() - os.path.getmtime(path)
+        except OSError:
+            return None, 0.0
+
+        if age >= HISTORY_TTL_SECONDS:
+            return None, 0.0
+
+        try:
+            return pd.read_pickle(path), age
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache file {path}: {e}")
+            return None, 0.0
+
+    def _write_disk_history(self, frames: dict):
+        """Write the index histories to the disk cache"""
+        if not self.cache_dir:
+            return
+
+        # Write to a temp file and rename so readers never see a partial file
+        path = self._disk_history_path()
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            pd.to_pickle(frames, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Error writing index cache file: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _download_indices(self) -> dict:
+        """Fetch every index in INDEX_SYMBOLS with one yf.download call"""
+        try:
+            # Imported on first download, so is_market_open() callers don't pay for it
+            import yfinance as yf
+
+            with _download_lock:
+                data = yf.download(
+                    tickers=INDEX_SYMBOLS,
+                    start=(date.today() - timedelta(days=HISTORY_DAYS)).isoformat(),
+                    group_by='ticker',
+                    threads=len(INDEX_SYMBOLS),
+                    progress=False,
+                    auto_adjust=True,
+                    session=self._session
+                )
+        except Exception as e:
+            logger.warning(f"Error downloading index data: {e}")
+            return {}
+
+        if data is None or data.empty or not isinstance(data.columns, pd.MultiIndex):
+            logger.warning("Index download returned no data")
+            return {}
+
+        # Rows are aligned across tickers; drop dates an index has no bar for
+        tickers = set(data.columns.get_level_values(0))
+        return {symbol: data[symbol].dropna(how='all') for symbol in INDEX_SYMBOLS if symbol in tickers}
+
     def is_market_open(self, return_message: bool = False) -> Union[bool, Tuple[bool, str]]:
         """
         Check if NSE market is currently open
@@ -40,21 +317,21 @@ class MarketUtils:
             return False
 
         # Check if within market hours
-        current_time = now.time()
-        is_open = self.market_open_time <= current_time <= self.market_close_time
+        current_secs = self._seconds_of_day(now)
+        is_open = self._open_secs <= current_secs <= self._close_secs
 
         if return_message:
             if is_open:
                 return True, "Market OPEN"
             else:
-                if current_time < self.market_open_time:
-                    return False, f"Market opens at {self.market_open_time.strftime('%H:%M')} IST"
+                if current_secs < self._open_secs:
+                    return False, f"Market opens at {self._open_str} IST"
                 else:
                     return False, "Market closed for the day"
 
         return is_open
 
-    def get_market_condition_score(self) -> int:
+    def get_market_condition_score(self, market_open: Optional[bool] = None) -> int:
         """
         Calculate market condition score (0-100)
 
@@ -65,43 +342,78 @@ class MarketUtils:
         - Market breadth: +15 points if >1.5:1 (advances/declines)
         - FII activity: +10 points if buying (simplified check)
 
+        The components score the same prefetched index histories. One that
+        fails counts as its neutral score.
+
+        A score is reused for SCORE_TTL_SECONDS while the market is open,
+        and for the rest of the day once it has closed. Crossing the open
+        or close starts a fresh one. Only a complete score (see
+        _condition_score) is reused, so one built from neutral fallbacks
+        after a failed download is recomputed on the next call.
+
+        Args:
+            market_open: is_market_open() if the caller already has it
+
         Returns:
             int: Score from 0-100
         """
+        return self._condition_score(market_open)[0]
+
+    def _condition_score(self, market_open: Optional[bool] = None) -> Tuple[int, Optional[dict]]:
+        """
+        get_market_condition_score, plus the index snapshot it was computed from
+
+        Returns:
+            (score, frames): frames is the {symbol: DataFrame} download every
+            component scored, or None if the score isn't complete: a
+            component raised, the download was missing one of
+            INDEX_SYMBOLS, or it was refreshed while the components ran
+        """
+        now = datetime.now(self.ist_tz)
+        if market_open is None:
+            market_open = self.is_market_open()
+
+        # Like get_market_summary's closed_key: a pre-open score isn't served
+        # after that day's session
+        key = (now.date(), market_open, self._seconds_of_day(now) > self._close_secs)
+        cached = self._score_cache
+        if cached is not None and cached[0] == key:
+            if not market_open or time.monotonic() - cached[1] < SCORE_TTL_SECONDS:
+                return cached[2], cached[3]
+
         score = 0
 
         try:
-            # 1. Nifty Trend (30 points)
-            nifty_score = self._get_nifty_trend_score()
-            score += nifty_score
-            logger.debug(f"Nifty trend score: {nifty_score}")
-
-            # 2. Sector Trend - Bank Nifty (25 points)
-            sector_score = self._get_sector_trend_score()
-            score += sector_score
-            logger.debug(f"Sector trend score: {sector_score}")
-
-            # 3. VIX Score (20 points)
-            vix_score = self._get_vix_score()
-            score += vix_score
-            logger.debug(f"VIX score: {vix_score}")
-
-            # 4. Market Breadth (15 points) - Simplified
-            breadth_score = self._get_market_breadth_score()
-            score += breadth_score
-            logger.debug(f"Market breadth score: {breadth_score}")
-
-            # 5. FII Activity (10 points) - Simplified using Nifty momentum
-            fii_score = self._get_fii_activity_score()
-            score += fii_score
-            logger.debug(f"FII activity score: {fii_score}")
+            # Download (or reuse) the histories up front so every component
+            # reads this same snapshot
+            frames = self._index_histories()
+            complete = True
+
+            for label, method, neutral in self._SCORE_COMPONENTS:
+                try:
+                    component_score = getattr(self, method)()
+                except Exception as e:
+                    logger.warning(f"{label} score failed ({e}), using neutral {neutral}")
+                    component_score = neutral
+                    complete = False
+
+                score += component_score
+                logger.debug(f"{label} score: {component_score}")
 
             logger.info(f"Total market condition score: {score}/100")
-            return min(100, score)
+            score = min(100, score)
+
+            complete = (complete and all(symbol in frames for symbol in INDEX_SYMBOLS)
+                        and self._history_cache is frames)
+            if not complete:
+                return score, None
+
+            self._score_cache = (key, time.monotonic(), score, frames)
+            return score, frames
 
         except Exception as e:
             logger.error(f"Error calculating market score: {e}")
-            return 50  # Default neutral score
+            return 50, None  # Default neutral score
 
     def _get_nifty_trend_score(self) -> int:
         """
@@ -113,37 +425,16 @@ class MarketUtils:
         - Recent momentum (5-day gain): +5 points
         """
         try:
-            nifty = yf.Ticker("^NSEI")
-            df = nifty.history(period='1y')
+            df = self._history('^NSEI')
 
             if df.empty or len(df) < 200:
                 return 15  # Neutral
 
-            current_price = df['Close'].iloc[-1]
+            close = df['Close'].to_numpy(dtype=np.float64)
+            ma50 = self._moving_average('^NSEI', df, close, 50)
+            ma200 = self._moving_average('^NSEI', df, close, 200)
 
-            score = 0
-
-            # 50-day MA check
-            if len(df) >= 50:
-                ma50 = df['Close'].tail(50).mean()
-                if current_price > ma50:
-                    score += 15
-
-            # 200-day MA check
-            if len(df) >= 200:
-                ma200 = df['Close'].tail(200).mean()
-                if current_price > ma200:
-                    score += 10
-
-            # Recent momentum (5-day)
-            if len(df) >= 5:
-                five_day_change = (current_price - df['Close'].iloc[-6]) / df['Close'].iloc[-6] * 100
-                if five_day_change > 1:
-                    score += 5
-                elif five_day_change > 0:
-                    score += 3
-
-            return score
+            return int(_score_trend(close, ma50, ma200, 15, 10, self._NIFTY_MOM_POINTS))
 
         except Exception as e:
             logger.warning(f"Error fetching Nifty data: {e}")
@@ -158,31 +449,15 @@ class MarketUtils:
         - Recent momentum: +10 points
         """
         try:
-            banknifty = yf.Ticker("^NSEBANK")
-            df = banknifty.history(period='6mo')
+            df = self._history('^NSEBANK')
 
             if df.empty or len(df) < 50:
                 return 12  # Neutral
 
-            current_price = df['Close'].iloc[-1]
-
-            score = 0
+            close = df['Close'].to_numpy(dtype=np.float64)
+            ma50 = self._moving_average('^NSEBANK', df, close, 50)
 
-            # 50-day MA check
-            if len(df) >= 50:
-                ma50 = df['Close'].tail(50).mean()
-                if current_price > ma50:
-                    score += 15
-
-            # Recent momentum (5-day)
-            if len(df) >= 5:
-                five_day_change = (current_price - df['Close'].iloc[-6]) / df['Close'].iloc[-6] * 100
-                if five_day_change > 1:
-                    score += 10
-                elif five_day_change > 0:
-                    score += 5
-
-            return score
+            return int(_score_trend(close, ma50, np.nan, 15, 0, self._SECTOR_MOM_POINTS))
 
         except Exception as e:
             logger.warning(f"Error fetching Bank Nifty data: {e}")
@@ -200,24 +475,15 @@ class MarketUtils:
         - >25: +0 points (high volatility)
         """
         try:
-            vix = yf.Ticker("^INDIAVIX")
-            df = vix.history(period='5d')
+            df = self._history('^INDIAVIX')
 
             if df.empty:
                 return 10  # Neutral
 
-            current_vix = df['Close'].iloc[-1]
+            current_vix = float(df['Close'].to_numpy()[-1])
 
-            if current_vix < 12:
-                return 20
-            elif current_vix < 15:
-                return 15
-            elif current_vix < 20:
-                return 10
-            elif current_vix < 25:
-                return 5
-            else:
-                return 0
+            band = np.searchsorted(self._VIX_THRESHOLDS, current_vix, side='right')
+            return int(self._VIX_SCORES[band])
 
         except Exception as e:
             logger.warning(f"Error fetching VIX data: {e}")
@@ -231,19 +497,18 @@ class MarketUtils:
         Compares advances vs declines in major indices
         """
         try:
-            # Use Nifty and Bank Nifty as proxies
-            nifty = yf.Ticker("^NSEI")
-            banknifty = yf.Ticker("^NSEBANK")
-
-            nifty_df = nifty.history(period='5d')
-            bank_df = banknifty.history(period='5d')
+            # Use Nifty and Bank Nifty as proxies (last two sessions)
+            nifty_df = self._history('^NSEI')
+            bank_df = self._history('^NSEBANK')
 
             if nifty_df.empty or bank_df.empty or len(nifty_df) < 2 or len(bank_df) < 2:
                 return 7  # Neutral
 
             # Check if both rising
-            nifty_up = nifty_df['Close'].iloc[-1] > nifty_df['Close'].iloc[-2]
-            bank_up = bank_df['Close'].iloc[-1] > bank_df['Close'].iloc[-2]
+            nifty_close = nifty_df['Close'].to_numpy()
+            bank_close = bank_df['Close'].to_numpy()
+            nifty_up = nifty_close[-1] > nifty_close[-2]
+            bank_up = bank_close[-1] > bank_close[-2]
 
             if nifty_up and bank_up:
                 return 15
@@ -266,22 +531,22 @@ class MarketUtils:
         - Otherwise: +0
         """
         try:
-            nifty = yf.Ticker("^NSEI")
-            df = nifty.history(period='1mo')
+            # About one month of sessions
+            df = self._history('^NSEI', 21)
 
             if df.empty or len(df) < 20:
                 return 5  # Neutral
 
-            recent_volume = df['Volume'].tail(5).mean()
-            avg_volume = df['Volume'].tail(20).mean()
-            price_change = (df['Close'].iloc[-1] - df['Close'].iloc[-6]) / df['Close'].iloc[-6] * 100
+            close = df['Close'].to_numpy()
+            volume = df['Volume'].to_numpy()
 
-            if price_change > 1 and recent_volume > avg_volume * 1.2:
-                return 10
-            elif price_change > 0:
-                return 5
-            else:
-                return 0
+            recent_volume = np.nanmean(volume[-5:])
+            avg_volume = np.nanmean(volume[-20:])
+            price_change = (close[-1] - close[-6]) / close[-6] * 100
+
+            points = (self._FII_POINTS_HIGH_VOLUME if recent_volume > avg_volume * 1.2
+                      else self._FII_POINTS)
+            return int(_bucket(price_change, _MOMENTUM_THRESHOLDS, points))
 
         except Exception as e:
             logger.warning(f"Error calculating FII activity: {e}")
@@ -291,37 +556,58 @@ class MarketUtils:
         """
         Get comprehensive market summary
 
+        While the market is closed the last complete summary is reused
+        until it opens (or the day's session ends, for a pre-open summary).
+
         Returns:
             dict: Market data including Nifty, Bank Nifty, VIX, etc.
         """
+        now = datetime.now(self.ist_tz)
+        market_open = self.is_market_open()
+
+        # Nothing moves while the market is closed, so a closed-market summary
+        # is reused until the market opens. Being past the close is part of
+        # the key so a pre-open summary isn't served after that day's session.
+        closed_key = (now.date(), self._seconds_of_day(now) > self._close_secs)
+        cached = self._summary_cache
+        if not market_open and cached is not None and cached[0] == closed_key:
+            return dict(cached[1])
+
+        score, score_frames = self._condition_score(market_open)
         summary = {
-            'timestamp': datetime.now(self.ist_tz).strftime('%Y-%m-%d %H:%M:%S IST'),
-            'market_open': self.is_market_open(),
-            'condition_score': self.get_market_condition_score()
+            'timestamp': now.strftime('%Y-%m-%d %H:%M:%S IST'),
+            'market_open': market_open,
+            'condition_score': score
         }
 
         try:
+            # Prices come from the same download the score was computed from
+            frames = score_frames if score_frames is not None else self._index_histories()
+
             # Nifty
-            nifty = yf.Ticker("^NSEI")
-            nifty_data = nifty.history(period='5d')
-            if not nifty_data.empty:
-                summary['nifty_price'] = nifty_data['Close'].iloc[-1]
-                summary['nifty_change'] = ((nifty_data['Close'].iloc[-1] - nifty_data['Close'].iloc[-2]) /
-                                           nifty_data['Close'].iloc[-2] * 100)
+            nifty_data = frames.get('^NSEI')
+            if nifty_data is not None and not nifty_data.empty:
+                close = nifty_data['Close'].to_numpy()
+                summary['nifty_price'] = close[-1]
+                summary['nifty_change'] = (close[-1] - close[-2]) / close[-2] * 100
 
             # Bank Nifty
-            banknifty = yf.Ticker("^NSEBANK")
-            bank_data = banknifty.history(period='5d')
-            if not bank_data.empty:
-                summary['banknifty_price'] = bank_data['Close'].iloc[-1]
-                summary['banknifty_change'] = ((bank_data['Close'].iloc[-1] - bank_data['Close'].iloc[-2]) /
-                                                bank_data['Close'].iloc[-2] * 100)
+            bank_data = frames.get('^NSEBANK')
+            if bank_data is not None and not bank_data.empty:
+                close = bank_data['Close'].to_numpy()
+                summary['banknifty_price'] = close[-1]
+                summary['banknifty_change'] = (close[-1] - close[-2]) / close[-2] * 100
 
             # VIX
-            vix = yf.Ticker("^INDIAVIX")
-            vix_data = vix.history(period='5d')
-            if not vix_data.empty:
-                summary['vix'] = vix_data['Close'].iloc[-1]
+            vix_data = frames.get('^INDIAVIX')
+            if vix_data is not None and not vix_data.empty:
+                summary['vix'] = vix_data['Close'].to_numpy()[-1]
+
+            # Only keep a complete summary, so a failed download is retried:
+            # the score must come from a complete snapshot (which then holds
+            # every index), so prices and score never mix fallback data
+            if not market_open and score_frames is not None:
+                self._summary_cache = (closed_key, dict(summary))
 
         except Exception as e:
             logger.error(f"Error fetching market summary: {e}")
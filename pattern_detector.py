@@ -6,24 +6,454 @@ Detects 8 bullish chart patterns with multi-state tracking
 import pandas as pd
 import numpy as np
 from scipy.signal import argrelextrema
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 import logging
 
+from _njit import njit, NUMBA_AVAILABLE
+
 logger = logging.getLogger(__name__)
 
+# Row layout of the OHLCV array passed to the detectors
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)
+
+# Bars (about 6 months) the extremum-based detectors look back over, and
+# the +/- bars a low must beat to count as a local minimum
+EXTREMA_WINDOW = 180
+EXTREMA_ORDER = 5
+
+
+def to_ohlcv_arrays(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert fetched stock data into the arrays the detectors work on
+
+    Done once per symbol per scan, so detectors index contiguous float64
+    rows instead of going through pandas column access.
+
+    Args:
+        df: Stock data with OHLCV columns
+
+    Returns:
+        (arr, idx): arr is a C-contiguous (5, n) float64 array with rows
+        OPEN, HIGH, LOW, CLOSE, VOLUME; idx holds the bar timestamps as
+        datetime64[ns]. Bars missing any of OPEN..CLOSE are dropped.
+    """
+    arr = np.ascontiguousarray(df[OHLCV_COLUMNS].to_numpy(dtype=np.float64).T)
+    idx = df.index.values.astype('datetime64[ns]')
+
+    # The detectors reduce price windows with plain ndarray min/max/mean,
+    # which don't skip NaN the way pandas did, so partial bars are dropped
+    # once here instead of NaN-checking every reduction
+    complete = ~np.isnan(arr[:VOLUME]).any(axis=0)
+    if not complete.all():
+        arr = np.ascontiguousarray(arr[:, complete])
+        idx = idx[complete]
+
+    return arr, idx
+
+
+# Double bottom time spacing points by days between bottoms (index 61 is
+# the catch-all for longer spacings): 20-40 days 10, 15-50 days 7, 10-60 days 5
+_DAYS = np.arange(62)
+_W_SPACING_POINTS = np.select(
+    [(_DAYS >= 20) & (_DAYS <= 40), (_DAYS >= 15) & (_DAYS <= 50), (_DAYS >= 10) & (_DAYS <= 60)],
+    [10, 7, 5], 0)
+del _DAYS
+
+
+def _points_from_floors(value, floors: np.ndarray, points: np.ndarray):
+    """
+    Ladder score for "higher is better" values
+
+    points[n], where n is how many of the ascending floors value reaches
+    (NaN reaches none). value may be a scalar or an array of candidates.
+    """
+    return points[(np.asarray(value)[..., None] >= floors).sum(axis=-1)]
+
+
+def _points_from_ceilings(value, ceilings: np.ndarray, points: np.ndarray):
+    """
+    Ladder score for "lower is better" values
+
+    points[n], where n is how many of the ascending ceilings value is
+    above (NaN is above all of them). value may be a scalar or an array.
+    """
+    return points[np.searchsorted(ceilings, value)]
+
+
+def _percentile(values: np.ndarray, q: float) -> float:
+    """
+    np.percentile(values, q) with its default linear interpolation
+
+    Partitions around just the two neighbouring ranks, skipping
+    np.percentile's general-purpose setup. NaN if any value is NaN.
+    """
+    pos = (q / 100) * (len(values) - 1)
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    part = np.partition(values, (lo, hi))
+
+    # NaN sorts last, so any NaN ends up at or after rank lo
+    if np.isnan(part[lo:]).any():
+        return np.nan
+
+    below, above = part[lo], part[hi]
+    t = pos - lo
+    if t >= 0.5:
+        return above - (above - below) * (1 - t)
+    return below + (above - below) * t
+
+
+class ScanContext(NamedTuple):
+    """
+    Per-symbol inputs the detectors share, built once by
+    PatternDetector._scan_context instead of re-derived by each detector
+    """
+    arr: np.ndarray                   # OHLCV array from to_ohlcv_arrays
+    current_price: float              # Latest close
+    vol_ratio: float                  # Recent/average volume, see _volume_stats
+    volume_confirmed: bool            # Recent volume >1.3x average
+    above_ma50: bool                  # Latest close above its 50-bar mean
+    local_mins: Optional[np.ndarray]  # Local minimums of the last EXTREMA_WINDOW lows
+
+
+# ===== JIT KERNELS =====
+# Numeric inner loops over plain float64 arrays. Compiled with numba when it
+# is installed (cached on disk after the first scan), plain Python otherwise.
+# They release the GIL, so the app's scan worker threads run them in parallel.
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def _range_max(values, start, stop):
+    """Max of values[start:stop] ignoring NaN (NaN if nothing valid)"""
+    result = np.nan
+    for k in range(start, stop):
+        v = values[k]
+        if v == v and not (result >= v):
+            result = v
+    return result
+
+
+@njit(cache=True, nogil=True)
+def _range_max_table(values):
+    """
+    Sparse table for O(1) NaN-ignoring range maximums
+
+    Row k holds the max of values[i:i + 2**k] at column i (valid for
+    i <= n - 2**k). Built with one whole-row np.fmax per level, so it is
+    cheap in plain NumPy as well as under numba.
+    """
+    n = len(values)
+    levels = 1
+    while (1 << levels) <= n:
+        levels += 1
+
+    table = np.empty((levels, n), dtype=np.float64)
+    table[0] = values
+    for k in range(1, levels):
+        half = 1 << (k - 1)
+        width = n - (1 << k) + 1
+        table[k, :width] = np.fmax(table[k - 1, :width], table[k - 1, half:half + width])
+    return table
+
+
+@njit(cache=True, nogil=True)
+def _table_range_max(table, start, stop):
+    """Max of values[start:stop] from _range_max_table (same result as _range_max)"""
+    k = 0
+    while (2 << k) <= stop - start:
+        k += 1
+    return np.fmax(table[k, start], table[k, stop - (1 << k)])
+
+
+@njit(cache=True, nogil=True)
+def _trend_slope(values):
+    """
+    Least-squares slope of values against 0..n-1 (same as np.polyfit(x, values, 1)[0])
+
+    Closed form: with x centred on its mean, sum(x * (y - mean(y))) over
+    sum(x ** 2) = n(n^2 - 1)/12. A NaN in values propagates to the result.
+    """
+    n = len(values)
+    x = np.arange(n) - (n - 1) / 2
+    return (x * (values - values.mean())).sum() / (n * (n * n - 1) / 12)
+
+
+@njit(cache=True, nogil=True)
+def _local_minima(values, order):
+    """
+    Indices of strict local minimums over +/- order bars
+
+    Same result as argrelextrema(values, np.less, order=order) (edges are
+    compared against themselves, so they never qualify), in one pass.
+    """
+    n = len(values)
+    out = np.empty(n, dtype=np.int64)
+    k = 0
+    for i in range(n):
+        v = values[i]
+        is_min = True
+        for shift in range(1, order + 1):
+            if not (v < values[min(i + shift, n - 1)] and v < values[max(i - shift, 0)]):
+                is_min = False
+                break
+        if is_min:
+            out[k] = i
+            k += 1
+    return out[:k]
+
+
+def _find_local_mins(values: np.ndarray, order: int = 5) -> np.ndarray:
+    """Local minimum indices; the jitted scan when numba is available, scipy otherwise"""
+    if NUMBA_AVAILABLE:
+        return _local_minima(values, order)
+    return argrelextrema(values, np.less, order=order)[0]
+
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def _double_bottom_pairs(lows, highs, closes, local_mins):
+    """
+    Scan all pairs of local minimums for double bottom candidates
+
+    Returns:
+        (pairs, metrics): pairs is (k, 2) int64 [idx1, idx2]; metrics is
+        (k, 4) float64 [symmetry_diff, peak_high, peak_height_pct, wick_ratio]
+    """
+    m = len(local_mins)
+    pairs = np.empty((max(m * (m - 1) // 2, 1), 2), dtype=np.int64)
+    metrics = np.empty((max(m * (m - 1) // 2, 1), 4), dtype=np.float64)
+    k = 0
+
+    # Pair ranges overlap heavily (up to 61 bars each), so the peak between
+    # bottoms comes from a sparse table instead of rescanning highs
+    high_table = _range_max_table(highs)
+
+    for i in range(m - 1):
+        idx1 = local_mins[i]
+        bottom1_low = lows[idx1]
+
+        # Time spacing check (10-60 days): local_mins is sorted, so the
+        # second bottoms that qualify are one contiguous run
+        j_lo = np.searchsorted(local_mins, idx1 + 10)
+        j_hi = np.searchsorted(local_mins, idx1 + 60, side='right')
+
+        for j in range(j_lo, j_hi):
+            idx2 = local_mins[j]
+            bottom2_low = lows[idx2]
+
+            # Symmetry check (<=3% difference)
+            symmetry_diff = abs(bottom1_low - bottom2_low) / bottom1_low * 100
+            if symmetry_diff > 3.0:
+                continue
+
+            # Second bottom validation (not >3% lower)
+            if bottom2_low < bottom1_low * 0.97:
+                continue
+
+            # Peak between bottoms, height check (>=3% above bottoms)
+            peak_high = _table_range_max(high_table, idx1, idx2 + 1)
+            avg_bottom = (bottom1_low + bottom2_low) / 2
+            peak_height_pct = (peak_high - avg_bottom) / avg_bottom * 100
+            if peak_height_pct < 3.0:
+                continue
+
+            # Wick ratio validation (strong bottoms)
+            wick1 = (closes[idx1] - bottom1_low) / (highs[idx1] - bottom1_low)
+            wick2 = (closes[idx2] - bottom2_low) / (highs[idx2] - bottom2_low)
+
+            pairs[k, 0] = idx1
+            pairs[k, 1] = idx2
+            metrics[k, 0] = symmetry_diff
+            metrics[k, 1] = peak_high
+            metrics[k, 2] = peak_height_pct
+            metrics[k, 3] = (wick1 + wick2) / 2
+            k += 1
+
+    return pairs[:k], metrics[:k]
+
+
+def _double_bottom_pairs_numpy(lows: np.ndarray, highs: np.ndarray, closes: np.ndarray,
+                               local_mins: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    _double_bottom_pairs without numba
+
+    Every check is broadcast over all pairs at once (peaks come from the
+    same sparse table), so nothing loops in Python. Same pairs, order and
+    metrics as the jitted scan.
+    """
+    bottoms = lows[local_mins]
+    b1 = bottoms[:, None]
+    b2 = bottoms[None, :]
+    days = local_mins[None, :] - local_mins[:, None]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        symmetry = np.abs(b1 - b2) / b1 * 100
+        # Written as "not rejected" so NaN comparisons pass like in the scan
+        mask = (days >= 10) & (days <= 60) & ~(symmetry > 3.0) & ~(b2 < b1 * 0.97)
+        rows, cols = np.nonzero(mask)
+
+        idx1 = local_mins[rows]
+        idx2 = local_mins[cols]
+        bottom1_low = bottoms[rows]
+        bottom2_low = bottoms[cols]
+
+        # Range max of highs[idx1:idx2 + 1] from two overlapping table rows
+        high_table = _range_max_table(highs)
+        level = np.frexp(idx2 + 1 - idx1)[1] - 1
+        peak_high = np.fmax(high_table[level, idx1], high_table[level, idx2 + 1 - (1 << level)])
+
+        avg_bottom = (bottom1_low + bottom2_low) / 2
+        peak_height_pct = (peak_high - avg_bottom) / avg_bottom * 100
+        keep = ~(peak_height_pct < 3.0)
+
+        wick1 = (closes[idx1] - bottom1_low) / (highs[idx1] - bottom1_low)
+        wick2 = (closes[idx2] - bottom2_low) / (highs[idx2] - bottom2_low)
+
+        pairs = np.column_stack((idx1, idx2))[keep].astype(np.int64)
+        metrics = np.column_stack((symmetry[rows, cols], peak_high, peak_height_pct,
+                                   (wick1 + wick2) / 2))[keep]
+
+    return pairs, metrics
+
+
+def _find_double_bottoms(lows: np.ndarray, highs: np.ndarray, closes: np.ndarray,
+                         local_mins: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Double bottom candidates; the jitted scan when numba is available, broadcasting otherwise"""
+    if NUMBA_AVAILABLE:
+        return _double_bottom_pairs(lows, highs, closes, local_mins)
+    return _double_bottom_pairs_numpy(lows, highs, closes, local_mins)
+
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def _head_shoulders_triples(lows, highs, local_mins):
+    """
+    Scan consecutive local minimum triples for inverse head & shoulders
+
+    Returns:
+        (starts, metrics): starts indexes local_mins for the left shoulder;
+        metrics is (k, 3) float64 [shoulder_symmetry, head_depth_pct, neckline]
+    """
+    m = len(local_mins)
+    starts = np.empty(max(m - 2, 1), dtype=np.int64)
+    metrics = np.empty((max(m - 2, 1), 3), dtype=np.float64)
+    k = 0
+
+    for i in range(m - 2):
+        left_idx = local_mins[i]
+        head_idx = local_mins[i + 1]
+        right_idx = local_mins[i + 2]
+
+        left_low = lows[left_idx]
+        head_low = lows[head_idx]
+        right_low = lows[right_idx]
+
+        # Head must be lower than shoulders
+        if head_low >= left_low or head_low >= right_low:
+            continue
+
+        # Shoulders should be symmetric (within 5%)
+        shoulder_symmetry = abs(left_low - right_low) / left_low * 100
+        if shoulder_symmetry > 5.0:
+            continue
+
+        # Head depth (at least 5% lower than shoulders)
+        avg_shoulder = (left_low + right_low) / 2
+        head_depth_pct = (avg_shoulder - head_low) / avg_shoulder * 100
+        if head_depth_pct < 5.0:
+            continue
+
+        # Neckline (resistance between peaks)
+        peak1 = _range_max(highs, left_idx, head_idx)
+        peak2 = _range_max(highs, head_idx, right_idx)
+
+        starts[k] = i
+        metrics[k, 0] = shoulder_symmetry
+        metrics[k, 1] = head_depth_pct
+        metrics[k, 2] = (peak1 + peak2) / 2
+        k += 1
+
+    return starts[:k], metrics[:k]
+
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def _triple_bottom_triples(lows, highs, local_mins):
+    """
+    Scan consecutive local minimum triples for triple bottoms
+
+    Returns:
+        (starts, metrics): starts indexes local_mins for the first bottom;
+        metrics is (k, 2) float64 [avg_bottom, resistance]
+    """
+    m = len(local_mins)
+    starts = np.empty(max(m - 2, 1), dtype=np.int64)
+    metrics = np.empty((max(m - 2, 1), 2), dtype=np.float64)
+    k = 0
+
+    for i in range(m - 2):
+        b1_idx = local_mins[i]
+        b2_idx = local_mins[i + 1]
+        b3_idx = local_mins[i + 2]
+
+        b1 = lows[b1_idx]
+        b2 = lows[b2_idx]
+        b3 = lows[b3_idx]
+
+        # All three bottoms within 3% of each other
+        avg_bottom = (b1 + b2 + b3) / 3
+        if (abs(b1 - avg_bottom) / avg_bottom > 0.03 or
+                abs(b2 - avg_bottom) / avg_bottom > 0.03 or
+                abs(b3 - avg_bottom) / avg_bottom > 0.03):
+            continue
+
+        # Resistance (peaks between bottoms)
+        peak1 = _range_max(highs, b1_idx, b2_idx)
+        peak2 = _range_max(highs, b2_idx, b3_idx)
+
+        starts[k] = i
+        metrics[k, 0] = avg_bottom
+        metrics[k, 1] = (peak1 + peak2) / 2
+        k += 1
+
+    return starts[:k], metrics[:k]
+
 
 class PatternDetector:
     """Detects bullish chart patterns in stock data"""
 
+    # Strength score ladders, see _points_from_floors/_points_from_ceilings:
+    # each points table has one more entry than its thresholds
+    _W_SYMMETRY_CEILINGS = np.array([0.5, 1.0, 2.0, 3.0])
+    _W_SYMMETRY_POINTS = np.array([30, 25, 20, 15, 0])
+    _W_PEAK_FLOORS = np.array([3.0, 5.0, 7.0, 10.0])
+    _W_PEAK_POINTS = np.array([0, 5, 10, 15, 20])
+    _W_VOLUME_FLOORS = np.array([1.0, 1.1, 1.3, 1.5])
+    _W_VOLUME_POINTS = np.array([0, 10, 15, 20, 25])
+    _GENERIC_VOLUME_FLOORS = np.array([1.1, 1.3, 1.5])
+    _GENERIC_VOLUME_POINTS = np.array([0, 15, 20, 25])
+
+    # Pattern state by [closed above breakout][distance band][volume band],
+    # see _determine_pattern_state. Distance bands: within 0.5%, within 2%,
+    # further; volume bands: below 1.3x, 1.3-1.5x, 1.5x+ average.
+    _STATE_TABLE = (
+        (('NEAR_BREAKOUT', 'NEAR_BREAKOUT', 'BREAKOUT_IMMINENT'),
+         ('NEAR_BREAKOUT', 'NEAR_BREAKOUT', 'NEAR_BREAKOUT'),
+         ('FORMING', 'FORMING', 'FORMING')),
+        # Broke out: confirmed with volume, otherwise near (weak volume)
+        (('NEAR_BREAKOUT', 'BREAKOUT_CONFIRMED', 'BREAKOUT_CONFIRMED'),) * 3,
+    )
+
     def __init__(self):
+        # symbol -> state -> patterns in that state, so each tier check only
+        # visits the states it re-evaluates
         self.patterns_cache = {}
 
-    def detect_all_patterns(self, df: pd.DataFrame, symbol: str, market_score: int) -> List[Dict]:
+    def detect_all_patterns(self, arr: np.ndarray, idx: np.ndarray, symbol: str,
+                            market_score: int) -> List[Dict]:
         """
         Detect all bullish patterns (TIER 1 full scan)
 
         Args:
-            df: Stock data with OHLCV
+            arr: OHLCV array from to_ohlcv_arrays
+            idx: Bar timestamps aligned with arr
             symbol: Stock symbol
             market_score: Current market condition score
 
@@ -31,63 +461,106 @@ class PatternDetector:
             List of detected patterns
         """
         patterns = []
+        ctx = self._scan_context(arr)
 
         # Detect each pattern type
-        patterns.extend(self._detect_double_bottom(df, symbol, market_score))
-        patterns.extend(self._detect_inverse_head_shoulders(df, symbol, market_score))
-        patterns.extend(self._detect_ascending_triangle(df, symbol, market_score))
-        patterns.extend(self._detect_bull_flag(df, symbol, market_score))
-        patterns.extend(self._detect_cup_handle(df, symbol, market_score))
-        patterns.extend(self._detect_triple_bottom(df, symbol, market_score))
-        patterns.extend(self._detect_rising_wedge(df, symbol, market_score))
-        patterns.extend(self._detect_symmetrical_triangle(df, symbol, market_score))
+        patterns.extend(self._detect_double_bottom(ctx, symbol, market_score))
+        patterns.extend(self._detect_inverse_head_shoulders(ctx, symbol, market_score))
+        patterns.extend(self._detect_ascending_triangle(ctx, symbol, market_score))
+        patterns.extend(self._detect_bull_flag(ctx, symbol, market_score))
+        patterns.extend(self._detect_cup_handle(ctx, symbol, market_score))
+        patterns.extend(self._detect_triple_bottom(ctx, symbol, market_score))
+        patterns.extend(self._detect_rising_wedge(ctx, symbol, market_score))
+        patterns.extend(self._detect_symmetrical_triangle(ctx, symbol, market_score))
 
         return patterns
 
-    def check_forming_patterns(self, df: pd.DataFrame, symbol: str, market_score: int) -> List[Dict]:
+    def _scan_context(self, arr: np.ndarray, find_extrema: bool = True) -> ScanContext:
+        """
+        Build the inputs shared by every detector for one symbol
+
+        The double/triple bottom and head & shoulders detectors all use the
+        same local minimum scan, so it runs once here.
+
+        Args:
+            arr: OHLCV array from to_ohlcv_arrays
+            find_extrema: Also scan for local minimums (only the full scan
+                needs them)
+        """
+        vol_ratio, volume_confirmed = self._volume_stats(arr)
+        closes = arr[CLOSE]
+        local_mins = None
+        if find_extrema:
+            local_mins = _find_local_mins(arr[LOW, -EXTREMA_WINDOW:], order=EXTREMA_ORDER)
+
+        return ScanContext(
+            arr=arr,
+            current_price=closes[-1] if len(closes) else np.nan,
+            vol_ratio=vol_ratio,
+            volume_confirmed=volume_confirmed,
+            above_ma50=bool(len(closes) >= 50 and closes[-1] > closes[-50:].mean()),
+            local_mins=local_mins
+        )
+
+    def check_forming_patterns(self, arr: np.ndarray, idx: np.ndarray, symbol: str,
+                               market_score: int) -> List[Dict]:
         """Check status of forming patterns (TIER 2)"""
         # Get patterns in FORMING state from cache
-        cached = self.patterns_cache.get(symbol, [])
+        cached = self._cached_in_states(symbol, ('FORMING',))
         patterns = []
+        ctx = self._scan_context(arr, find_extrema=False) if cached else None
 
         for cached_pattern in cached:
-            if cached_pattern['state'] == 'FORMING':
-                # Re-evaluate pattern state
-                updated = self._update_pattern_state(df, cached_pattern, market_score)
-                if updated:
-                    patterns.append(updated)
+            # Re-evaluate pattern state
+            updated = self._update_pattern_state(ctx, cached_pattern, market_score)
+            if updated:
+                patterns.append(updated)
 
         return patterns
 
-    def check_imminent_breakouts(self, df: pd.DataFrame, symbol: str, market_score: int) -> List[Dict]:
+    def check_imminent_breakouts(self, arr: np.ndarray, idx: np.ndarray, symbol: str,
+                                 market_score: int) -> List[Dict]:
         """Check for imminent breakouts (TIER 3)"""
-        cached = self.patterns_cache.get(symbol, [])
+        cached = self._cached_in_states(symbol, ('FORMING', 'NEAR_BREAKOUT'))
         patterns = []
+        ctx = self._scan_context(arr, find_extrema=False) if cached else None
 
         for cached_pattern in cached:
-            if cached_pattern['state'] in ['FORMING', 'NEAR_BREAKOUT']:
-                updated = self._update_pattern_state(df, cached_pattern, market_score)
-                if updated and updated['state'] in ['NEAR_BREAKOUT', 'BREAKOUT_IMMINENT']:
-                    patterns.append(updated)
+            updated = self._update_pattern_state(ctx, cached_pattern, market_score)
+            if updated and updated['state'] in ['NEAR_BREAKOUT', 'BREAKOUT_IMMINENT']:
+                patterns.append(updated)
 
         return patterns
 
-    def check_confirmed_breakouts(self, df: pd.DataFrame, symbol: str, market_score: int) -> List[Dict]:
+    def check_confirmed_breakouts(self, arr: np.ndarray, idx: np.ndarray, symbol: str,
+                                  market_score: int) -> List[Dict]:
         """Check for confirmed breakouts (TIER 4)"""
-        cached = self.patterns_cache.get(symbol, [])
+        cached = self._cached_in_states(symbol, ('BREAKOUT_IMMINENT', 'BREAKOUT_CONFIRMED'))
         patterns = []
+        ctx = self._scan_context(arr, find_extrema=False) if cached else None
 
         for cached_pattern in cached:
-            if cached_pattern['state'] in ['BREAKOUT_IMMINENT', 'BREAKOUT_CONFIRMED']:
-                updated = self._update_pattern_state(df, cached_pattern, market_score)
-                if updated and updated['state'] == 'BREAKOUT_CONFIRMED':
-                    patterns.append(updated)
+            updated = self._update_pattern_state(ctx, cached_pattern, market_score)
+            if updated and updated['state'] == 'BREAKOUT_CONFIRMED':
+                patterns.append(updated)
 
         return patterns
 
+    def _cached_in_states(self, symbol: str, states: Tuple[str, ...]) -> List[Dict]:
+        """
+        Cached patterns for symbol in any of states
+
+        Returns a snapshot, so a pattern that moves to another state bucket
+        while the caller re-evaluates it isn't visited twice.
+        """
+        buckets = self.patterns_cache.get(symbol)
+        if not buckets:
+            return []
+        return [pattern for state in states for pattern in buckets.get(state, ())]
+
     # ===== DOUBLE BOTTOM (W PATTERN) =====
 
-    def _detect_double_bottom(self, df: pd.DataFrame, symbol: str, market_score: int) -> List[Dict]:
+    def _detect_double_bottom(self, ctx: ScanContext, symbol: str, market_score: int) -> List[Dict]:
         """
         Detect W pattern (Double Bottom)
 
@@ -98,119 +571,91 @@ class PatternDetector:
         - Second bottom not >3% lower than first
         - Validate with CLOSE (wick_ratio > 0.6)
         """
-        if len(df) < 60:
+        arr = ctx.arr
+        if arr.shape[1] < 60:
             return []
 
         patterns = []
-        df_subset = df.tail(180)  # Last 6 months
+        subset = arr[:, -EXTREMA_WINDOW:]  # Last 6 months
 
         # Find local minimums (bottoms)
-        lows = df_subset['Low'].values
-        local_mins = argrelextrema(lows, np.less, order=5)[0]
+        lows = subset[LOW]
+        local_mins = ctx.local_mins
 
         if len(local_mins) < 2:
             return []
 
-        # Check all pairs of bottoms
-        for i in range(len(local_mins) - 1):
-            for j in range(i + 1, len(local_mins)):
-                idx1, idx2 = local_mins[i], local_mins[j]
-
-                # Time spacing check (10-60 days)
-                days_between = idx2 - idx1
-                if days_between < 10 or days_between > 60:
-                    continue
-
-                # Get bottom values
-                bottom1_low = df_subset.iloc[idx1]['Low']
-                bottom2_low = df_subset.iloc[idx2]['Low']
-                bottom1_close = df_subset.iloc[idx1]['Close']
-                bottom2_close = df_subset.iloc[idx2]['Close']
-
-                # Symmetry check (≤3% difference)
-                symmetry_diff = abs(bottom1_low - bottom2_low) / bottom1_low * 100
-                if symmetry_diff > 3.0:
-                    continue
-
-                # Second bottom validation (not >3% lower)
-                if bottom2_low < bottom1_low * 0.97:
-                    continue
-
-                # Find peak between bottoms
-                peak_slice = df_subset.iloc[idx1:idx2 + 1]
-                peak_idx_local = peak_slice['High'].idxmax()
-                peak_high = peak_slice.loc[peak_idx_local, 'High']
-
-                # Peak height check (≥3% above bottoms)
-                avg_bottom = (bottom1_low + bottom2_low) / 2
-                peak_height_pct = (peak_high - avg_bottom) / avg_bottom * 100
-                if peak_height_pct < 3.0:
-                    continue
-
-                # Wick ratio validation (strong bottoms)
-                wick1 = (bottom1_close - bottom1_low) / (df_subset.iloc[idx1]['High'] - bottom1_low)
-                wick2 = (bottom2_close - bottom2_low) / (df_subset.iloc[idx2]['High'] - bottom2_low)
-                avg_wick_ratio = (wick1 + wick2) / 2
-
-                # Calculate breakout point (neckline = peak)
-                breakout_point = peak_high
-                current_price = df.iloc[-1]['Close']
-                distance_pct = (breakout_point - current_price) / current_price * 100
-
-                # Calculate pattern strength score
-                strength_score = self._calculate_w_pattern_strength(
-                    symmetry_diff=symmetry_diff,
-                    peak_height_pct=peak_height_pct,
-                    wick_ratio=avg_wick_ratio,
-                    days_between=days_between,
-                    df=df,
-                    market_score=market_score
-                )
-
-                # Determine pattern state
-                state = self._determine_pattern_state(
-                    current_price=current_price,
-                    breakout_point=breakout_point,
-                    distance_pct=distance_pct,
-                    df=df
-                )
-
-                # Skip if pattern already broke down
-                if current_price < avg_bottom * 0.97:
-                    continue
-
-                # Create pattern object
-                pattern = {
-                    'symbol': symbol,
-                    'pattern_type': 'DOUBLE_BOTTOM',
-                    'state': state,
-                    'strength_score': strength_score,
-                    'current_price': current_price,
-                    'breakout_point': breakout_point,
-                    'distance_pct': distance_pct,
-                    'invalidation_point': avg_bottom * 0.97,
-                    'target1': breakout_point + (breakout_point - avg_bottom) * 0.382,
-                    'target2': breakout_point + (breakout_point - avg_bottom) * 0.618,
-                    'target3': breakout_point + (breakout_point - avg_bottom) * 1.0,
-                    'stop_loss': avg_bottom * 0.97,
-                    'volume_confirmed': self._check_volume_confirmation(df),
-                    'details': {
-                        'bottom1': bottom1_low,
-                        'bottom2': bottom2_low,
-                        'peak': peak_high,
-                        'symmetry_diff': symmetry_diff,
-                        'peak_height_pct': peak_height_pct,
-                        'wick_ratio': avg_wick_ratio,
-                        'days_between': days_between
-                    }
+        # Check all pairs of bottoms (spacing, symmetry, peak and wick checks)
+        highs = subset[HIGH]
+        closes = subset[CLOSE]
+        pairs, metrics = _find_double_bottoms(lows, highs, closes, local_mins)
+
+        current_price = ctx.current_price
+
+        for (idx1, idx2), (symmetry_diff, peak_high, peak_height_pct, avg_wick_ratio) in zip(pairs, metrics):
+            days_between = idx2 - idx1
+            bottom1_low = lows[idx1]
+            bottom2_low = lows[idx2]
+            avg_bottom = (bottom1_low + bottom2_low) / 2
+
+            # Calculate breakout point (neckline = peak)
+            breakout_point = peak_high
+            distance_pct = (breakout_point - current_price) / current_price * 100
+
+            # Calculate pattern strength score
+            strength_score = self._calculate_w_pattern_strength(
+                symmetry_diff=symmetry_diff,
+                peak_height_pct=peak_height_pct,
+                wick_ratio=avg_wick_ratio,
+                days_between=days_between,
+                vol_ratio=ctx.vol_ratio,
+                market_score=market_score
+            )
+
+            # Determine pattern state
+            state = self._determine_pattern_state(
+                current_price=current_price,
+                breakout_point=breakout_point,
+                distance_pct=distance_pct,
+                vol_ratio=ctx.vol_ratio
+            )
+
+            # Skip if pattern already broke down
+            if current_price < avg_bottom * 0.97:
+                continue
+
+            # Create pattern object
+            pattern = {
+                'symbol': symbol,
+                'pattern_type': 'DOUBLE_BOTTOM',
+                'state': state,
+                'strength_score': strength_score,
+                'current_price': current_price,
+                'breakout_point': breakout_point,
+                'distance_pct': distance_pct,
+                'invalidation_point': avg_bottom * 0.97,
+                'target1': breakout_point + (breakout_point - avg_bottom) * 0.382,
+                'target2': breakout_point + (breakout_point - avg_bottom) * 0.618,
+                'target3': breakout_point + (breakout_point - avg_bottom) * 1.0,
+                'stop_loss': avg_bottom * 0.97,
+                'volume_confirmed': ctx.volume_confirmed,
+                'details': {
+                    'bottom1': bottom1_low,
+                    'bottom2': bottom2_low,
+                    'peak': peak_high,
+                    'symmetry_diff': symmetry_diff,
+                    'peak_height_pct': peak_height_pct,
+                    'wick_ratio': avg_wick_ratio,
+                    'days_between': days_between
                 }
+            }
 
-                patterns.append(pattern)
+            patterns.append(pattern)
 
         return patterns
 
     def _calculate_w_pattern_strength(self, symmetry_diff: float, peak_height_pct: float,
-                                      wick_ratio: float, days_between: int, df: pd.DataFrame,
+                                      wick_ratio: float, days_between: int, vol_ratio: float,
                                       market_score: int) -> int:
         """
         Calculate W pattern strength score (0-100)
@@ -225,107 +670,62 @@ class PatternDetector:
         score = 0
 
         # Symmetry (30 points) - lower diff = higher score
-        if symmetry_diff <= 0.5:
-            score += 30
-        elif symmetry_diff <= 1.0:
-            score += 25
-        elif symmetry_diff <= 2.0:
-            score += 20
-        elif symmetry_diff <= 3.0:
-            score += 15
+        score += _points_from_ceilings(symmetry_diff, self._W_SYMMETRY_CEILINGS, self._W_SYMMETRY_POINTS)
 
         # Peak height (20 points)
-        if peak_height_pct >= 10:
-            score += 20
-        elif peak_height_pct >= 7:
-            score += 15
-        elif peak_height_pct >= 5:
-            score += 10
-        elif peak_height_pct >= 3:
-            score += 5
+        score += _points_from_floors(peak_height_pct, self._W_PEAK_FLOORS, self._W_PEAK_POINTS)
 
         # Volume confirmation (25 points)
-        vol_ratio = self._get_volume_ratio(df)
-        if vol_ratio >= 1.5:
-            score += 25
-        elif vol_ratio >= 1.3:
-            score += 20
-        elif vol_ratio >= 1.1:
-            score += 15
-        elif vol_ratio >= 1.0:
-            score += 10
+        score += _points_from_floors(vol_ratio, self._W_VOLUME_FLOORS, self._W_VOLUME_POINTS)
 
         # Market conditions (15 points) - scaled from market_score
         score += int((market_score / 100) * 15)
 
         # Time spacing (10 points) - optimal 20-40 days
-        if 20 <= days_between <= 40:
-            score += 10
-        elif 15 <= days_between <= 50:
-            score += 7
-        elif 10 <= days_between <= 60:
-            score += 5
+        score += _W_SPACING_POINTS[min(days_between, len(_W_SPACING_POINTS) - 1)]
 
-        return min(100, score)
+        return min(100, int(score))
 
     # ===== INVERSE HEAD & SHOULDERS =====
 
-    def _detect_inverse_head_shoulders(self, df: pd.DataFrame, symbol: str, market_score: int) -> List[Dict]:
+    def _detect_inverse_head_shoulders(self, ctx: ScanContext, symbol: str, market_score: int) -> List[Dict]:
         """Detect Inverse Head & Shoulders pattern"""
-        if len(df) < 60:
+        arr = ctx.arr
+        if arr.shape[1] < 60:
             return []
 
         patterns = []
-        df_subset = df.tail(180)
+        subset = arr[:, -EXTREMA_WINDOW:]
 
-        lows = df_subset['Low'].values
-        local_mins = argrelextrema(lows, np.less, order=5)[0]
+        lows = subset[LOW]
+        local_mins = ctx.local_mins
 
         if len(local_mins) < 3:
             return []
 
         # Check for head & shoulders formation
-        for i in range(len(local_mins) - 2):
-            left_idx = local_mins[i]
-            head_idx = local_mins[i + 1]
-            right_idx = local_mins[i + 2]
-
-            left_low = df_subset.iloc[left_idx]['Low']
-            head_low = df_subset.iloc[head_idx]['Low']
-            right_low = df_subset.iloc[right_idx]['Low']
-
-            # Head must be lower than shoulders
-            if head_low >= left_low or head_low >= right_low:
-                continue
-
-            # Shoulders should be symmetric (within 5%)
-            shoulder_symmetry = abs(left_low - right_low) / left_low * 100
-            if shoulder_symmetry > 5.0:
-                continue
+        highs = subset[HIGH]
+        starts, metrics = _head_shoulders_triples(lows, highs, local_mins)
 
-            # Head depth (at least 5% lower than shoulders)
-            avg_shoulder = (left_low + right_low) / 2
-            head_depth_pct = (avg_shoulder - head_low) / avg_shoulder * 100
-            if head_depth_pct < 5.0:
-                continue
+        current_price = ctx.current_price
 
-            # Find neckline (resistance between peaks)
-            peak1 = df_subset.iloc[left_idx:head_idx]['High'].max()
-            peak2 = df_subset.iloc[head_idx:right_idx]['High'].max()
-            neckline = (peak1 + peak2) / 2
+        for i, (shoulder_symmetry, head_depth_pct, neckline) in zip(starts, metrics):
+            left_low = lows[local_mins[i]]
+            head_low = lows[local_mins[i + 1]]
+            right_low = lows[local_mins[i + 2]]
 
-            current_price = df.iloc[-1]['Close']
             distance_pct = (neckline - current_price) / current_price * 100
 
             # Calculate strength
             strength_score = self._calculate_generic_strength(
                 symmetry=100 - shoulder_symmetry * 10,
                 depth_pct=head_depth_pct,
-                df=df,
+                vol_ratio=ctx.vol_ratio,
+                above_ma50=ctx.above_ma50,
                 market_score=market_score
             )
 
-            state = self._determine_pattern_state(current_price, neckline, distance_pct, df)
+            state = self._determine_pattern_state(current_price, neckline, distance_pct, ctx.vol_ratio)
 
             pattern = {
                 'symbol': symbol,
@@ -340,7 +740,7 @@ class PatternDetector:
                 'target2': neckline + (neckline - head_low) * 0.618,
                 'target3': neckline + (neckline - head_low) * 1.0,
                 'stop_loss': head_low,
-                'volume_confirmed': self._check_volume_confirmation(df),
+                'volume_confirmed': ctx.volume_confirmed,
                 'details': {
                     'left_shoulder': left_low,
                     'head': head_low,
@@ -355,43 +755,46 @@ class PatternDetector:
 
     # ===== ASCENDING TRIANGLE =====
 
-    def _detect_ascending_triangle(self, df: pd.DataFrame, symbol: str, market_score: int) -> List[Dict]:
+    def _detect_ascending_triangle(self, ctx: ScanContext, symbol: str, market_score: int) -> List[Dict]:
         """Detect Ascending Triangle pattern"""
-        if len(df) < 40:
+        arr = ctx.arr
+        if arr.shape[1] < 40:
             return []
 
         patterns = []
-        df_subset = df.tail(120)
+        subset = arr[:, -120:]
 
         # Find resistance level (flat top)
-        highs = df_subset['High'].values
-        resistance = np.percentile(highs[-40:], 95)
+        highs = subset[HIGH]
+        recent_highs = highs[-40:]
+        resistance = _percentile(recent_highs, 95)
 
         # Count touches near resistance (within 1%)
-        touches = np.sum(np.abs(highs[-40:] - resistance) / resistance < 0.01)
+        touches = np.count_nonzero(np.abs(recent_highs - resistance) / resistance < 0.01)
 
         if touches < 2:
             return []
 
         # Check for rising lows
-        lows = df_subset['Low'].values[-40:]
+        lows = subset[LOW, -40:]
         rising_lows = self._check_rising_trendline(lows)
 
         if not rising_lows:
             return []
 
-        current_price = df.iloc[-1]['Close']
+        current_price = ctx.current_price
         distance_pct = (resistance - current_price) / current_price * 100
 
         # Calculate strength
         strength_score = self._calculate_generic_strength(
             symmetry=touches * 15,  # More touches = stronger
             depth_pct=min(20, touches * 5),
-            df=df,
+            vol_ratio=ctx.vol_ratio,
+            above_ma50=ctx.above_ma50,
             market_score=market_score
         )
 
-        state = self._determine_pattern_state(current_price, resistance, distance_pct, df)
+        state = self._determine_pattern_state(current_price, resistance, distance_pct, ctx.vol_ratio)
 
         pattern = {
             'symbol': symbol,
@@ -406,7 +809,7 @@ class PatternDetector:
             'target2': resistance * 1.05,
             'target3': resistance * 1.08,
             'stop_loss': lows.min() * 0.98,
-            'volume_confirmed': self._check_volume_confirmation(df),
+            'volume_confirmed': ctx.volume_confirmed,
             'details': {
                 'resistance': resistance,
                 'touches': int(touches)
@@ -419,44 +822,47 @@ class PatternDetector:
 
     # ===== BULL FLAG / PENNANT =====
 
-    def _detect_bull_flag(self, df: pd.DataFrame, symbol: str, market_score: int) -> List[Dict]:
+    def _detect_bull_flag(self, ctx: ScanContext, symbol: str, market_score: int) -> List[Dict]:
         """Detect Bull Flag & Pennant patterns"""
-        if len(df) < 30:
+        arr = ctx.arr
+        if arr.shape[1] < 30:
             return []
 
         patterns = []
-        df_subset = df.tail(60)
+        subset = arr[:, -60:]
 
         # Look for strong uptrend (pole)
         pole_start = -30
         pole_end = -10
-        pole_gain = (df_subset.iloc[pole_end]['Close'] - df_subset.iloc[pole_start]['Close']) / df_subset.iloc[pole_start]['Close'] * 100
+        closes = subset[CLOSE]
+        pole_gain = (closes[pole_end] - closes[pole_start]) / closes[pole_start] * 100
 
         if pole_gain < 8:  # Minimum 8% gain for pole
             return []
 
         # Check for consolidation (flag)
-        consolidation = df_subset.iloc[-10:]
-        price_range = (consolidation['High'].max() - consolidation['Low'].min()) / consolidation['Close'].mean() * 100
+        consolidation = subset[:, -10:]
+        price_range = (consolidation[HIGH].max() - consolidation[LOW].min()) / consolidation[CLOSE].mean() * 100
 
         if price_range > 5:  # Flag should be tight (< 5%)
             return []
 
         # Check for slight downward slope (classic flag)
-        flag_slope = (consolidation.iloc[-1]['Close'] - consolidation.iloc[0]['Close']) / consolidation.iloc[0]['Close'] * 100
+        flag_slope = (consolidation[CLOSE, -1] - consolidation[CLOSE, 0]) / consolidation[CLOSE, 0] * 100
 
-        breakout_point = consolidation['High'].max()
-        current_price = df.iloc[-1]['Close']
+        breakout_point = consolidation[HIGH].max()
+        current_price = ctx.current_price
         distance_pct = (breakout_point - current_price) / current_price * 100
 
         strength_score = self._calculate_generic_strength(
             symmetry=max(0, 100 - price_range * 10),
             depth_pct=pole_gain,
-            df=df,
+            vol_ratio=ctx.vol_ratio,
+            above_ma50=ctx.above_ma50,
             market_score=market_score
         )
 
-        state = self._determine_pattern_state(current_price, breakout_point, distance_pct, df)
+        state = self._determine_pattern_state(current_price, breakout_point, distance_pct, ctx.vol_ratio)
 
         pattern = {
             'symbol': symbol,
@@ -466,12 +872,12 @@ class PatternDetector:
             'current_price': current_price,
             'breakout_point': breakout_point,
             'distance_pct': distance_pct,
-            'invalidation_point': consolidation['Low'].min() * 0.98,
+            'invalidation_point': consolidation[LOW].min() * 0.98,
             'target1': breakout_point + pole_gain * 0.01 * breakout_point * 0.5,
             'target2': breakout_point + pole_gain * 0.01 * breakout_point * 0.75,
             'target3': breakout_point + pole_gain * 0.01 * breakout_point,
-            'stop_loss': consolidation['Low'].min() * 0.98,
-            'volume_confirmed': self._check_volume_confirmation(df),
+            'stop_loss': consolidation[LOW].min() * 0.98,
+            'volume_confirmed': ctx.volume_confirmed,
             'details': {
                 'pole_gain': pole_gain,
                 'flag_range': price_range
@@ -484,19 +890,20 @@ class PatternDetector:
 
     # ===== CUP & HANDLE =====
 
-    def _detect_cup_handle(self, df: pd.DataFrame, symbol: str, market_score: int) -> List[Dict]:
+    def _detect_cup_handle(self, ctx: ScanContext, symbol: str, market_score: int) -> List[Dict]:
         """Detect Cup & Handle (Rounded Bottom) pattern"""
-        if len(df) < 90:
+        arr = ctx.arr
+        if arr.shape[1] < 90:
             return []
 
         patterns = []
-        df_subset = df.tail(180)
+        subset = arr[:, -180:]
 
         # Find potential cup (U-shaped curve)
-        cup_window = df_subset.iloc[-90:-20]
-        cup_start_price = cup_window.iloc[0]['Close']
-        cup_low = cup_window['Low'].min()
-        cup_end_price = cup_window.iloc[-1]['Close']
+        cup_window = subset[:, -90:-20]
+        cup_start_price = cup_window[CLOSE, 0]
+        cup_low = cup_window[LOW].min()
+        cup_end_price = cup_window[CLOSE, -1]
 
         # Cup depth (10-30% ideal)
         cup_depth = (cup_start_price - cup_low) / cup_start_price * 100
@@ -504,32 +911,34 @@ class PatternDetector:
             return []
 
         # Check for U-shape (bottom should be rounded)
-        bottom_quarter = cup_window.iloc[len(cup_window)//3: 2*len(cup_window)//3]
-        bottom_volatility = bottom_quarter['Close'].std() / bottom_quarter['Close'].mean()
+        cup_len = cup_window.shape[1]
+        bottom_quarter = cup_window[CLOSE, cup_len//3: 2*cup_len//3]
+        bottom_volatility = bottom_quarter.std(ddof=1) / bottom_quarter.mean()
         if bottom_volatility > 0.05:  # Too volatile = not rounded
             return []
 
         # Check for handle (small retracement)
-        handle = df_subset.iloc[-20:]
+        handle = subset[:, -20:]
         handle_high = cup_end_price
-        handle_low = handle['Low'].min()
+        handle_low = handle[LOW].min()
         handle_depth = (handle_high - handle_low) / handle_high * 100
 
         if handle_depth < 3 or handle_depth > 15:  # Handle should be 3-15% retracement
             return []
 
         breakout_point = max(cup_start_price, handle_high)
-        current_price = df.iloc[-1]['Close']
+        current_price = ctx.current_price
         distance_pct = (breakout_point - current_price) / current_price * 100
 
         strength_score = self._calculate_generic_strength(
             symmetry=max(0, 100 - abs(cup_depth - 20) * 5),
             depth_pct=cup_depth,
-            df=df,
+            vol_ratio=ctx.vol_ratio,
+            above_ma50=ctx.above_ma50,
             market_score=market_score
         )
 
-        state = self._determine_pattern_state(current_price, breakout_point, distance_pct, df)
+        state = self._determine_pattern_state(current_price, breakout_point, distance_pct, ctx.vol_ratio)
 
         pattern = {
             'symbol': symbol,
@@ -544,7 +953,7 @@ class PatternDetector:
             'target2': breakout_point + cup_depth * 0.01 * breakout_point * 0.75,
             'target3': breakout_point + cup_depth * 0.01 * breakout_point,
             'stop_loss': handle_low * 0.98,
-            'volume_confirmed': self._check_volume_confirmation(df),
+            'volume_confirmed': ctx.volume_confirmed,
             'details': {
                 'cup_depth': cup_depth,
                 'handle_depth': handle_depth
@@ -557,51 +966,43 @@ class PatternDetector:
 
     # ===== TRIPLE BOTTOM =====
 
-    def _detect_triple_bottom(self, df: pd.DataFrame, symbol: str, market_score: int) -> List[Dict]:
+    def _detect_triple_bottom(self, ctx: ScanContext, symbol: str, market_score: int) -> List[Dict]:
         """Detect Triple Bottom pattern"""
-        if len(df) < 90:
+        arr = ctx.arr
+        if arr.shape[1] < 90:
             return []
 
         patterns = []
-        df_subset = df.tail(180)
+        subset = arr[:, -EXTREMA_WINDOW:]
 
-        lows = df_subset['Low'].values
-        local_mins = argrelextrema(lows, np.less, order=5)[0]
+        lows = subset[LOW]
+        local_mins = ctx.local_mins
 
         if len(local_mins) < 3:
             return []
 
         # Check for three similar bottoms
-        for i in range(len(local_mins) - 2):
-            b1_idx = local_mins[i]
-            b2_idx = local_mins[i + 1]
-            b3_idx = local_mins[i + 2]
-
-            b1 = df_subset.iloc[b1_idx]['Low']
-            b2 = df_subset.iloc[b2_idx]['Low']
-            b3 = df_subset.iloc[b3_idx]['Low']
-
-            # All three bottoms within 3% of each other
-            avg_bottom = (b1 + b2 + b3) / 3
-            if any(abs(b - avg_bottom) / avg_bottom > 0.03 for b in [b1, b2, b3]):
-                continue
+        highs = subset[HIGH]
+        starts, metrics = _triple_bottom_triples(lows, highs, local_mins)
+
+        current_price = ctx.current_price
 
-            # Find resistance (peaks between bottoms)
-            peak1 = df_subset.iloc[b1_idx:b2_idx]['High'].max()
-            peak2 = df_subset.iloc[b2_idx:b3_idx]['High'].max()
-            resistance = (peak1 + peak2) / 2
+        for i, (avg_bottom, resistance) in zip(starts, metrics):
+            b1 = lows[local_mins[i]]
+            b2 = lows[local_mins[i + 1]]
+            b3 = lows[local_mins[i + 2]]
 
-            current_price = df.iloc[-1]['Close']
             distance_pct = (resistance - current_price) / current_price * 100
 
             strength_score = self._calculate_generic_strength(
                 symmetry=90,  # Three touches = strong
                 depth_pct=(resistance - avg_bottom) / avg_bottom * 100,
-                df=df,
+                vol_ratio=ctx.vol_ratio,
+                above_ma50=ctx.above_ma50,
                 market_score=market_score
             )
 
-            state = self._determine_pattern_state(current_price, resistance, distance_pct, df)
+            state = self._determine_pattern_state(current_price, resistance, distance_pct, ctx.vol_ratio)
 
             pattern = {
                 'symbol': symbol,
@@ -616,7 +1017,7 @@ class PatternDetector:
                 'target2': resistance + (resistance - avg_bottom) * 0.75,
                 'target3': resistance + (resistance - avg_bottom) * 1.0,
                 'stop_loss': avg_bottom * 0.97,
-                'volume_confirmed': self._check_volume_confirmation(df),
+                'volume_confirmed': ctx.volume_confirmed,
                 'details': {
                     'bottoms': [b1, b2, b3],
                     'resistance': resistance
@@ -629,26 +1030,29 @@ class PatternDetector:
 
     # ===== RISING WEDGE =====
 
-    def _detect_rising_wedge(self, df: pd.DataFrame, symbol: str, market_score: int) -> List[Dict]:
+    def _detect_rising_wedge(self, ctx: ScanContext, symbol: str, market_score: int) -> List[Dict]:
         """Detect Rising Wedge pattern (bullish breakout potential)"""
-        if len(df) < 40:
+        arr = ctx.arr
+        if arr.shape[1] < 40:
             return []
 
         patterns = []
-        df_subset = df.tail(90)
+        subset = arr[:, -90:]
 
         # Check for converging trendlines (both rising, but highs rising faster)
-        recent = df_subset.tail(40)
-        lows = recent['Low'].values
-        highs = recent['High'].values
+        recent = subset[:, -40:]
+        lows = recent[LOW]
+        highs = recent[HIGH]
 
-        # Both should be rising
-        if not self._check_rising_trendline(lows) or not self._check_rising_trendline(highs):
-            return []
-
-        # Calculate slopes
+        # Both should be rising. recent always has 40 bars, so a positive
+        # slope is the rising trendline check; each slope is computed once
+        # and reused for the converging check.
         low_slope = self._calculate_trendline_slope(lows)
+        if not low_slope > 0:
+            return []
         high_slope = self._calculate_trendline_slope(highs)
+        if not high_slope > 0:
+            return []
 
         # Converging check (high slope > low slope)
         if high_slope <= low_slope:
@@ -656,17 +1060,18 @@ class PatternDetector:
 
         # Upper trendline is breakout point
         breakout_point = highs[-1] * 1.01  # Slightly above current high
-        current_price = df.iloc[-1]['Close']
+        current_price = ctx.current_price
         distance_pct = (breakout_point - current_price) / current_price * 100
 
         strength_score = self._calculate_generic_strength(
             symmetry=70,
             depth_pct=10,
-            df=df,
+            vol_ratio=ctx.vol_ratio,
+            above_ma50=ctx.above_ma50,
             market_score=market_score
         )
 
-        state = self._determine_pattern_state(current_price, breakout_point, distance_pct, df)
+        state = self._determine_pattern_state(current_price, breakout_point, distance_pct, ctx.vol_ratio)
 
         pattern = {
             'symbol': symbol,
@@ -681,7 +1086,7 @@ class PatternDetector:
             'target2': breakout_point * 1.05,
             'target3': breakout_point * 1.08,
             'stop_loss': lows.min() * 0.98,
-            'volume_confirmed': self._check_volume_confirmation(df),
+            'volume_confirmed': ctx.volume_confirmed,
             'details': {
                 'convergence': True
             }
@@ -693,17 +1098,18 @@ class PatternDetector:
 
     # ===== SYMMETRICAL TRIANGLE =====
 
-    def _detect_symmetrical_triangle(self, df: pd.DataFrame, symbol: str, market_score: int) -> List[Dict]:
+    def _detect_symmetrical_triangle(self, ctx: ScanContext, symbol: str, market_score: int) -> List[Dict]:
         """Detect Symmetrical Triangle pattern"""
-        if len(df) < 40:
+        arr = ctx.arr
+        if arr.shape[1] < 40:
             return []
 
         patterns = []
-        df_subset = df.tail(90)
+        subset = arr[:, -90:]
 
-        recent = df_subset.tail(40)
-        lows = recent['Low'].values
-        highs = recent['High'].values
+        recent = subset[:, -40:]
+        lows = recent[LOW]
+        highs = recent[HIGH]
 
         # Check for converging range
         early_range = (highs[:10].max() - lows[:10].min()) / lows[:10].min()
@@ -715,17 +1121,18 @@ class PatternDetector:
 
         # Breakout could be either direction, but we focus on upside
         breakout_point = highs[-10:].max()
-        current_price = df.iloc[-1]['Close']
+        current_price = ctx.current_price
         distance_pct = (breakout_point - current_price) / current_price * 100
 
         strength_score = self._calculate_generic_strength(
             symmetry=max(0, 100 - late_range / early_range * 100),
             depth_pct=early_range * 100,
-            df=df,
+            vol_ratio=ctx.vol_ratio,
+            above_ma50=ctx.above_ma50,
             market_score=market_score
         )
 
-        state = self._determine_pattern_state(current_price, breakout_point, distance_pct, df)
+        state = self._determine_pattern_state(current_price, breakout_point, distance_pct, ctx.vol_ratio)
 
         pattern = {
             'symbol': symbol,
@@ -740,7 +1147,7 @@ class PatternDetector:
             'target2': breakout_point * 1.06,
             'target3': breakout_point * 1.10,
             'stop_loss': lows.min() * 0.98,
-            'volume_confirmed': self._check_volume_confirmation(df),
+            'volume_confirmed': ctx.volume_confirmed,
             'details': {
                 'early_range': early_range,
                 'late_range': late_range
@@ -754,7 +1161,7 @@ class PatternDetector:
     # ===== HELPER METHODS =====
 
     def _determine_pattern_state(self, current_price: float, breakout_point: float,
-                                  distance_pct: float, df: pd.DataFrame) -> str:
+                                  distance_pct: float, vol_ratio: float) -> str:
         """
         Determine pattern state based on price proximity to breakout
 
@@ -764,48 +1171,36 @@ class PatternDetector:
         - BREAKOUT_IMMINENT: Within 0.5% + volume building (>1.5x avg)
         - BREAKOUT_CONFIRMED: Price closed above breakout with volume (>1.3x avg)
         """
-        if current_price > breakout_point:
-            # Check volume confirmation
-            vol_ratio = self._get_volume_ratio(df)
-            if vol_ratio >= 1.3:
-                return 'BREAKOUT_CONFIRMED'
-            else:
-                return 'NEAR_BREAKOUT'  # Broke out but weak volume
-
-        # Distance checks
-        if distance_pct <= 0.5:
-            vol_ratio = self._get_volume_ratio(df)
-            if vol_ratio >= 1.5:
-                return 'BREAKOUT_IMMINENT'
-            else:
-                return 'NEAR_BREAKOUT'
-        elif distance_pct <= 2.0:
-            return 'NEAR_BREAKOUT'
-        else:
-            return 'FORMING'
-
-    def _check_volume_confirmation(self, df: pd.DataFrame, lookback: int = 3) -> bool:
-        """Check if recent volume is elevated"""
-        if len(df) < 20:
-            return False
+        # Bands as counts of thresholds passed; NaN distance lands in the
+        # furthest band and NaN volume in the lowest, as the old ladder did
+        broke_out = bool(current_price > breakout_point)
+        distance_band = (not distance_pct <= 0.5) + (not distance_pct <= 2.0)
+        volume_band = bool(vol_ratio >= 1.3) + bool(vol_ratio >= 1.5)
 
-        recent_vol = df['Volume'].iloc[-lookback:].mean()
-        avg_vol = df['Volume'].iloc[-20:-lookback].mean()
+        return self._STATE_TABLE[broke_out][distance_band][volume_band]
 
-        return recent_vol > avg_vol * 1.3
+    def _volume_stats(self, arr: np.ndarray, lookback: int = 3) -> Tuple[float, bool]:
+        """
+        Recent vs average volume, from the last 20 bars
 
-    def _get_volume_ratio(self, df: pd.DataFrame, lookback: int = 3) -> float:
-        """Get volume ratio (recent vs average)"""
-        if len(df) < 20:
-            return 1.0
+        Computed once per symbol, see _scan_context.
 
-        recent_vol = df['Volume'].iloc[-lookback:].mean()
-        avg_vol = df['Volume'].iloc[-20:-lookback].mean()
+        Returns:
+            (vol_ratio, volume_confirmed): recent/average volume (1.0 when
+            there's too little data or no average volume), and whether recent
+            volume is elevated (>1.3x average)
+        """
+        if arr.shape[1] < 20:
+            return 1.0, False
 
-        if avg_vol == 0:
-            return 1.0
+        # Volume may still be NaN on bars kept by to_ohlcv_arrays; skip it
+        # the way the pandas means this replaced did
+        volume = arr[VOLUME, -20:]
+        recent_vol = np.nanmean(volume[-lookback:])
+        avg_vol = np.nanmean(volume[:-lookback])
 
-        return recent_vol / avg_vol
+        vol_ratio = 1.0 if avg_vol == 0 else recent_vol / avg_vol
+        return vol_ratio, recent_vol > avg_vol * 1.3
 
     def _check_rising_trendline(self, values: np.ndarray) -> bool:
         """Check if values form a rising trendline"""
@@ -813,23 +1208,17 @@ class PatternDetector:
             return False
 
         # Simple linear regression
-        x = np.arange(len(values))
-        slope = np.polyfit(x, values, 1)[0]
-
-        return slope > 0
+        return _trend_slope(values) > 0
 
     def _calculate_trendline_slope(self, values: np.ndarray) -> float:
         """Calculate slope of trendline"""
         if len(values) < 2:
             return 0.0
 
-        x = np.arange(len(values))
-        slope = np.polyfit(x, values, 1)[0]
-
-        return slope
+        return _trend_slope(values)
 
-    def _calculate_generic_strength(self, symmetry: float, depth_pct: float,
-                                     df: pd.DataFrame, market_score: int) -> int:
+    def _calculate_generic_strength(self, symmetry: float, depth_pct: float, vol_ratio: float,
+                                     above_ma50: bool, market_score: int) -> int:
         """Generic strength calculation for simpler patterns"""
         score = 0
 
@@ -840,28 +1229,20 @@ class PatternDetector:
         score += min(20, int(depth_pct * 2))
 
         # Volume (25 points)
-        vol_ratio = self._get_volume_ratio(df)
-        if vol_ratio >= 1.5:
-            score += 25
-        elif vol_ratio >= 1.3:
-            score += 20
-        elif vol_ratio >= 1.1:
-            score += 15
+        score += _points_from_floors(vol_ratio, self._GENERIC_VOLUME_FLOORS, self._GENERIC_VOLUME_POINTS)
 
         # Market conditions (15 points)
         score += int((market_score / 100) * 15)
 
         # Trend alignment (5 points)
-        if len(df) >= 50:
-            ma50 = df['Close'].tail(50).mean()
-            if df.iloc[-1]['Close'] > ma50:
-                score += 5
+        if above_ma50:
+            score += 5
 
-        return min(100, score)
+        return min(100, int(score))
 
-    def _update_pattern_state(self, df: pd.DataFrame, pattern: Dict, market_score: int) -> Optional[Dict]:
+    def _update_pattern_state(self, ctx: ScanContext, pattern: Dict, market_score: int) -> Optional[Dict]:
         """Update pattern state with latest data"""
-        current_price = df.iloc[-1]['Close']
+        current_price = ctx.current_price
         breakout_point = pattern['breakout_point']
         distance_pct = (breakout_point - current_price) / current_price * 100
 
@@ -871,14 +1252,23 @@ class PatternDetector:
             return None
 
         # Update state
-        new_state = self._determine_pattern_state(current_price, breakout_point, distance_pct, df)
+        new_state = self._determine_pattern_state(current_price, breakout_point, distance_pct, ctx.vol_ratio)
 
         # Only return if state changed
-        if new_state != pattern['state']:
+        old_state = pattern['state']
+        if new_state != old_state:
+            # Keep the cached pattern in the bucket for its new state
+            bucket = self.patterns_cache.get(pattern['symbol'], {}).get(old_state, [])
+            for i, cached in enumerate(bucket):
+                if cached is pattern:
+                    del bucket[i]
+                    self.patterns_cache[pattern['symbol']].setdefault(new_state, []).append(pattern)
+                    break
+
             pattern['state'] = new_state
             pattern['current_price'] = current_price
             pattern['distance_pct'] = distance_pct
-            pattern['volume_confirmed'] = self._check_volume_confirmation(df)
+            pattern['volume_confirmed'] = ctx.volume_confirmed
             return pattern
 
         return None
@@ -5,8 +5,70 @@ Helps with initial configuration
 
 import os
 import sys
+from importlib.util import find_spec
 from pathlib import Path
 
+SECRETS_TEMPLATE = """# Streamlit Secrets Configuration
+# Fill in your actual credentials below
+
+# Email Configuration
+SENDER_EMAIL = "your-email@gmail.com"
+SENDER_PASSWORD = "your-16-char-app-password"
+RECIPIENT_EMAIL = "recipient-email@gmail.com"
+
+# SMTP Configuration (default values)
+SMTP_SERVER = "smtp.gmail.com"
+SMTP_PORT = 587
+
+# Instructions:
+# 1. Replace email addresses with your actual Gmail addresses
+# 2. Generate Gmail App Password:
+#    - Go to: https://myaccount.google.com/apppasswords
+#    - Create app password for "Mail"
+#    - Use the 16-character password (remove spaces)
+# 3. Save this file
+# 4. Run: python test_email.py (to verify configuration)
+"""
+
+CONFIG_TEMPLATE = """# Streamlit Configuration
+
+[theme]
+primaryColor = "#4CAF50"
+backgroundColor = "#FFFFFF"
+secondaryBackgroundColor = "#F0F2F6"
+textColor = "#262730"
+font = "sans serif"
+
+[server]
+port = 8501
+enableCORS = false
+enableXsrfProtection = true
+maxUploadSize = 5
+
+[browser]
+gatherUsageStats = false
+"""
+
+
+def write_new_file(path: Path, content: str, mode: int = 0o644) -> bool:
+    """
+    Write content to path only if it doesn't exist yet
+
+    O_EXCL makes the existence check and the create one step, so an existing
+    file is never overwritten.
+
+    Returns:
+        False if path already exists
+    """
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode)
+    except FileExistsError:
+        return False
+
+    with os.fdopen(fd, 'w') as f:
+        f.write(content)
+    return True
+
 
 def create_directory_structure():
     """Create necessary directories"""
@@ -30,36 +92,12 @@ def create_secrets_file():
 
     secrets_path = Path('.streamlit/secrets.toml')
 
-    if secrets_path.exists():
+    # Holds credentials, so only the owner can read it
+    if not write_new_file(secrets_path, SECRETS_TEMPLATE, mode=0o600):
         print(f"  ⚠ {secrets_path} already exists. Skipping.")
         print()
         return
 
-    template = """# Streamlit Secrets Configuration
-# Fill in your actual credentials below
-
-# Email Configuration
-SENDER_EMAIL = "your-email@gmail.com"
-SENDER_PASSWORD = "your-16-char-app-password"
-RECIPIENT_EMAIL = "recipient-email@gmail.com"
-
-# SMTP Configuration (default values)
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
-
-# Instructions:
-# 1. Replace email addresses with your actual Gmail addresses
-# 2. Generate Gmail App Password:
-#    - Go to: https://myaccount.google.com/apppasswords
-#    - Create app password for "Mail"
-#    - Use the 16-character password (remove spaces)
-# 3. Save this file
-# 4. Run: python test_email.py (to verify configuration)
-"""
-
-    with open(secrets_path, 'w') as f:
-        f.write(template)
-
     print(f"  ✓ Created: {secrets_path}")
     print(f"  ⚠ Please edit this file with your actual credentials!")
     print()
@@ -71,33 +109,11 @@ def create_config_file():
 
     config_path = Path('.streamlit/config.toml')
 
-    if config_path.exists():
+    if not write_new_file(config_path, CONFIG_TEMPLATE):
         print(f"  ⚠ {config_path} already exists. Skipping.")
         print()
         return
 
-    config = """# Streamlit Configuration
-
-[theme]
-primaryColor = "#4CAF50"
-backgroundColor = "#FFFFFF"
-secondaryBackgroundColor = "#F0F2F6"
-textColor = "#262730"
-font = "sans serif"
-
-[server]
-port = 8501
-enableCORS = false
-enableXsrfProtection = true
-maxUploadSize = 5
-
-[browser]
-gatherUsageStats = false
-"""
-
-    with open(config_path, 'w') as f:
-        f.write(config)
-
     print(f"  ✓ Created: {config_path}")
     print()
 
@@ -106,40 +122,12 @@ def check_dependencies():
     """Check if dependencies are installed"""
     print("Checking dependencies...")
 
-    try:
-        import streamlit
-        print("  ✓ streamlit")
-    except ImportError:
-        print("  ✗ streamlit - NOT INSTALLED")
-        return False
-
-    try:
-        import pandas
-        print("  ✓ pandas")
-    except ImportError:
-        print("  ✗ pandas - NOT INSTALLED")
-        return False
-
-    try:
-        import yfinance
-        print("  ✓ yfinance")
-    except ImportError:
-        print("  ✗ yfinance - NOT INSTALLED")
-        return False
-
-    try:
-        import scipy
-        print("  ✓ scipy")
-    except ImportError:
-        print("  ✗ scipy - NOT INSTALLED")
-        return False
-
-    try:
-        import apscheduler
-        print("  ✓ apscheduler")
-    except ImportError:
-        print("  ✗ apscheduler - NOT INSTALLED")
-        return False
+    # find_spec only locates each package, without running its imports
+    for name in ('streamlit', 'pandas', 'yfinance', 'scipy', 'apscheduler'):
+        if find_spec(name) is None:
+            print(f"  ✗ {name} - NOT INSTALLED")
+            return False
+        print(f"  ✓ {name}")
 
     print()
     return True
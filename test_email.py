@@ -8,6 +8,8 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import sys
 
+from email_alerts import SMTPS_PORT
+
 
 def test_email_config():
     """Test email configuration"""
@@ -55,7 +57,7 @@ def test_email_config():
         msg['To'] = recipient_email
         msg['Subject'] = "🧪 Stock Pattern Scanner - Test Email"
 
-        body = """<html>
+        body = f"""<html>
 <head>
 <style>
 body {{ font-family: Arial, sans-serif; }}
@@ -69,24 +71,30 @@ body {{ font-family: Arial, sans-serif; }}
 </div>
 <div class="content">
 <p>Your Stock Pattern Scanner email configuration is working correctly.</p>
-<p><strong>SMTP Server:</strong> {0}</p>
-<p><strong>Sender:</strong> {1}</p>
-<p><strong>Recipient:</strong> {2}</p>
+<p><strong>SMTP Server:</strong> {smtp_server}</p>
+<p><strong>Sender:</strong> {sender_email}</p>
+<p><strong>Recipient:</strong> {recipient_email}</p>
 <hr>
 <p>You will receive alerts in this format when patterns are detected.</p>
 <p style="color: #666; font-style: italic;">This is a test email from Stock Pattern Scanner.</p>
 </div>
 </body>
-</html>""".format(smtp_server, sender_email, recipient_email)
+</html>"""
 
         html_part = MIMEText(body, 'html')
         msg.attach(html_part)
 
-        # Connect and send
+        # Connect and send, with the same handshake as the app: implicit TLS
+        # on SMTPS_PORT, STARTTLS on any other port
         print("Connecting to SMTP server...")
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            print("Starting TLS...")
-            server.starttls()
+        if smtp_port == SMTPS_PORT:
+            server = smtplib.SMTP_SSL(smtp_server, smtp_port)
+        else:
+            server = smtplib.SMTP(smtp_server, smtp_port)
+        with server:
+            if smtp_port != SMTPS_PORT:
+                print("Starting TLS...")
+                server.starttls()
 
             print("Logging in...")
             server.login(sender_email, sender_password)
@@ -0,0 +1,123 @@
+"""
+Market Utils Regression Tests
+Run with: python -m pytest test_market_utils.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from market_utils import MarketUtils, INDEX_SYMBOLS, HISTORY_TTL_SECONDS
+
+
+def _index_frames(n: int = 300) -> dict:
+    """Steadily rising daily history for every index, as _download_indices returns"""
+    index = pd.date_range('2024-01-01', periods=n, freq='B')
+    frames = {}
+    for i, symbol in enumerate(INDEX_SYMBOLS):
+        close = np.linspace(100.0, 150.0, n) * (i + 1)
+        if symbol == '^INDIAVIX':
+            close = np.full(n, 12.0)
+        frames[symbol] = pd.DataFrame({
+            'Open': close, 'High': close, 'Low': close, 'Close': close,
+            'Volume': np.full(n, 1000.0),
+        }, index=index)
+    return frames
+
+
+class _Downloads:
+    """Stands in for MarketUtils._download_indices, counting calls"""
+
+    def __init__(self, frames: dict):
+        self.frames = frames
+        self.calls = 0
+
+    def __call__(self) -> dict:
+        self.calls += 1
+        return self.frames
+
+
+def _market_utils(frames: dict) -> MarketUtils:
+    """MarketUtils without disk cache whose index download returns frames"""
+    utils = MarketUtils(cache_dir=None)
+    utils._download_indices = _Downloads(frames)
+    return utils
+
+
+def _closed(utils: MarketUtils) -> MarketUtils:
+    """MarketUtils whose is_market_open always reports the market closed"""
+    utils.is_market_open = lambda return_message=False: False
+    return utils
+
+
+def test_neutral_score_after_failed_download_is_not_cached():
+    utils = _market_utils({})
+
+    # Every component falls back to its neutral score
+    neutral = sum(n for _, _, n in MarketUtils._SCORE_COMPONENTS)
+    assert utils.get_market_condition_score(market_open=False) == neutral
+
+    # Once the download recovers (and the failed attempt has expired), the
+    # same closed market scores like a fresh instance instead of reusing the
+    # neutral score
+    utils._download_indices.frames = _index_frames()
+    utils._history_fetched_at -= HISTORY_TTL_SECONDS + 1
+    expected = _market_utils(_index_frames()).get_market_condition_score(market_open=False)
+    assert expected != neutral
+    assert utils.get_market_condition_score(market_open=False) == expected
+
+
+def test_complete_score_is_cached_while_closed():
+    utils = _market_utils(_index_frames())
+
+    score = utils.get_market_condition_score(market_open=False)
+    assert utils.get_market_condition_score(market_open=False) == score
+    assert utils._download_indices.calls == 1
+
+
+def test_failed_download_is_not_retried_within_ttl():
+    utils = _closed(_market_utils({}))
+
+    utils.get_market_condition_score(market_open=False)
+    utils.get_market_summary()
+    assert utils._download_indices.calls == 1
+
+
+def test_summary_with_fallback_score_is_not_cached():
+    utils = _closed(_market_utils(_index_frames()))
+    expected = _closed(_market_utils(_index_frames())).get_market_summary()
+
+    # All three indices download, but one component fails and scores neutral
+    def fail():
+        raise RuntimeError('Nifty trend unavailable')
+    utils._get_nifty_trend_score = fail
+    degraded = utils.get_market_summary()
+    assert 'nifty_price' in degraded and 'vix' in degraded
+    assert degraded['condition_score'] != expected['condition_score']
+
+    # That summary wasn't kept: the next one is scored afresh
+    del utils._get_nifty_trend_score
+    assert utils.get_market_summary()['condition_score'] == expected['condition_score']
+
+
+def test_pre_open_score_is_not_served_after_close(monkeypatch):
+    import market_utils
+
+    utils = _market_utils(_index_frames())
+    day = market_utils.datetime(2024, 6, 3, tzinfo=utils.ist_tz)
+
+    class _Clock(market_utils.datetime):
+        at = day.replace(hour=8)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.at
+
+    monkeypatch.setattr(market_utils, 'datetime', _Clock)
+    utils.get_market_condition_score(market_open=False)
+
+    # The session's bars arrive; after the close they're scored afresh
+    utils._download_indices.frames = _index_frames(301)
+    utils._history_fetched_at -= market_utils.HISTORY_TTL_SECONDS + 1
+    _Clock.at = day.replace(hour=16)
+    utils.get_market_condition_score(market_open=False)
+    assert utils._download_indices.calls == 2
@@ -0,0 +1,68 @@
+"""
+Pattern Detector Regression Tests
+Run with: python -m pytest test_pattern_detector.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from pattern_detector import PatternDetector, to_ohlcv_arrays, OHLCV_COLUMNS, CLOSE
+
+
+def _bars(seed: int, n: int = 250) -> pd.DataFrame:
+    """Random-walk daily OHLCV bars"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0.001, 0.02, n))
+    return pd.DataFrame({
+        'Open': close,
+        'High': close * (1 + rng.uniform(0, 0.02, n)),
+        'Low': close * (1 - rng.uniform(0, 0.02, n)),
+        'Close': close,
+        'Volume': rng.integers(1, 1000, n).astype(float),
+    }, index=pd.date_range('2024-01-01', periods=n))
+
+
+def _with_nan_fields(df: pd.DataFrame, seed: int) -> pd.DataFrame:
+    """Copy of df with a few single fields blanked, as yfinance sometimes returns"""
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    for column in OHLCV_COLUMNS:
+        df.loc[df.index[rng.integers(0, len(df), 3)], column] = np.nan
+    return df
+
+
+def test_to_ohlcv_arrays_drops_bars_missing_prices():
+    df = _with_nan_fields(_bars(0), seed=0)
+    arr, idx = to_ohlcv_arrays(df)
+
+    complete = df[['Open', 'High', 'Low', 'Close']].notna().all(axis=1)
+    assert arr.shape == (5, complete.sum())
+    assert len(idx) == arr.shape[1]
+    assert not np.isnan(arr[:CLOSE + 1]).any()
+    assert arr.flags['C_CONTIGUOUS']
+
+
+def test_detect_all_patterns_with_nan_fields():
+    detector = PatternDetector()
+    for seed in range(200):
+        arr, idx = to_ohlcv_arrays(_with_nan_fields(_bars(seed), seed))
+        patterns = detector.detect_all_patterns(arr, idx, 'TEST.NS', 50)
+
+        for pattern in patterns:
+            assert isinstance(pattern['strength_score'], int)
+            assert 0 <= pattern['strength_score'] <= 100
+            assert not np.isnan(pattern['breakout_point'])
+
+
+def test_nan_volume_is_skipped():
+    df = _bars(1)
+    df.loc[df.index[-10], 'Volume'] = np.nan
+    arr, _ = to_ohlcv_arrays(df)
+
+    # Bars missing only volume are kept, and the means skip the NaN like pandas
+    volume = df['Volume']
+    expected = volume.iloc[-3:].mean() / volume.iloc[-20:-3].mean()
+    vol_ratio, _ = PatternDetector()._volume_stats(arr)
+
+    assert arr.shape[1] == len(df)
+    assert np.isclose(vol_ratio, expected)